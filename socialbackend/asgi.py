@@ -12,5 +12,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'socialbackend.settings')
+# ویوهای async ثبت‌نام/ورود/تغییر رمز که هش را در HashingPool اجرا می‌کنند
+os.environ.setdefault('ASYNC_AUTH_VIEWS', 'True')
+# پیش‌فرض DB_CONN_MODE زیر ASGI اتصال پایدار نیست (socialbackend/settings.py)
+os.environ.setdefault('SERVER_MODE', 'asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,33 @@
+"""
+hookهای gunicorn برای python manage.py serve؛ بقیه‌ی تنظیمات از خط فرمان همان فرمان می‌آیند.
+"""
+import gc
+
+# با preload، master برنامه را یک بار import می‌کند و workerها حافظه‌ی آن را
+# copy-on-write شریک می‌شوند. GC در طول import خاموش است تا اشیای زنده بین
+# زباله‌ها پراکنده نشوند (الگوی مستند gc.freeze: disable، freeze، enable). HUP این
+# فایل را در master دوباره اجرا می‌کند؛ بعد از freeze اول GC دیگر خاموش نمی‌شود.
+if not gc.get_freeze_count():
+    gc.disable()
+
+
+def when_ready(server):
+    # فقط یک بار، بعد از preload و قبل از اولین fork: gc.freeze اشیای موجود را از GC
+    # بیرون می‌برد تا شمارنده‌های GC صفحه‌های مشترک را در فرزند کپی نکنند. اجرای
+    # دوباره (مثلاً در pre_fork برای workerهای بازسازی‌شده با max-requests) زباله‌ی
+    # master را هم برای همیشه به نسل دائمی می‌برد.
+    gc.freeze()
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    from django.conf import settings
+
+    if settings.configured:
+        # اتصال دیتابیس یا pool باز در master نباید به workerها ارث برسد
+        from django.db import connections
+        from users.db.pool import POOLS
+
+        connections.close_all()
+        for pool in list(POOLS.values()):
+            pool.close()
@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 from datetime import timedelta
 from pathlib import Path
-import environ,os
+import environ,os,sys
+
+from django.core.exceptions import ImproperlyConfigured
 
 
 
@@ -23,6 +25,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 #connecting to .env 
 environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 
+TESTING = sys.argv[1:2] == ['test']
+
 DEBUG = env('DEBUG')
 SECRET_KEY = env('SECRET_KEY')
 # Quick-start development settings - unsuitable for production
@@ -61,6 +65,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # اول از همه تا زمان کل request (همراه middlewareهای بعدی) اندازه گرفته شود
+    'users.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -102,9 +108,48 @@ DATABASES = {
         'PASSWORD': env('DB_PASSWORD'),
         'HOST': env('DB_HOST'),
         'PORT': env('DB_PORT'),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
     }
 }
 
+# مدیریت اتصال دیتابیس (DB_CONN_MODE):
+#   persistent    اتصال هر thread تا DB_CONN_MAX_AGE ثانیه نگه داشته می‌شود (پیش‌فرض WSGI با threadهای ثابت)
+#   pool          pool بومی psycopg3 (pip install "psycopg[binary,pool]")؛ برای ASGI که هر request
+#                 ممکن است در thread تازه‌ای اجرا شود و اتصال پایدار جمع می‌شود
+#   psycopg2_pool pool داخلی users.db.postgresql_pool برای همان کاربرد با psycopg2
+#   none          اتصال تازه برای هر request (رفتار پیش‌فرض Django؛ پیش‌فرض SERVER_MODE=asgi)
+# آمار زمان انتظار poolها با users.db.pool.pool_stats() در دسترس است.
+ASGI_SERVER = env('SERVER_MODE', default='wsgi') == 'asgi'
+DB_CONN_MODE = env('DB_CONN_MODE', default='none' if ASGI_SERVER else 'persistent')
+if ASGI_SERVER and DB_CONN_MODE == 'persistent':
+    raise ImproperlyConfigured("DB_CONN_MODE=persistent زیر ASGI اتصال‌ها را جمع می‌کند؛ pool، psycopg2_pool یا none")
+DB_POOL = {
+    'MIN_SIZE': env.int('DB_POOL_MIN_SIZE', default=2),
+    'MAX_SIZE': env.int('DB_POOL_MAX_SIZE', default=10),
+    'TIMEOUT': env.float('DB_POOL_TIMEOUT', default=10.0),  # بیشینه‌ی انتظار برای گرفتن اتصال
+    'MAX_IDLE': env.float('DB_POOL_MAX_IDLE', default=300.0),
+    'CHECK_AFTER': env.float('DB_POOL_CHECK_AFTER', default=30.0),  # ping اتصال بیکارتر از این (psycopg2_pool)
+}
+if DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+elif DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'min_size': DB_POOL['MIN_SIZE'],
+        'max_size': DB_POOL['MAX_SIZE'],
+        'timeout': DB_POOL['TIMEOUT'],
+        'max_idle': DB_POOL['MAX_IDLE'],
+    }}
+elif DB_CONN_MODE == 'psycopg2_pool':
+    DATABASES['default']['ENGINE'] = 'users.db.postgresql_pool'
+    DATABASES['default']['POOL'] = DB_POOL
+elif DB_CONN_MODE != 'none':
+    raise ImproperlyConfigured(f"DB_CONN_MODE نامعتبر: {DB_CONN_MODE} (persistent، pool، psycopg2_pool یا none)")
+
+# CACHE_URL مثل locmemcache://، filecache:///var/tmp/django_cache یا redis://...
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 SITE_ID = 1
 ACCOUNT_EMAIL_VERIFICATION = 'none'
 SOCIALACCOUNT_PROVIDERS = {
@@ -121,11 +166,112 @@ REST_USE_JWT = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'users.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'users.pagination.KeysetPagination',
+    'PAGE_SIZE': env.int('API_PAGE_SIZE', default=20),
+    # تعداد proxyهای مورد اعتماد جلوی سرور؛ با ۰ کلید throttle آدرس REMOTE_ADDR است و
+    # X-Forwarded-For که کلاینت می‌فرستد نادیده گرفته می‌شود
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
+    # None یعنی بدون محدودیت؛ در تست‌ها خاموش است و تست‌های throttle خودشان نرخ می‌دهند
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': None if TESTING else env('THROTTLE_AUTH_IP_RATE', default='30/min'),
+        'auth_identifier': None if TESTING else env('THROTTLE_AUTH_IDENTIFIER_RATE', default='10/min'),
+    },
+}
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=100)
+
+AUTH_USER_CACHE = {
+    'TTL': env.int('AUTH_USER_CACHE_TTL', default=30),
+    'MAX_ENTRIES': env.int('AUTH_USER_CACHE_MAX_ENTRIES', default=10000),
+    'CACHE_ALIAS': env('AUTH_USER_CACHE_ALIAS', default='default'),
+}
+
+MENTION_CACHE = {
+    'TTL': env.int('MENTION_CACHE_TTL', default=300),
+    'MAX_ENTRIES': env.int('MENTION_CACHE_MAX_ENTRIES', default=50000),
+    'CACHE_ALIAS': env('MENTION_CACHE_ALIAS', default='default'),
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': env.bool('RESPONSE_CACHE_ENABLED', default=True),
+    'TTL': env.int('RESPONSE_CACHE_TTL', default=60),
+    'CACHE_ALIAS': env('RESPONSE_CACHE_ALIAS', default='default'),
+    'LOCK_TIMEOUT': env.int('RESPONSE_CACHE_LOCK_TIMEOUT', default=5),
+}
+
+BULK_POSTS = {
+    'MAX_ROWS': env.int('BULK_POSTS_MAX_ROWS', default=5000),
+    'CHUNK_SIZE': env.int('BULK_POSTS_CHUNK_SIZE', default=500),
+}
+
+# InMemoryCounterStore برای هر پروسس جداست و serve آن را با چند worker نمی‌پذیرد؛ CacheCounterStore
+# فقط با کش مشترک (redis، memcached، فایل) بین workerها یک سقف دارد
+THROTTLING = {
+    'STORE': env('THROTTLE_STORE', default='users.throttling.CacheCounterStore'),
+    'CACHE_ALIAS': env('THROTTLE_CACHE_ALIAS', default='default'),
+    'STRIPES': env.int('THROTTLE_STRIPES', default=64),
+}
+
+OTP = {
+    'STORE': env('OTP_STORE', default='users.otp.DatabaseOTPStore'),
+    'CACHE_ALIAS': env('OTP_CACHE_ALIAS', default='default'),
+    'DELIVERY': env('OTP_DELIVERY', default='users.otp.TaskDeliveryQueue'),
+    'TTL': env.int('OTP_TTL', default=300),
+    'LENGTH': env.int('OTP_LENGTH', default=6),
+    'MAX_ATTEMPTS': env.int('OTP_MAX_ATTEMPTS', default=5),
+    # فقط برای توسعه و تست: LocalDeliveryQueue پیام‌ها (با کد خام) را در outbox حافظه نگه می‌دارد
+    'KEEP_OUTBOX': env.bool('OTP_KEEP_OUTBOX', default=TESTING),
+}
+
+# /metrics با خروجی Prometheus فقط با Authorization: Bearer <TOKEN>؛ بدون TOKEN بسته است
+# مگر PUBLIC (فقط توسعه و تست). هر worker gunicorn آمار خودش را با برچسب worker (pid) دارد.
+# در SAMPLE_RATE از requestها کوئری‌های کندتر از SLOW_QUERY_MS و شکل‌های کوئری
+# تکرارشده بیش از N_PLUS_ONE_THRESHOLD بار با SQL و stack لاگ می‌شوند.
+METRICS = {
+    'ENABLED': env.bool('METRICS_ENABLED', default=True),
+    'TOKEN': env('METRICS_TOKEN', default=''),
+    'PUBLIC': env.bool('METRICS_PUBLIC', default=TESTING),
+    'SAMPLE_RATE': env.float('METRICS_SAMPLE_RATE', default=1.0 if TESTING else 0.05),
+    'SLOW_QUERY_MS': env.float('METRICS_SLOW_QUERY_MS', default=100.0),
+    'N_PLUS_ONE_THRESHOLD': env.int('METRICS_N_PLUS_ONE_THRESHOLD', default=10),
+}
+
+# python manage.py serve (gunicorn)؛ WORKERS=0 یعنی WSGI: 2×هسته+1، ASGI: یک worker برای هر هسته
+SERVER = {
+    'MODE': env('SERVER_MODE', default='wsgi'),  # wsgi یا asgi
+    'BIND': env('SERVER_BIND', default='0.0.0.0:8000'),
+    'WORKERS': env.int('SERVER_WORKERS', default=0),
+    'THREADS': env.int('SERVER_THREADS', default=1),  # بیش از ۱ یعنی worker gthread برای WSGI
+    'MAX_REQUESTS': env.int('SERVER_MAX_REQUESTS', default=1000),
+    'MAX_REQUESTS_JITTER': env.int('SERVER_MAX_REQUESTS_JITTER', default=100),
+    'TIMEOUT': env.int('SERVER_TIMEOUT', default=30),
+    'GRACEFUL_TIMEOUT': env.int('SERVER_GRACEFUL_TIMEOUT', default=30),
+    'KEEPALIVE': env.int('SERVER_KEEPALIVE', default=5),
+    'PRELOAD': env.bool('SERVER_PRELOAD', default=True),
+}
+
+# در تست‌ها کارها فوری و داخل همان request اجرا می‌شوند؛ در غیر این صورت python manage.py run_worker
+TASKS = {
+    'BACKEND': env('TASKS_BACKEND', default='users.taskqueue.EagerQueue' if TESTING else 'users.taskqueue.DatabaseQueue'),
+    'MAX_ATTEMPTS': env.int('TASKS_MAX_ATTEMPTS', default=5),
+    'BACKOFF_BASE': env.float('TASKS_BACKOFF_BASE', default=2.0),
+    'BACKOFF_MAX': env.float('TASKS_BACKOFF_MAX', default=300.0),
+    'VISIBILITY_TIMEOUT': env.int('TASKS_VISIBILITY_TIMEOUT', default=300),
+    'RETENTION': env.int('TASKS_RETENTION', default=7 * 24 * 3600),
+}
+
+FEED = {
+    'BACKEND': env('FEED_BACKEND', default='users.feed.DatabaseTimelineStore'),
+    'MAX_LENGTH': env.int('FEED_MAX_LENGTH', default=800),
+    'FANOUT_LIMIT': env.int('FEED_FANOUT_LIMIT', default=1000),
 }
 REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'#Review
 
@@ -155,6 +301,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# هزینه‌ی هش رمز عبور برای هر محیط از env خوانده می‌شود؛ در تست‌ها ارزان است.
+# هش‌های قدیمی بعد از ورود موفق به صورت خودکار با policy فعلی بازنویسی می‌شوند.
+PASSWORD_HASHER_POLICY = env('PASSWORD_HASHER_POLICY', default='pbkdf2')
+PASSWORD_HASHER_COST = {
+    'PBKDF2_ITERATIONS': env.int('PBKDF2_ITERATIONS', default=1000 if TESTING else 1_000_000),
+    'ARGON2_TIME_COST': env.int('ARGON2_TIME_COST', default=1 if TESTING else 2),
+    'ARGON2_MEMORY_COST': env.int('ARGON2_MEMORY_COST', default=1024 if TESTING else 102400),
+    'ARGON2_PARALLELISM': env.int('ARGON2_PARALLELISM', default=1 if TESTING else 8),
+    'SCRYPT_WORK_FACTOR': env.int('SCRYPT_WORK_FACTOR', default=2**8 if TESTING else 2**14),
+    'SCRYPT_BLOCK_SIZE': env.int('SCRYPT_BLOCK_SIZE', default=8),
+    'SCRYPT_PARALLELISM': env.int('SCRYPT_PARALLELISM', default=1 if TESTING else 5),
+}
+PASSWORD_HASHER_POLICIES = {
+    'pbkdf2': 'users.hashers.PBKDF2PasswordHasher',
+    'argon2': 'users.hashers.Argon2PasswordHasher',
+    'scrypt': 'users.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [PASSWORD_HASHER_POLICIES[PASSWORD_HASHER_POLICY]] + [
+    path for name, path in PASSWORD_HASHER_POLICIES.items() if name != PASSWORD_HASHER_POLICY
+]
+
+# زیر ASGI (socialbackend/asgi.py) ویوهای async احراز هویت سرو می‌شوند و هش رمز
+# در یک thread pool محدود اجرا می‌شود؛ با پر شدن صف، پاسخ 503 برمی‌گردد.
+ASYNC_AUTH_VIEWS = env.bool('ASYNC_AUTH_VIEWS', default=False)
+HASHING_POOL = {
+    'WORKERS': env.int('HASHING_POOL_WORKERS', default=0),  # 0 یعنی تعداد هسته‌ها
+    'MAX_QUEUE': env.int('HASHING_POOL_MAX_QUEUE', default=64),
+}
+
 AUTHENTICATION_BACKENDS = [
     'users.auth.EmailOrUsernameOrPhoneBackend',  
     'django.contrib.auth.backends.ModelBackend',
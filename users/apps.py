@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from . import instrumentation, signals, tasks  # noqa: F401
+
+        if settings.METRICS["ENABLED"]:
+            connection_created.connect(instrumentation.install_query_wrapper)
+            instrumentation.install_serializer_timing()
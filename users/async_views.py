@@ -0,0 +1,202 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication
+from .hashing import PoolSaturated, get_hashing_pool, verify_password
+from .identifiers import resolve_identifier
+from .throttling import throttle_wait
+from .serializers import ChangePasswordSerializer, LoginSerializer, RegisterSerializer, ResetPasswordSerializer
+
+
+User = get_user_model()
+
+# نسخه‌های async ویوهای احراز هویت که زیر ASGI سرو می‌شوند (socialbackend/asgi.py).
+# هش رمز در HashingPool اجرا می‌شود و event loop و بقیه‌ی درخواست‌ها را بلاک نمی‌کند.
+
+
+class _LoginFieldsSerializer(LoginSerializer):
+    def validate(self, data):
+        return data
+
+
+class _ChangePasswordFieldsSerializer(ChangePasswordSerializer):
+    def validate(self, attrs):
+        return attrs
+
+
+def _request_data(request):
+    if request.content_type == "application/json":
+        try:
+            return json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+    return request.POST
+
+
+def _bad_request(errors):
+    return JsonResponse(errors, status=400, json_dumps_params={"ensure_ascii": False})
+
+
+def _saturated():
+    response = JsonResponse(
+        {"detail": "سرور مشغول است، لطفاً کمی بعد دوباره تلاش کنید."},
+        status=503,
+        json_dumps_params={"ensure_ascii": False},
+    )
+    response["Retry-After"] = "1"
+    return response
+
+
+def _malformed():
+    return _bad_request({"detail": "JSON parse error"})
+
+
+def _throttled(wait):
+    seconds = math.ceil(wait)
+    response = JsonResponse(
+        {"detail": f"تعداد درخواست‌ها بیش از حد مجاز است؛ {seconds} ثانیه‌ی دیگر تلاش کنید."},
+        status=429,
+        json_dumps_params={"ensure_ascii": False},
+    )
+    response["Retry-After"] = str(seconds)
+    return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncRegisterView(View):
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _malformed()
+        wait = await sync_to_async(throttle_wait)(request, data)
+        if wait is not None:
+            return _throttled(wait)
+        serializer = RegisterSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return _bad_request(serializer.errors)
+
+        validated = dict(serializer.validated_data)
+        try:
+            encoded = await get_hashing_pool().run(make_password, validated.pop("password"))
+        except PoolSaturated:
+            return _saturated()
+        user = await sync_to_async(User.objects.create_user)(encoded_password=encoded, **validated)
+        return JsonResponse(
+            {"message": "ثبت‌نام موفق", "user_id": user.id},
+            status=201,
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncLoginView(View):
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _malformed()
+        wait = await sync_to_async(throttle_wait)(request, data)
+        if wait is not None:
+            return _throttled(wait)
+        serializer = _LoginFieldsSerializer(data=data)
+        if not serializer.is_valid():
+            return _bad_request(serializer.errors)
+
+        password = serializer.validated_data["password"]
+        user = await sync_to_async(resolve_identifier)(serializer.validated_data["identifier"])
+        pool = get_hashing_pool()
+        try:
+            is_correct, must_update = await pool.run(verify_password, password, user.password if user else None)
+            if is_correct and must_update:
+                user.password = await pool.run(make_password, password)
+                await sync_to_async(user.save)(update_fields=["password"])
+        except PoolSaturated:
+            return _saturated()
+        if not is_correct:
+            return _bad_request({"non_field_errors": ["اطلاعات ورود اشتباه است"]})
+
+        refresh = RefreshToken.for_user(user)
+        return JsonResponse(
+            {
+                "access_token": str(refresh.access_token),
+                "refresh_token": str(refresh),
+                "user": {
+                    "id": user.id,
+                    "email": user.email,
+                    "username": user.username,
+                    "phone": user.phone,
+                },
+            },
+            json_dumps_params={"ensure_ascii": False},
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncResetPasswordView(View):
+    async def post(self, request):
+        data = _request_data(request)
+        if data is None:
+            return _malformed()
+        wait = await sync_to_async(throttle_wait)(request, data)
+        if wait is not None:
+            return _throttled(wait)
+        serializer = ResetPasswordSerializer(data=data)
+        if not await sync_to_async(serializer.is_valid)():
+            return _bad_request(serializer.errors)
+
+        user = serializer.get_user()
+        if not user:
+            return _bad_request({"detail": "کاربری با مشخصات وارد شده یافت نشد."})
+        try:
+            user.password = await get_hashing_pool().run(make_password, serializer.validated_data["new_password"])
+        except PoolSaturated:
+            return _saturated()
+        await sync_to_async(user.save)()
+        return JsonResponse({"message": "رمز عبور با موفقیت تغییر یافت."}, json_dumps_params={"ensure_ascii": False})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncChangePasswordView(View):
+    async def post(self, request):
+        authenticator = CachedJWTAuthentication()
+        try:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        except exceptions.AuthenticationFailed as exc:
+            detail = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+            return JsonResponse(detail, status=401)
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        user = result[0]
+
+        data = _request_data(request)
+        if data is None:
+            return _malformed()
+        serializer = _ChangePasswordFieldsSerializer(data=data)
+        if not serializer.is_valid():
+            return _bad_request(serializer.errors)
+        old_password = serializer.validated_data["old_password"]
+        new_password = serializer.validated_data["new_password"]
+
+        pool = get_hashing_pool()
+        try:
+            is_correct, _ = await pool.run(verify_password, old_password, user.password)
+            if not is_correct:
+                return _bad_request({"old_password": ["رمز عبور فعلی اشتباه است."]})
+            if old_password == new_password:
+                return _bad_request({"new_password": ["رمز جدید نباید با رمز قبلی یکسان باشد."]})
+            if len(new_password) < 6:
+                return _bad_request({"new_password": ["رمز عبور باید حداقل ۶ کاراکتر باشد."]})
+            user.password = await pool.run(make_password, new_password)
+        except PoolSaturated:
+            return _saturated()
+        await sync_to_async(user.save)()
+        return JsonResponse({"message": "رمز عبور با موفقیت تغییر یافت."}, json_dumps_params={"ensure_ascii": False})
@@ -1,19 +1,15 @@
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth import get_user_model
 
+from .identifiers import resolve_identifier
+
 User = get_user_model()
 
 class EmailOrUsernameOrPhoneBackend(BaseBackend):
     def authenticate(self, request, identifier=None, password=None, **kwargs):
         if not identifier or not password:
             return None
-        user = None
-        for field in ["email", "username", "phone"]:
-            try:
-                user = User.objects.get(**{f"{field}__iexact": identifier})
-                break
-            except User.DoesNotExist:
-                continue
+        user = resolve_identifier(identifier)
 
         if user and user.check_password(password):
             return user
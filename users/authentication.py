@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .caching import MISSING, TieredCache
+
+
+User = get_user_model()
+
+# به ترتیب concrete_fields مدل، چون Model.from_db مقادیر را به همین ترتیب می‌خواند
+SNAPSHOT_FIELDS = tuple(
+    f.attname for f in User._meta.concrete_fields if f.attname in {"id", "is_active", "is_staff", "username"}
+)
+
+user_cache = TieredCache(
+    prefix="auth-user",
+    ttl=settings.AUTH_USER_CACHE["TTL"],
+    max_entries=settings.AUTH_USER_CACHE["MAX_ENTRIES"],
+    alias=settings.AUTH_USER_CACHE["CACHE_ALIAS"],
+)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
+
+
+def load_deferred_fields(user):
+    """
+    کاربری که از snapshot ساخته شده فقط چند فیلد دارد؛ این تابع بقیه را با یک کوئری می‌خواند.
+    """
+    deferred = user.get_deferred_fields()
+    if deferred:
+        user.refresh_from_db(fields=list(deferred))
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    برای درخواست‌های فقط‌خواندنی، کاربر را از snapshot کش‌شده می‌سازد و فیلدهای
+    دیگر deferred می‌مانند. درخواست‌های نوشتنی همچنان کاربر کامل را از دیتابیس می‌خوانند.
+    """
+
+    def authenticate(self, request):
+        self.use_snapshot = request.method in SAFE_METHODS and not api_settings.CHECK_REVOKE_TOKEN
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not self.use_snapshot:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        snapshot = user_cache.get(str(user_id))
+        if snapshot is MISSING:
+            snapshot = (
+                User.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*SNAPSHOT_FIELDS)
+                .first()
+            )
+            if snapshot is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            user_cache.set(str(user_id), snapshot)
+
+        user = User.from_db(router.db_for_read(User), list(SNAPSHOT_FIELDS), list(snapshot))
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """
+    drf-spectacular فقط خود JWTAuthentication را می‌شناسد؛ بدون این extension طرح امنیتی
+    jwtAuth از schema حذف می‌شود.
+    """
+
+    target_class = "users.authentication.CachedJWTAuthentication"
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.functions import Collate, Lower
+
+
+User = get_user_model()
+
+# ترتیب اولویت نتایج: اول تطابق یوزرنیم، بعد نام و نام خانوادگی
+AUTOCOMPLETE_FIELDS = ("username", "first_name", "last_name")
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+
+def prefix_key(field):
+    # در PostgreSQL با collation "C" تا هم بازه‌ی پیشوندی و هم ORDER BY از ایندکس
+    # user_<field>_prefix_idx (مایگریشن 0009) استفاده کنند؛ در SQLite ترتیب باینری پیش‌فرض است
+    key = Lower(field)
+    if connection.vendor == "postgresql":
+        key = Collate(key, "C")
+    return key
+
+
+def prefix_successor(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def complete(prefix, limit=10):
+    """
+    کاربران فعالی که یوزرنیم یا نامشان با prefix شروع می‌شود. هر فیلد یک
+    range scan روی ایندکس با LIMIT است، پس هزینه به تعداد کاربران بستگی ندارد.
+    """
+    prefix = prefix.strip().lstrip("@").lower()
+    if not prefix:
+        return []
+
+    users, seen = [], set()
+    for field in AUTOCOMPLETE_FIELDS:
+        queryset = (
+            User.objects.filter(is_active=True)
+            .annotate(prefix_key=prefix_key(field))
+            .filter(prefix_key__gte=prefix, prefix_key__lt=prefix_successor(prefix))
+            .order_by("prefix_key")
+            .only("id", "username", "first_name", "last_name")
+        )
+        for user in queryset[:limit]:
+            if user.pk not in seen:
+                seen.add(user.pk)
+                users.append(user)
+        if len(users) >= limit:
+            break
+    return users[:limit]
@@ -0,0 +1,141 @@
+import itertools
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+
+from . import feed, taskqueue
+from .mentions import parse_handles, resolve_handles
+from .models import Post, PostMention
+from .response_cache import invalidate_post_responses
+
+
+User = get_user_model()
+
+
+def _row_error(index, field, message):
+    return {"index": index, field: [message]}
+
+
+def validate_rows(rows, author_id=None, allow_author=False):
+    """
+    اعتبارسنجی برداری یک دسته ردیف: بررسی شکل هر ردیف در پایتون، سپس یک کوئری
+    برای همه‌ی mentionهای صریح و یک resolve برای همه‌ی handleها و نویسنده‌ها.
+    خروجی (cleaned, errors) است؛ cleaned شامل (author_id, content, mention_ids) است.
+    """
+    parsed, errors = [], []
+    explicit_ids, handles = set(), set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append(_row_error(index, "non_field_errors", "هر ردیف باید یک شیء JSON باشد."))
+            continue
+        content = row.get("content")
+        if not isinstance(content, str) or not content.strip():
+            errors.append(_row_error(index, "content", "متن پست الزامی است."))
+            continue
+        mentions = row.get("mentions", [])
+        try:
+            if not isinstance(mentions, list):
+                raise ValueError
+            mention_ids = list(dict.fromkeys(uuid.UUID(str(value)) for value in mentions))
+        except ValueError:
+            errors.append(_row_error(index, "mentions", "mentions باید لیستی از UUID باشد."))
+            continue
+        author = row.get("author") if allow_author else None
+        if author is not None and not isinstance(author, str):
+            errors.append(_row_error(index, "author", "author باید یوزرنیم باشد."))
+            continue
+
+        row_handles = parse_handles(content)
+        explicit_ids.update(mention_ids)
+        handles.update(row_handles)
+        if author:
+            handles.add(author.lstrip("@").lower())
+        parsed.append((index, author, content, mention_ids, row_handles))
+
+    existing = set(User.objects.filter(pk__in=explicit_ids).values_list("pk", flat=True)) if explicit_ids else set()
+    resolved = resolve_handles(sorted(handles))
+
+    cleaned = []
+    for index, author, content, mention_ids, row_handles in parsed:
+        missing = [user_id for user_id in mention_ids if user_id not in existing]
+        if missing:
+            errors.append(_row_error(index, "mentions", f'Invalid pk "{missing[0]}" - object does not exist.'))
+            continue
+        row_author_id = resolved.get(author.lstrip("@").lower()) if author else author_id
+        if row_author_id is None:
+            errors.append(_row_error(index, "author", "نویسنده‌ی پست یافت نشد."))
+            continue
+        for user_id in (resolved[handle] for handle in row_handles if handle in resolved):
+            if user_id not in mention_ids:
+                mention_ids.append(user_id)
+        cleaned.append((row_author_id, content, mention_ids))
+    errors.sort(key=lambda error: error["index"])
+    return cleaned, errors
+
+
+def insert_posts(cleaned):
+    """
+    درج یک دسته‌ی اعتبارسنجی‌شده: یک bulk_create برای پست‌ها، یک bulk_create برای
+    همه‌ی ردیف‌های mention، سپس یک کار fan-out تایم‌لاین و یک کار ایندکس جستجو
+    برای کل دسته. باید داخل تراکنش صدا زده شود.
+    """
+    posts = [
+        Post(
+            author_id=author_id,
+            content=content,
+            mention_count=len(mention_ids),
+            fanout_on_read=feed.fanout_on_read_for(author_id, mention_ids),
+        )
+        for author_id, content, mention_ids in cleaned
+    ]
+    Post.objects.bulk_create(posts)
+    PostMention.objects.bulk_create(
+        [
+            PostMention(post_id=post.pk, user_id=user_id)
+            for post, (_, _, mention_ids) in zip(posts, cleaned)
+            for user_id in mention_ids
+        ],
+        ignore_conflicts=True,
+    )
+    post_ids = [post.pk for post in posts]
+    taskqueue.enqueue("feed.fanout_new_posts", post_ids=post_ids)
+    taskqueue.enqueue("search.index", model=Post._meta.label_lower, pks=post_ids)
+    return posts
+
+
+def import_posts(rows, author_id=None, allow_author=False, chunk_size=None):
+    """
+    ورود پست‌ها از یک iterable (مثلاً NDJSON خوانده‌شده از دیسک) در chunkهای
+    chunk_size ردیفی، همه در یک تراکنش. با اولین خطای اعتبارسنجی همه‌چیز
+    rollback و serializers.ValidationError با شماره‌ی ردیف‌ها بالا می‌رود.
+    """
+    chunk_size = chunk_size or settings.BULK_POSTS["CHUNK_SIZE"]
+    rows = iter(rows)
+    started = time.perf_counter()
+    created, offset = [], 0
+    with transaction.atomic():
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            cleaned, errors = validate_rows(chunk, author_id=author_id, allow_author=allow_author)
+            if errors:
+                for error in errors:
+                    error["index"] += offset
+                raise serializers.ValidationError({"errors": errors})
+            created.extend(post.pk for post in insert_posts(cleaned))
+            offset += len(chunk)
+        if created:
+            invalidate_post_responses()
+
+    seconds = time.perf_counter() - started
+    return {
+        "created": len(created),
+        "ids": created,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(len(created) / seconds, 1) if seconds else None,
+    }
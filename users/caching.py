@@ -0,0 +1,83 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+MISSING = object()
+
+# همه‌ی نمونه‌ها برای خروجی آمار در /metrics
+TIERED_CACHES = []
+
+
+class TieredCache:
+    """
+    کش دوسطحی: یک LRU محلی با TTL در هر پروسس، و پشت آن کش جنگو که بین
+    پروسس‌ها مشترک است. حذف یک کلید هر دو سطح را پاک می‌کند؛ نسخه‌های محلی
+    پروسس‌های دیگر حداکثر تا TTL معتبر می‌مانند.
+    """
+
+    def __init__(self, prefix, ttl, max_entries, alias="default"):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        TIERED_CACHES.append(self)
+
+    def _shared_key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._local.move_to_end(key)
+                    self.local_hits += 1
+                    return entry[1]
+                del self._local[key]
+
+        value = caches[self.alias].get(self._shared_key(key), MISSING)
+        if value is MISSING:
+            with self._lock:
+                self.misses += 1
+            return MISSING
+        with self._lock:
+            self.shared_hits += 1
+        self._store_local(key, value)
+        return value
+
+    def set(self, key, value):
+        caches[self.alias].set(self._shared_key(key), value, self.ttl)
+        self._store_local(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        caches[self.alias].delete(self._shared_key(key))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "local_hits": self.local_hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "local_entries": len(self._local),
+            }
@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.fields import ISO_8601, DateTimeField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .instrumentation import phase
+from .models import CommentMention, PostMention
+
+
+# مسیر فقط‌خواندنی لیست‌های پرترافیک: به جای ساختن instance مدل و اجرای فیلدهای
+# ModelSerializer برای هر ردیف، ستون‌ها با .values() خوانده و dict خروجی مستقیم
+# ساخته می‌شود. خروجی (نوع مقادیر، ترتیب کلیدها و JSON رندرشده) باید با
+# PostSerializer و CommentSerializer یکسان بماند؛ CompiledSerializerTests این را بررسی می‌کند.
+
+
+def datetime_formatter():
+    """
+    معادل DateTimeField.to_representation؛ منطقه‌ی زمانی یک بار برای کل لیست خوانده می‌شود.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if not settings.USE_TZ or output_format is None or output_format.lower() != ISO_8601:
+        return DateTimeField().to_representation
+    tz = timezone.get_current_timezone()
+
+    def to_representation(value):
+        if not value:
+            return None
+        text = value.astimezone(tz).isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+
+    return to_representation
+
+
+def mention_map(model, owner_field, owner_ids):
+    """
+    mentionهای همه‌ی ردیف‌ها با یک کوئری روی جدول واسط، به ترتیب MentionsField.
+    """
+    mentions = defaultdict(list)
+    if owner_ids:
+        rows = model.objects.filter(**{f"{owner_field}__in": owner_ids}).values_list(owner_field, "user_id")
+        for owner_id, user_id in rows:
+            mentions[owner_id].append(user_id)
+    for user_ids in mentions.values():
+        user_ids.sort()
+    return mentions
+
+
+class CompiledSerializer:
+    """
+    columns ستون‌های .values() هستند؛ ستون‌های ترتیب صفحه‌بندی (keyset) هم به آن اضافه می‌شوند.
+    """
+
+    columns = ()
+
+    def rows(self, queryset, ordering=()):
+        extra = [key.lstrip("-") for key in ordering if key.lstrip("-") not in self.columns]
+        return queryset.prefetch_related(None).values(*self.columns, *extra)
+
+    def serialize(self, rows):
+        raise NotImplementedError
+
+
+class CompiledPostSerializer(CompiledSerializer):
+    columns = (
+        "id", "author_id", "author__username", "author__first_name", "author__last_name",
+        "content", "comment_count", "mention_count", "created_at", "updated_at",
+    )
+
+    def serialize(self, rows):
+        to_datetime = datetime_formatter()
+        mentions = mention_map(PostMention, "post_id", [row["id"] for row in rows])
+        return [
+            {
+                "id": str(row["id"]),
+                "author": {
+                    "id": str(row["author_id"]),
+                    "username": row["author__username"],
+                    "first_name": row["author__first_name"],
+                    "last_name": row["author__last_name"],
+                },
+                "content": row["content"],
+                "mentions": mentions.get(row["id"], []),
+                "comment_count": row["comment_count"],
+                "mention_count": row["mention_count"],
+                "created_at": to_datetime(row["created_at"]),
+                "updated_at": to_datetime(row["updated_at"]),
+            }
+            for row in rows
+        ]
+
+
+class CompiledCommentSerializer(CompiledSerializer):
+    columns = (
+        "id", "post_id", "author_id", "author__username", "author__email", "content",
+        "parent_id", "depth", "reply_count", "created_at", "updated_at",
+    )
+
+    def serialize(self, rows):
+        to_datetime = datetime_formatter()
+        mentions = mention_map(CommentMention, "comment_id", [row["id"] for row in rows])
+        return [
+            {
+                "id": str(row["id"]),
+                "post": row["post_id"],
+                # StringRelatedField یعنی str(User)
+                "author": row["author__username"] or row["author__email"] or str(row["author_id"]),
+                "content": row["content"],
+                "mentions": mentions.get(row["id"], []),
+                "parent": row["parent_id"],
+                "depth": row["depth"],
+                "reply_count": row["reply_count"],
+                "created_at": to_datetime(row["created_at"]),
+                "updated_at": to_datetime(row["updated_at"]),
+            }
+            for row in rows
+        ]
+
+
+class CompiledListMixin:
+    """
+    برای ListAPIViewها: GET لیست از compiled_serializer عبور می‌کند؛ ساخت و
+    ویرایش همچنان با serializer_class است.
+    """
+
+    compiled_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = getattr(self, "keyset_ordering", getattr(self.paginator, "ordering", ()))
+        rows = self.compiled_serializer.rows(queryset, ordering)
+        page = self.paginate_queryset(rows)
+        with phase("serialize"):
+            data = self.compiled_serializer.serialize(list(rows) if page is None else page)
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+POSTS = CompiledPostSerializer()
+COMMENTS = CompiledCommentSerializer()
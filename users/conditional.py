@@ -0,0 +1,41 @@
+import functools
+import hashlib
+from calendar import timegm
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def conditional_get(method):
+    """
+    پاسخ 304 برای If-None-Match / If-Modified-Since، بدون serialize کردن بدنه.
+    ویو باید get_conditional_validators را پیاده کند که (etag, last_modified)
+    یا None (برای اجرای عادی ویو) برمی‌گرداند.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        validators = self.get_conditional_validators(request, *args, **kwargs)
+        if validators is None:
+            return method(self, request, *args, **kwargs)
+
+        etag, last_modified = validators
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            # cache_anonymous_get بدنه را با همین ETag کلید می‌کند
+            request.conditional_etag = etag
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    return wrapper
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+
+from django.db import connections
+
+
+# pool اتصال ساده و thread-safe برای درایورهایی که pool داخلی ندارند (psycopg2).
+# اتصال‌ها در همان thread درخواست‌کننده ساخته می‌شوند؛ آمار زمان انتظار برای
+# تنظیم MAX_SIZE و TIMEOUT نگه داشته می‌شود.
+
+POOLS = {}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    check(conn, idle_seconds) هنگام تحویل اتصال بیکار صدا زده می‌شود و با False
+    اتصال دور انداخته می‌شود. reset(conn) هنگام برگشت اتصال صدا زده می‌شود و با
+    False یا خطا اتصال بسته می‌شود. اتصال‌های بیکارتر از max_idle (تا وقتی تعداد
+    اتصال‌ها بیش از min_size است) بسته می‌شوند.
+    """
+
+    def __init__(self, name, min_size=0, max_size=10, timeout=10.0, max_idle=300.0, check=None, reset=None):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("min_size باید بین ۰ و max_size و max_size حداقل ۱ باشد.")
+        self.name = name
+        self.min_size, self.max_size = min_size, max_size
+        self.timeout, self.max_idle = timeout, max_idle
+        self._check, self._reset = check, reset
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, returned_at)؛ آخرین اتصال برگشتی اول تحویل می‌شود
+        self._size = 0
+        self._waiting = 0
+        self._counters = dict.fromkeys(
+            ("requests", "waits", "timeouts", "connections_created", "connections_discarded"), 0
+        )
+        self._wait_total = self._wait_max = 0.0
+        POOLS[name] = self
+
+    def getconn(self, connect):
+        """
+        اتصال بیکار یا در صورت جا داشتن pool اتصال تازه با connect()؛ در غیر این
+        صورت تا timeout صبر می‌کند و PoolTimeout می‌دهد.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            self._counters["requests"] += 1
+        waited = False
+        while True:
+            try:
+                conn, idle_seconds, waited_now = self._acquire(deadline)
+            except PoolTimeout:
+                self._record_wait(time.monotonic() - started, True)
+                raise
+            waited |= waited_now
+            if conn is None:
+                # زمان انتظار بدون زمان ساخت اتصال حساب می‌شود
+                self._record_wait(time.monotonic() - started, waited)
+                try:
+                    conn = connect()
+                except BaseException:
+                    self._release_slot()
+                    raise
+                with self._cond:
+                    self._counters["connections_created"] += 1
+                return conn
+            if self._check is None or self._healthy(conn, idle_seconds):
+                self._record_wait(time.monotonic() - started, waited)
+                return conn
+            self._discard(conn)
+
+    def _acquire(self, deadline):
+        """
+        (اتصال بیکار، مدت بیکاری، منتظر ماند یا نه)؛ اتصال None یعنی جای اتصال تازه رزرو شد.
+        """
+        expired = []
+        waited = False
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    while self._idle:
+                        conn, returned_at = self._idle.pop()
+                        if now - returned_at > self.max_idle and self._size > self.min_size:
+                            self._size -= 1
+                            self._counters["connections_discarded"] += 1
+                            expired.append(conn)
+                            continue
+                        return conn, now - returned_at, waited
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None, 0.0, waited
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"pool {self.name}: پس از {self.timeout:g} ثانیه اتصالی آزاد نشد "
+                            f"({self.max_size} اتصال در حال استفاده)."
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            for conn in expired:
+                _close_quietly(conn)
+
+    def _healthy(self, conn, idle_seconds):
+        try:
+            return self._check(conn, idle_seconds)
+        except Exception:
+            return False
+
+    def _record_wait(self, seconds, waited):
+        with self._cond:
+            self._counters["waits"] += waited
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        _close_quietly(conn)
+        with self._cond:
+            self._counters["connections_discarded"] += 1
+        self._release_slot()
+
+    def putconn(self, conn, discard=False):
+        if not discard and self._reset is not None:
+            try:
+                discard = self._reset(conn) is False
+            except Exception:
+                discard = True
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            _close_quietly(conn)
+        if POOLS.get(self.name) is self:
+            del POOLS[self.name]
+
+    def stats(self):
+        with self._cond:
+            requests = self._counters["requests"]
+            return {
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+                "waiting": self._waiting,
+                **self._counters,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+                "wait_ms_mean": round(self._wait_total * 1000 / requests, 3) if requests else 0.0,
+            }
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _psycopg_pool_stats(pool):
+    # نام کلیدهای psycopg_pool به نام‌های ConnectionPool بالا برگردانده می‌شوند
+    raw = pool.get_stats()
+    requests = raw.get("requests_num", 0)
+    wait_ms = raw.get("requests_wait_ms", 0)
+    return {
+        "size": raw.get("pool_size", 0),
+        "idle": raw.get("pool_available", 0),
+        "in_use": raw.get("pool_size", 0) - raw.get("pool_available", 0),
+        "max_size": raw.get("pool_max", 0),
+        "waiting": raw.get("requests_waiting", 0),
+        "requests": requests,
+        "waits": raw.get("requests_queued", 0),
+        "timeouts": raw.get("requests_errors", 0),
+        "connections_created": raw.get("connections_num", 0),
+        "connections_discarded": raw.get("connections_lost", 0),
+        "wait_ms_total": float(wait_ms),
+        "wait_ms_max": None,
+        "wait_ms_mean": round(wait_ms / requests, 3) if requests else 0.0,
+    }
+
+
+def pool_stats():
+    """
+    آمار همه‌ی poolهای این پردازه به تفکیک alias: pool داخلی psycopg2 و pool
+    بومی psycopg3 (OPTIONS['pool']). با اتصال پایدار یا بدون pool خالی است.
+    """
+    stats = {name: pool.stats() for name, pool in POOLS.items()}
+    for alias in connections:
+        native = getattr(type(connections[alias]), "_connection_pools", {}).get(alias)
+        if native is not None and hasattr(native, "get_stats"):
+            stats[alias] = _psycopg_pool_stats(native)
+    return stats
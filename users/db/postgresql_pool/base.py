@@ -0,0 +1,87 @@
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+from users.db.pool import POOLS, ConnectionPool
+
+
+if is_psycopg3:
+    raise ImproperlyConfigured(
+        "users.db.postgresql_pool فقط برای psycopg2 است؛ با psycopg3 از DB_CONN_MODE=pool (pool بومی) استفاده کنید."
+    )
+
+from psycopg2 import extensions  # noqa: E402
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    بک‌اند PostgreSQL با pool داخلی برای psycopg2. Django هر اتصال را در پایان
+    request می‌بندد (CONN_MAX_AGE=0) و این بستن اتصال را به pool برمی‌گرداند.
+    تنظیمات pool در کلید POOL خود DATABASES[alias] است.
+    """
+
+    _pool_lock = threading.Lock()
+
+    @property
+    def connection_pool(self):
+        pool = POOLS.get(self.alias)
+        if pool is None:
+            with self._pool_lock:
+                pool = POOLS.get(self.alias)
+                if pool is None:
+                    options = self.settings_dict.get("POOL", {})
+                    pool = ConnectionPool(
+                        self.alias,
+                        min_size=options.get("MIN_SIZE", 0),
+                        max_size=options.get("MAX_SIZE", 10),
+                        timeout=options.get("TIMEOUT", 10.0),
+                        max_idle=options.get("MAX_IDLE", 300.0),
+                        check=self._check_pooled_connection,
+                        reset=self._reset_pooled_connection,
+                    )
+        return pool
+
+    def _check_pooled_connection(self, connection, idle_seconds):
+        if connection.closed:
+            return False
+        # مثل CONN_HEALTH_CHECKS: فقط اتصالی که مدتی بیکار مانده ping می‌شود
+        check_after = self.settings_dict.get("POOL", {}).get("CHECK_AFTER", 0)
+        if self.settings_dict["CONN_HEALTH_CHECKS"] and idle_seconds >= check_after:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+        return True
+
+    def _reset_pooled_connection(self, connection):
+        if connection.closed:
+            return False
+        status = connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+
+    def get_new_connection(self, conn_params):
+        parent = super().get_new_connection
+        connection = self.connection_pool.getconn(lambda: parent(conn_params))
+        # get_new_connection والد isolation_level را روی همین wrapper تنظیم می‌کند؛
+        # اتصال برگشتی از pool هم همان سطح تنظیم‌شده را دارد
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict["OPTIONS"].get("isolation_level", base.IsolationLevel.READ_COMMITTED)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.connection_pool.putconn(self.connection)
+
+    def close_pool(self):
+        # ensure_timezone و تغییر تنظیمات در تست‌ها: اتصال‌های بیکار با تنظیمات قدیمی بسته می‌شوند
+        pool = POOLS.get(self.alias)
+        if pool is not None:
+            pool.close()
@@ -0,0 +1,85 @@
+import json
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Comment, Post, UsernameChangeHistory
+from .serializers import UserSerializer
+
+
+User = get_user_model()
+
+EXPORT_CHUNK_SIZE = 2000
+# خط‌ها قبل از ارسال (و فشرده‌سازی) تا این اندازه جمع می‌شوند
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def _mention_ids(instance):
+    return [str(user.pk) for user in instance.mentions.all()]
+
+
+def export_records(user, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    رکوردهای خروجی کاربر به ترتیب: پروفایل، پست‌ها، کامنت‌ها، تاریخچه‌ی یوزرنیم.
+    هر جدول با iterator(chunk_size) (server-side cursor در PostgreSQL) خوانده
+    می‌شود و mentionها برای هر chunk با یک کوئری prefetch می‌شوند.
+    """
+    mentions = Prefetch("mentions", queryset=User.objects.only("id"))
+    yield {"type": "profile", "data": UserSerializer(user).data}
+
+    posts = Post.objects.filter(author=user).prefetch_related(mentions).order_by("created_at", "id")
+    for post in posts.iterator(chunk_size=chunk_size):
+        yield {"type": "post", "data": {
+            "id": post.pk,
+            "content": post.content,
+            "mentions": _mention_ids(post),
+            "comment_count": post.comment_count,
+            "created_at": post.created_at,
+            "updated_at": post.updated_at,
+        }}
+
+    comments = Comment.objects.filter(author=user).prefetch_related(mentions).order_by("created_at", "id")
+    for comment in comments.iterator(chunk_size=chunk_size):
+        yield {"type": "comment", "data": {
+            "id": comment.pk,
+            "post": comment.post_id,
+            "parent": comment.parent_id,
+            "content": comment.content,
+            "mentions": _mention_ids(comment),
+            "created_at": comment.created_at,
+            "updated_at": comment.updated_at,
+        }}
+
+    history = UsernameChangeHistory.objects.filter(user=user).order_by("changed_at", "id")
+    for row in history.values("old_username", "new_username", "changed_at").iterator(chunk_size=chunk_size):
+        yield {"type": "username_history", "data": row}
+
+
+def ndjson_chunks(records, buffer_size=EXPORT_BUFFER_SIZE):
+    buffer = []
+    size = 0
+    for record in records:
+        line = (json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder) + "\n").encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(user, compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    chunks = ndjson_chunks(export_records(user, chunk_size))
+    return gzip_chunks(chunks) if compress else chunks
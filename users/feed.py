@@ -0,0 +1,201 @@
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Post, TimelineEntry
+from .pagination import keyset_filter
+
+
+TIMELINE_ORDERING = ("-created_at", "-id")
+
+
+class TimelineStore:
+    """
+    ذخیره‌ی تایم‌لاین هر کاربر به صورت (created_at, post_id)، نزولی و با طول محدود.
+    """
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+
+    def push(self, user_ids, post_id, created_at):
+        raise NotImplementedError
+
+    def remove(self, user_ids, post_id):
+        raise NotImplementedError
+
+    def page(self, user_id, before=None, limit=20):
+        raise NotImplementedError
+
+    def push_many(self, entries):
+        """
+        entries: (user_id, post_id, created_at)؛ برای درج دسته‌ای پست‌های جدید.
+        """
+        targets = defaultdict(list)
+        for user_id, post_id, created_at in entries:
+            targets[(post_id, created_at)].append(user_id)
+        for (post_id, created_at), user_ids in targets.items():
+            self.push(user_ids, post_id, created_at)
+
+
+class InMemoryTimelineStore(TimelineStore):
+    def __init__(self, max_length):
+        super().__init__(max_length)
+        self._timelines = {}
+        self._lock = threading.Lock()
+
+    def push(self, user_ids, post_id, created_at):
+        key = (created_at, post_id)
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.setdefault(user_id, [])
+                index = bisect.bisect_left(timeline, key)
+                if index < len(timeline) and timeline[index] == key:
+                    continue
+                timeline.insert(index, key)
+                if len(timeline) > self.max_length:
+                    del timeline[: len(timeline) - self.max_length]
+
+    def remove(self, user_ids, post_id):
+        with self._lock:
+            for user_id in user_ids:
+                timeline = self._timelines.get(user_id)
+                if timeline:
+                    timeline[:] = [entry for entry in timeline if entry[1] != post_id]
+
+    def page(self, user_id, before=None, limit=20):
+        with self._lock:
+            timeline = self._timelines.get(user_id, [])
+            end = len(timeline) if before is None else bisect.bisect_left(timeline, tuple(before))
+            return timeline[max(end - limit, 0):end][::-1]
+
+
+class DatabaseTimelineStore(TimelineStore):
+    def push(self, user_ids, post_id, created_at):
+        self.push_many([(user_id, post_id, created_at) for user_id in user_ids])
+
+    def push_many(self, entries, batch_size=1000):
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id, created_at=created_at) for user_id, post_id, created_at in entries],
+            ignore_conflicts=True,
+            batch_size=batch_size,
+        )
+        self._trim({user_id for user_id, _, _ in entries})
+
+    def _trim(self, user_ids):
+        user_ids = list(user_ids)
+        overflow = list(
+            TimelineEntry.objects.filter(user_id__in=user_ids)
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=F("user_id"),
+                order_by=(F("created_at").desc(), F("post_id").desc()),
+            ))
+            .filter(rank__gt=self.max_length)
+            .values_list("pk", flat=True)
+        )
+        if overflow:
+            TimelineEntry.objects.filter(pk__in=overflow).delete()
+
+    def remove(self, user_ids, post_id):
+        TimelineEntry.objects.filter(user_id__in=list(user_ids), post_id=post_id).delete()
+
+    def page(self, user_id, before=None, limit=20):
+        entries = TimelineEntry.objects.filter(user_id=user_id)
+        if before is not None:
+            entries = entries.filter(keyset_filter(("-created_at", "-post_id"), before))
+        return list(entries.order_by("-created_at", "-post_id").values_list("created_at", "post_id")[:limit])
+
+
+_store = None
+
+
+def get_timeline_store():
+    global _store
+    if _store is None:
+        backend = import_string(settings.FEED["BACKEND"])
+        _store = backend(max_length=settings.FEED["MAX_LENGTH"])
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_timeline_store(setting, **kwargs):
+    global _store
+    if setting == "FEED":
+        _store = None
+
+
+def fanout_on_read_for(author_id, mention_ids):
+    return len(set(mention_ids) - {author_id}) > settings.FEED["FANOUT_LIMIT"]
+
+
+def fanout_new_posts(posts):
+    """
+    نسخه‌ی دسته‌ای sync_post_fanout برای پست‌های تازه‌ساخته (درج bulk)؛
+    posts لیست (post, mention_ids) است و fanout_on_read هر پست از قبل تعیین شده.
+    """
+    entries = []
+    for post, mention_ids in posts:
+        targets = {post.author_id}
+        if not post.fanout_on_read:
+            targets.update(mention_ids)
+        entries.extend((user_id, post.pk, post.created_at) for user_id in targets)
+    if entries:
+        get_timeline_store().push_many(entries)
+
+
+def sync_post_fanout(post, mention_ids, previous_mention_ids=(), created=False):
+    """
+    fan-out on write: پست در تایم‌لاین نویسنده و کاربران mention‌شده قرار می‌گیرد.
+    اگر تعداد mentionها از FANOUT_LIMIT بیشتر باشد، پست فقط با fanout_on_read
+    علامت می‌خورد و هنگام خواندن تایم‌لاین اضافه می‌شود.
+    """
+    store = get_timeline_store()
+    mention_ids = set(mention_ids) - {post.author_id}
+    previous_mention_ids = set(previous_mention_ids) - {post.author_id}
+    fanout_on_read = fanout_on_read_for(post.author_id, mention_ids)
+
+    old_targets = set() if post.fanout_on_read else previous_mention_ids
+    new_targets = set() if fanout_on_read else mention_ids
+    if created:
+        new_targets.add(post.author_id)
+
+    removed = old_targets - new_targets
+    added = new_targets - old_targets
+    if removed:
+        store.remove(removed, post.pk)
+    if added:
+        store.push(added, post.pk, post.created_at)
+    if fanout_on_read != post.fanout_on_read:
+        post.fanout_on_read = fanout_on_read
+        Post.objects.filter(pk=post.pk).update(fanout_on_read=fanout_on_read)
+
+
+def read_timeline(user, queryset, position=None, limit=20):
+    """
+    ادغام تایم‌لاین ذخیره‌شده با پست‌های fanout_on_read که کاربر در آن‌ها mention شده.
+    """
+    stored = get_timeline_store().page(user.pk, before=position, limit=limit)
+
+    pulled = Post.objects.filter(fanout_on_read=True, mentions=user)
+    if position is not None:
+        pulled = pulled.filter(keyset_filter(TIMELINE_ORDERING, position))
+    pulled = pulled.order_by(*TIMELINE_ORDERING).values_list("created_at", "id")[:limit]
+
+    keys, seen = [], set()
+    for created_at, post_id in heapq.merge(stored, list(pulled), reverse=True):
+        if post_id not in seen:
+            seen.add(post_id)
+            keys.append(post_id)
+        if len(keys) == limit:
+            break
+
+    posts = queryset.in_bulk(keys)
+    return [posts[post_id] for post_id in keys if post_id in posts]
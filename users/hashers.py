@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _cost(name, default):
+    return getattr(settings, "PASSWORD_HASHER_COST", {}).get(name, default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _cost("PBKDF2_ITERATIONS", hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return _cost("ARGON2_TIME_COST", hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _cost("ARGON2_MEMORY_COST", hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _cost("ARGON2_PARALLELISM", hashers.Argon2PasswordHasher.parallelism)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _cost("SCRYPT_WORK_FACTOR", hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return _cost("SCRYPT_BLOCK_SIZE", hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return _cost("SCRYPT_PARALLELISM", hashers.ScryptPasswordHasher.parallelism)
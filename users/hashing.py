@@ -0,0 +1,132 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, identify_hasher, is_password_usable
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+def verify_password(raw_password, encoded):
+    """
+    مثل check_password جنگو ولی بدون setter و بدون دسترسی به دیتابیس، تا در
+    thread pool اجرا شود. خروجی: (درست بودن رمز، نیاز به هش مجدد)
+    """
+    if raw_password is None or not is_password_usable(encoded):
+        return False, False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False, False
+    preferred = get_hasher("default")
+    is_correct = hasher.verify(raw_password, encoded)
+    must_update = is_correct and (
+        hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+    )
+    return is_correct, must_update
+
+
+class HashingPool:
+    """
+    thread pool محدود برای هش رمز عبور. hashlib و argon2 هنگام هش GIL را آزاد
+    می‌کنند. اگر تعداد کارهای در حال اجرا و در صف از workers + max_queue بیشتر
+    شود، به جای انتظار بی‌پایان PoolSaturated برمی‌گرداند.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated()
+            self.in_flight += 1
+            self.submitted += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        queued_at = time.monotonic()
+
+        def task():
+            waited = time.monotonic() - queued_at
+            with self._lock:
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+
+        try:
+            return self._executor.submit(task)
+        except BaseException:
+            with self._lock:
+                self.in_flight -= 1
+            raise
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "peak_in_flight": self.peak_in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        _pool = HashingPool(
+            workers=settings.HASHING_POOL["WORKERS"] or os.cpu_count() or 1,
+            max_queue=settings.HASHING_POOL["MAX_QUEUE"],
+        )
+    return _pool
+
+
+def current_pool():
+    """
+    pool موجود یا None؛ برخلاف get_hashing_pool فقط برای خواندن آمار pool نمی‌سازد.
+    """
+    return _pool
+
+
+@receiver(setting_changed)
+def _reset_hashing_pool(setting, **kwargs):
+    global _pool
+    if setting == "HASHING_POOL" and _pool is not None:
+        _pool.shutdown()
+        _pool = None
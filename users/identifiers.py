@@ -0,0 +1,74 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
+
+
+User = get_user_model()
+
+EMAIL = "email"
+USERNAME = "username"
+PHONE = "phone"
+
+PHONE_RE = re.compile(r"^\+?\d+$")
+
+# ترتیب اولویت همان ترتیب قبلی backend است: ایمیل، یوزرنیم، شماره تلفن
+PRIORITY = (EMAIL, USERNAME, PHONE)
+
+
+def classify_identifier(identifier):
+    """
+    فیلدهایی که یک شناسه می‌تواند به آن‌ها اشاره کند، با مقدار نرمال‌شده‌ی هرکدام.
+    """
+    value = identifier.strip()
+    candidates = {USERNAME: value.lower()}
+    if "@" in value:
+        candidates[EMAIL] = value.lower()
+    if PHONE_RE.match(value):
+        candidates[PHONE] = value
+    return candidates
+
+
+def _condition(field, value):
+    if field == PHONE:
+        return Q(phone=value)
+    return Q(**{f"{field}_lower": value})
+
+
+def lookup_queryset(candidates):
+    queryset = User.objects.all()
+    if EMAIL in candidates:
+        queryset = queryset.annotate(email_lower=Lower("email"))
+    if USERNAME in candidates:
+        queryset = queryset.annotate(username_lower=Lower("username"))
+    condition = Q()
+    for field, value in candidates.items():
+        condition |= _condition(field, value)
+    return queryset.filter(condition)
+
+
+def resolve_identifier(identifier):
+    """
+    پیدا کردن کاربر با یک کوئری روی ایندکس‌های Lower(email)، Lower(username) و phone.
+    """
+    candidates = classify_identifier(identifier)
+    users = list(lookup_queryset(candidates)[: len(candidates)])
+    for field in PRIORITY:
+        if field not in candidates:
+            continue
+        for user in users:
+            stored = getattr(user, field)
+            if stored is not None and (stored if field == PHONE else stored.lower()) == candidates[field]:
+                return user
+    return None
+
+
+def get_user_by(field, value):
+    """
+    جستجوی مستقیم روی یک فیلد مشخص (ایمیل یا تلفن) برای فراموشی/بازیابی رمز.
+    """
+    value = value.strip()
+    if field != PHONE:
+        value = value.lower()
+    return lookup_queryset({field: value}).first()
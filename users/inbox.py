@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+
+from .models import CommentMention, PostMention
+from .pagination import merge_streams, merged_stream_filter
+
+
+User = get_user_model()
+
+# ترتیب سراسری صندوق: (created_at, kind, id) نزولی؛ id فقط در هر جریان یکتاست
+INBOX_ORDERING = ("-created_at", "-kind", "-id")
+
+
+def _streams(user):
+    mention_ids = User.objects.only("id")
+    return (
+        ("post", PostMention.objects.filter(user=user).select_related("post__author").prefetch_related(
+            Prefetch("post__mentions", queryset=mention_ids),
+        )),
+        ("comment", CommentMention.objects.filter(user=user).select_related("comment__author").prefetch_related(
+            Prefetch("comment__mentions", queryset=mention_ids),
+        )),
+    )
+
+
+def read_mentions(user, position=None, limit=20):
+    """
+    ادغام k-راهه‌ی mentionهای پست و کامنت؛ هر جریان با keyset روی ایندکس
+    (user, -created_at, -id) حداکثر limit ردیف می‌خواند، پس تعداد کوئری هر صفحه ثابت است.
+    """
+    streams = []
+    for kind, queryset in _streams(user):
+        if position is not None:
+            queryset = queryset.filter(merged_stream_filter("created_at", kind, position))
+        rows = list(queryset.order_by("-created_at", "-id")[:limit])
+        for row in rows:
+            row.kind = kind
+        streams.append([((row.created_at, kind, row.id), row) for row in rows])
+
+    return merge_streams(streams, limit)
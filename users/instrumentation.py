@@ -0,0 +1,212 @@
+import contextvars
+import functools
+import logging
+import random
+import re
+import time
+import traceback
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework import serializers
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# وضعیت request جاری؛ sync_to_async متغیرهای context را به thread دیتابیس می‌برد،
+# پس کوئری‌های ویوهای async هم به همان request نسبت داده می‌شوند.
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+# IN (%s, %s, ...) با طول‌های مختلف یک شکل کوئری حساب می‌شود
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class RequestMetrics:
+    __slots__ = (
+        "queries", "db_seconds", "slow_queries", "phases", "shapes", "sampled", "stacks", "slow_ms", "threshold", "depth",
+    )
+
+    def __init__(self, sampled, slow_ms, threshold):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.slow_queries = 0
+        self.phases = {}
+        self.shapes = {}
+        self.sampled = sampled
+        self.stacks = {}
+        self.slow_ms = slow_ms
+        self.threshold = threshold
+        self.depth = 0
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+
+def project_stack():
+    """
+    فقط frameهای کد خود پروژه؛ stack کامل جنگو و DRF برای پیدا کردن محل کوئری مفید نیست.
+    """
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base) and "site-packages" not in frame.filename
+    ]
+    return "".join(traceback.format_list(frames[-8:]))
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    execute_wrapper نصب‌شده روی همه‌ی اتصال‌ها؛ بیرون از request فقط یک ContextVar.get هزینه دارد.
+    """
+    state = _current.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        state.queries += 1
+        state.db_seconds += elapsed
+        shape = _IN_LIST.sub("IN (...)", sql) if isinstance(sql, str) and "IN (" in sql else sql
+        count = state.shapes[shape] = state.shapes.get(shape, 0) + 1
+        slow = elapsed * 1000 >= state.slow_ms
+        state.slow_queries += slow
+        if state.sampled:
+            if slow:
+                state.stacks.setdefault(("slow", shape), (elapsed, params, project_stack()))
+            if count == state.threshold + 1:
+                state.stacks[("n+1", shape)] = (elapsed, params, project_stack())
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # execute_wrappers روی wrapper اتصال می‌ماند و با اتصال دوباره‌ی همان thread تکرار نمی‌شود
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def phase(name):
+    """
+    زمان یک مرحله (serialize، render) برای request جاری؛ فراخوانی تودرتو یک بار حساب می‌شود.
+    """
+    state = _current.get()
+    if state is None or state.depth:
+        yield
+        return
+    state.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        state.depth -= 1
+        state.add_phase(name, time.perf_counter() - started)
+
+
+def _timed_data(prop):
+    @functools.wraps(prop.fget)
+    def data(self):
+        with phase("serialize"):
+            return prop.fget(self)
+
+    return property(data)
+
+
+def install_serializer_timing():
+    """
+    DRF برای زمان ساختن serializer.data هوکی ندارد؛ خاصیت data در Serializer و
+    ListSerializer یک بار پوشانده می‌شود. مسیر compiled خودش phase را صدا می‌زند.
+    """
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, "__wrapped__", None):
+            cls.data = _timed_data(cls.data)
+
+
+class InstrumentationMiddleware:
+    """
+    برای هر route: تعداد و زمان کوئری‌ها، زمان serialize و render و کل request
+    در histogramهای users.metrics. در درصد METRICS['SAMPLE_RATE'] از requestها
+    کوئری‌های کند و شکل‌های تکرارشده (N+1) با SQL و stack لاگ می‌شوند.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, state, started)
+        return response
+
+    async def __acall__(self, request):
+        state, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, state, started)
+        return response
+
+    def start(self):
+        options = settings.METRICS
+        state = RequestMetrics(
+            sampled=random.random() < options["SAMPLE_RATE"],
+            slow_ms=options["SLOW_QUERY_MS"],
+            threshold=options["N_PLUS_ONE_THRESHOLD"],
+        )
+        return state, _current.set(state), time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # پاسخ DRF بعد از این هوک و بیرون از ویو render می‌شود
+        state = _current.get()
+        if state is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(lambda _: state.add_phase("render", time.perf_counter() - started))
+        return response
+
+    def finish(self, request, response, state, started):
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.route if match is not None else "<unmatched>"
+        labels = (view, request.method)
+        metrics.REQUESTS.inc(view, request.method, str(response.status_code))
+        metrics.REQUEST_SECONDS.observe(elapsed, *labels)
+        metrics.DB_QUERIES.observe(state.queries, *labels)
+        metrics.DB_SECONDS.observe(state.db_seconds, *labels)
+        if "serialize" in state.phases:
+            metrics.SERIALIZE_SECONDS.observe(state.phases["serialize"], *labels)
+        if "render" in state.phases:
+            metrics.RENDER_SECONDS.observe(state.phases["render"], *labels)
+
+        if state.slow_queries:
+            metrics.SLOW_QUERIES.inc(view, amount=state.slow_queries)
+        if any(count > state.threshold for count in state.shapes.values()):
+            metrics.N_PLUS_ONE.inc(view)
+        for (kind, shape), (seconds, params, stack) in state.stacks.items():
+            if kind == "slow":
+                logger.warning(
+                    "slow query (%.1fms) in %s %s\n%s\nparams: %.200r\n%s",
+                    seconds * 1000, request.method, view, shape, params, stack,
+                )
+            else:
+                logger.warning(
+                    "possible N+1: %d similar queries in %s %s\n%s\n%s",
+                    state.shapes[shape], request.method, view, shape, stack,
+                )
@@ -0,0 +1,382 @@
+import http.client
+import json
+import math
+import platform
+import re
+import statistics
+import subprocess
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+User = get_user_model()
+
+SCENARIOS = ("register", "login", "post_list", "comment_list", "me")
+
+# route هر سناریو در /metrics (InstrumentationMiddleware)
+ROUTES = {
+    "register": ("api/users/register/", "POST"),
+    "login": ("api/users/login/", "POST"),
+    "post_list": ("api/users/posts/", "GET"),
+    "comment_list": ("api/users/posts/<uuid:post_id>/comments/", "GET"),
+    "me": ("api/users/me/", "GET"),
+}
+
+
+def percentile(values, q):
+    """
+    nearest-rank روی لیست مرتب‌شده.
+    """
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, math.ceil(q * len(values)) - 1))]
+
+
+class ClientTarget:
+    """
+    همین پردازه با APIClient؛ تعداد کوئری هر request دقیق شمرده می‌شود.
+    """
+
+    name = "client"
+    concurrent = False
+
+    def __init__(self):
+        self.client = APIClient(SERVER_NAME="localhost")
+
+    def request(self, method, path, body=None, token=None):
+        extra = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.generic(
+                method, path, json.dumps(body) if body is not None else "", content_type="application/json", **extra
+            )
+        return response.status_code, response.content, len(queries.captured_queries)
+
+    def query_totals(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class HTTPTarget:
+    """
+    سرور واقعی (serve یا runserver). تعداد کوئری از /metrics همان سرور خوانده
+    می‌شود و فقط با یک worker دقیق است؛ در غیر این صورت آمار یک worker است.
+    throttle احراز هویت سرور باید باز باشد (مثل loadtest_server:
+    THROTTLE_AUTH_IP_RATE=1000000/s و THROTTLE_AUTH_IDENTIFIER_RATE=1000000/s)؛
+    پاسخ‌های 429 جدا شمرده می‌شوند و سناریوی throttle‌شده مقایسه نمی‌شود.
+    """
+
+    concurrent = True
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise CommandError("--target باید client یا آدرسی مثل http://127.0.0.1:8000 باشد.")
+        self.name = base_url
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        return conn
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        conn = self.connection()
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read(), None
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self.local.conn = None
+            return None, b"", None
+
+    def query_totals(self):
+        status, body, _ = self.request("GET", "/metrics", token=settings.METRICS["TOKEN"] or None)
+        if status != 200:
+            return None
+        totals = {}
+        for line in body.decode().splitlines():
+            match = re.match(
+                r'http_request_db_queries_(sum|count)\{view="([^"]*)",method="([^"]*)",worker="[^"]*"\} (\S+)', line,
+            )
+            if match:
+                kind, view, method, value = match.groups()
+                totals[(view, method, kind)] = totals.get((view, method, kind), 0) + float(value)
+        return totals
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "بنچمارک register، login، لیست پست‌ها، لیست کامنت‌ها و /me روی داده‌ی seed_data؛ "
+        "p50/p95/p99، throughput و تعداد کوئری به JSON نوشته و با --compare با اجرای قبلی مقایسه می‌شود. "
+        "برای --target http سرور را با throttle باز اجرا کنید (THROTTLE_AUTH_IP_RATE=1000000/s "
+        "THROTTLE_AUTH_IDENTIFIER_RATE=1000000/s)؛ پاسخ‌های 429 جدا از خطا شمرده می‌شوند."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target", default="client", help="client (APIClient) یا http://host:port")
+        parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+        parser.add_argument("--requests", type=int, default=200, help="تعداد request اندازه‌گیری‌شده‌ی هر سناریو")
+        parser.add_argument("--warmup", type=int, default=20)
+        parser.add_argument("--concurrency", type=int, default=1, help="فقط برای سرور HTTP")
+        parser.add_argument("--prefix", default="seed", help="همان prefix اجرای seed_data")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--output", help="مسیر فایل JSON نتیجه")
+        parser.add_argument("--compare", help="JSON اجرای پایه برای تشخیص پسرفت")
+        parser.add_argument("--threshold", type=float, default=10.0, help="درصد مجاز بدتر شدن p95 و throughput")
+        parser.add_argument(
+            "--pbkdf2-iterations", type=int, default=None,
+            help="هزینه‌ی PBKDF2 برای register در target=client؛ login هزینه‌ی هش seed شده را دارد",
+        )
+
+    def handle(self, *args, **options):
+        if options["target"] == "client":
+            target = ClientTarget()
+            if options["concurrency"] != 1:
+                raise CommandError("--concurrency فقط با سرور HTTP معنا دارد.")
+        else:
+            target = HTTPTarget(options["target"])
+        self.run_id = uuid.uuid4().hex[:8]
+        with ExitStack() as stack:
+            if isinstance(target, ClientTarget):
+                stack.enter_context(self.client_settings(options))
+            try:
+                results = self.run(target, options)
+            finally:
+                target.close()
+                User.objects.filter(username__startswith=f"bench-{self.run_id}-").delete()
+
+        report = {
+            "meta": {
+                "commit": self.git_commit(),
+                "created_at": timezone.now().isoformat(),
+                "target": target.name,
+                "requests": options["requests"],
+                "concurrency": options["concurrency"],
+                "python": platform.python_version(),
+                "django": django.get_version(),
+            },
+            "scenarios": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fp:
+                json.dump(report, fp, indent=2)
+                fp.write("\n")
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fp:
+                baseline = json.load(fp)
+            self.compare(baseline, report, options["threshold"])
+
+    def client_settings(self, options):
+        # throttle احراز هویت و هزینه‌ی هش نباید نتیجه‌ی بنچمارک درون‌پردازه را بسازند
+        overrides = {
+            "ALLOWED_HOSTS": [*settings.ALLOWED_HOSTS, "localhost"],
+            "REST_FRAMEWORK": {
+                **settings.REST_FRAMEWORK,
+                "DEFAULT_THROTTLE_RATES": {"auth_ip": None, "auth_identifier": None},
+            },
+        }
+        if options["pbkdf2_iterations"]:
+            overrides["PASSWORD_HASHER_COST"] = {
+                **settings.PASSWORD_HASHER_COST, "PBKDF2_ITERATIONS": options["pbkdf2_iterations"],
+            }
+        return override_settings(**overrides)
+
+    def run(self, target, options):
+        credentials = {"identifier": f"{options['prefix']}0", "password": options["password"]}
+        status, body, _ = target.request("POST", "/api/users/login/", credentials)
+        if status != 200:
+            raise CommandError(f"ورود {credentials['identifier']} ناموفق بود ({status})؛ اول seed_data را اجرا کنید.")
+        token = json.loads(body)["access_token"]
+        status, body, _ = target.request("GET", "/api/users/posts/?page_size=1", token=token)
+        post_id = json.loads(body)["results"][0]["id"]
+
+        counter = iter(range(10**9))
+        scenarios = {
+            "register": lambda: ("POST", "/api/users/register/", {
+                "username": f"bench-{self.run_id}-{next(counter)}",
+                "password": "bench-password",
+            }, None),
+            "login": lambda: ("POST", "/api/users/login/", credentials, None),
+            "post_list": lambda: ("GET", f"/api/users/posts/?page_size={options['page_size']}", None, token),
+            "comment_list": lambda: (
+                "GET", f"/api/users/posts/{post_id}/comments/?page_size={options['page_size']}", None, token,
+            ),
+            "me": lambda: ("GET", "/api/users/me/", None, token),
+        }
+        self.stdout.write(
+            f"{'scenario':13} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}  errors  429"
+        )
+        results = {}
+        for name in options["scenarios"]:
+            self.drive(target, scenarios[name], options["warmup"], options["concurrency"])
+            before = target.query_totals()
+            latencies, queries, errors, throttled, seconds = self.drive(
+                target, scenarios[name], options["requests"], options["concurrency"],
+            )
+            if before is not None:
+                queries = self.queries_from_metrics(name, before, target.query_totals())
+            results[name] = self.summarize(latencies, queries, errors, throttled, seconds)
+            row = results[name]
+            self.stdout.write(
+                f"{name:13} {row['throughput_rps']:>8.1f} {row['p50_ms'] or 0:>8.2f} {row['p95_ms'] or 0:>8.2f} "
+                f"{row['p99_ms'] or 0:>8.2f} {row['queries_mean'] if row['queries_mean'] is not None else '-':>8}  "
+                f"{row['errors']:>6}  {row['throttled']}"
+            )
+        if any(row["throttled"] for row in results.values()):
+            self.stderr.write(
+                "هشدار: سرور پاسخ 429 داد و نتیجه مسیر throttle را اندازه گرفته است؛ "
+                "سرور را با THROTTLE_AUTH_IP_RATE و THROTTLE_AUTH_IDENTIFIER_RATE بالا اجرا کنید."
+            )
+        return results
+
+    def drive(self, target, make_request, count, concurrency):
+        latencies, queries, errors, throttled, lock = [], [], [], [], threading.Lock()
+        remaining = iter(range(count))
+
+        def worker():
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                    method, path, body, token = make_request()
+                started = time.perf_counter()
+                status, _, query_count = target.request(method, path, body, token)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    if status == 429:
+                        throttled.append(elapsed)
+                    elif status is None or not 200 <= status < 300:
+                        errors.append(status)
+                    else:
+                        latencies.append(elapsed)
+                        if query_count is not None:
+                            queries.append(query_count)
+
+        started = time.perf_counter()
+        if concurrency == 1 or not target.concurrent:
+            worker()
+        else:
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return latencies, queries, errors, len(throttled), time.perf_counter() - started
+
+    def queries_from_metrics(self, name, before, after):
+        view, method = ROUTES[name]
+        if after is None:
+            return None
+        total = after.get((view, method, "sum"), 0) - before.get((view, method, "sum"), 0)
+        count = after.get((view, method, "count"), 0) - before.get((view, method, "count"), 0)
+        return {"mean": total / count} if count else None
+
+    def summarize(self, latencies, queries, errors, throttled, seconds):
+        latencies.sort()
+
+        def ms(value):
+            return round(value * 1000, 3) if value is not None else None
+
+        if isinstance(queries, dict):
+            queries_mean, queries_max = round(queries["mean"], 2), None
+        elif queries:
+            queries_mean, queries_max = round(statistics.fmean(queries), 2), max(queries)
+        else:
+            queries_mean = queries_max = None
+        return {
+            "requests": len(latencies) + len(errors) + throttled,
+            "errors": len(errors),
+            "throttled": throttled,
+            "throughput_rps": round(len(latencies) / seconds, 2) if seconds else 0.0,
+            "mean_ms": ms(statistics.fmean(latencies)) if latencies else None,
+            "p50_ms": ms(percentile(latencies, 0.50)),
+            "p95_ms": ms(percentile(latencies, 0.95)),
+            "p99_ms": ms(percentile(latencies, 0.99)),
+            "max_ms": ms(latencies[-1]) if latencies else None,
+            "queries_mean": queries_mean,
+            "queries_max": queries_max,
+        }
+
+    def compare(self, baseline, report, threshold):
+        """
+        پسرفت: p95 بیش از threshold درصد بالاتر، throughput بیش از threshold درصد
+        پایین‌تر، هر افزایش در میانگین تعداد کوئری یا خطای تازه. سناریویی که در
+        یکی از دو اجرا 429 گرفته قابل مقایسه نیست و کنار گذاشته می‌شود.
+        """
+        regressions = []
+        if baseline["meta"].get("target") != report["meta"]["target"]:
+            self.stderr.write(f"هشدار: target اجرای پایه {baseline['meta'].get('target')} است.")
+        self.stdout.write(
+            f"\nمقایسه با {baseline['meta'].get('commit') or '?'} (آستانه {threshold:g}%)\n"
+            f"{'scenario':13} {'p95 Δ%':>8} {'req/s Δ%':>9} {'queries':>13}"
+        )
+        for name, new in report["scenarios"].items():
+            old = baseline["scenarios"].get(name)
+            if old is None:
+                continue
+            if old.get("throttled") or new["throttled"]:
+                self.stdout.write(f"{name:13} throttle‌شده (429)، مقایسه نشد")
+                continue
+            p95_delta = _delta(old["p95_ms"], new["p95_ms"])
+            rps_delta = _delta(old["throughput_rps"], new["throughput_rps"])
+            queries = f"{old['queries_mean']} → {new['queries_mean']}"
+            self.stdout.write(
+                f"{name:13} {_format_delta(p95_delta):>8} {_format_delta(rps_delta):>9} {queries:>13}"
+            )
+            if p95_delta is not None and p95_delta > threshold:
+                regressions.append(f"{name}: p95 {old['p95_ms']} → {new['p95_ms']} ms")
+            if rps_delta is not None and rps_delta < -threshold:
+                regressions.append(f"{name}: throughput {old['throughput_rps']} → {new['throughput_rps']} req/s")
+            if None not in (old["queries_mean"], new["queries_mean"]) and new["queries_mean"] > old["queries_mean"]:
+                regressions.append(f"{name}: queries {old['queries_mean']} → {new['queries_mean']}")
+            if new["errors"] > old["errors"]:
+                regressions.append(f"{name}: errors {old['errors']} → {new['errors']}")
+        if regressions:
+            raise CommandError("پسرفت نسبت به اجرای پایه:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("پسرفتی نبود."))
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def _delta(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old * 100
+
+
+def _format_delta(delta):
+    return f"{delta:+.1f}" if delta is not None else "-"
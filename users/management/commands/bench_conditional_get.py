@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users import threads
+from users.models import Comment, Post
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "مقایسه‌ی بایت ارسالی و CPU هر درخواست بین پاسخ کامل 200 و پاسخ 304"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--comments", type=int, default=50)
+
+    def handle(self, *args, **options):
+        # داده‌ی نمونه داخل تراکنش ساخته و در پایان rollback می‌شود
+        with transaction.atomic():
+            user = User.objects.create_user(username="bench-conditional", password="bench-password")
+            post = Post.objects.create(author=user, content="پست نمونه " * 20)
+            comments = [Comment(post=post, author=user, content=f"کامنت نمونه {i}") for i in range(options["comments"])]
+            # bulk_create متد save را صدا نمی‌زند؛ مسیر درخت همین‌جا ساخته می‌شود
+            for comment in comments:
+                threads.place(comment, None, timezone.now())
+            Comment.objects.bulk_create(comments)
+            client = APIClient(SERVER_NAME="localhost")
+            client.force_authenticate(user=user)
+
+            for name, url in (
+                ("post-detail", reverse("post-detail", kwargs={"pk": post.id})),
+                ("comment-list", reverse("comment-list-create", kwargs={"post_id": post.id})),
+                ("me", reverse("user-me")),
+            ):
+                etag = client.get(url)["ETag"]
+                full = self.measure(client, url, options["requests"])
+                cached = self.measure(client, url, options["requests"], HTTP_IF_NONE_MATCH=etag)
+                self.stdout.write(
+                    f"{name:13} 200: {full[0]:7.0f} B {full[1]:6.3f} ms CPU   "
+                    f"304: {cached[0]:7.0f} B {cached[1]:6.3f} ms CPU"
+                )
+            transaction.set_rollback(True)
+
+    def measure(self, client, url, count, **headers):
+        sent = 0
+        cpu_start = time.process_time()
+        for _ in range(count):
+            response = client.get(url, **headers)
+            sent += len(response.content) + sum(len(k) + len(v) + 4 for k, v in response.items())
+        cpu = time.process_time() - cpu_start
+        return sent / count, cpu / count * 1000
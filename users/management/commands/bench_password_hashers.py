@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "اندازه‌گیری تعداد ورود در ثانیه برای هر هسته، برای هر policy هش رمز عبور"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--policy", action="append", dest="policies",
+            choices=sorted(settings.PASSWORD_HASHER_POLICIES),
+            help="policy مورد نظر؛ پیش‌فرض همه‌ی policyها",
+        )
+        parser.add_argument("--seconds", type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        policies = options["policies"] or sorted(settings.PASSWORD_HASHER_POLICIES)
+        for name in policies:
+            hasher = import_string(settings.PASSWORD_HASHER_POLICIES[name])()
+            try:
+                encoded = make_password("benchmark-password", hasher=hasher)
+            except ValueError as exc:
+                self.stdout.write(self.style.WARNING(f"{name}: skipped ({exc})"))
+                continue
+
+            rounds = 0
+            cpu_start = time.process_time()
+            deadline = time.perf_counter() + options["seconds"]
+            while time.perf_counter() < deadline:
+                check_password("benchmark-password", encoded)
+                rounds += 1
+            cpu = time.process_time() - cpu_start
+
+            self.stdout.write(
+                f"{name:8} {rounds / cpu:10.1f} logins/sec/core  "
+                f"({cpu / rounds * 1000:.1f} ms CPU per login, {encoded.split('$', 1)[0]})"
+            )
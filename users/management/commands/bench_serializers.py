@@ -0,0 +1,89 @@
+import gc
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from users.compiled import POSTS
+from users.models import Post, PostMention
+from users.renderers import FastJSONRenderer
+from users.serializers import PostSerializer
+from users.views import post_queryset
+
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "مقایسه‌ی PostSerializer + JSONRenderer با مسیر compiled + FastJSONRenderer (ردیف بر ثانیه و حافظه)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+        parser.add_argument("--mentions", type=int, default=2, help="تعداد mention هر پست")
+
+    def handle(self, *args, **options):
+        sizes = sorted(options["rows"])
+        # داده‌ی آزمایشی داخل تراکنش ساخته و در پایان rollback می‌شود
+        try:
+            with transaction.atomic():
+                self.seed(sizes[-1], options["mentions"])
+                self.stdout.write(
+                    f"{'rows':>7}  {'path':9} {'serialize rows/s':>17} {'render rows/s':>14} "
+                    f"{'total rows/s':>13} {'peak MB':>8}  bytes"
+                )
+                for size in sizes:
+                    self.compare(size)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count, mentions):
+        self.author = author = User.objects.create_user(username="bench_author", first_name="بنچ", password=None)
+        friends = [User.objects.create_user(username=f"bench_friend{i}", password=None) for i in range(max(mentions, 1))]
+        posts = Post.objects.bulk_create(
+            [Post(author=author, content=f"پست آزمایشی شماره‌ی {i} با کمی متن فارسی و @mention", mention_count=mentions)
+             for i in range(count)],
+            batch_size=5000,
+        )
+        PostMention.objects.bulk_create(
+            [PostMention(post=post, user=friend) for post in posts for friend in friends[:mentions]],
+            batch_size=5000,
+        )
+
+    def measure(self, serialize, renderer):
+        queryset = post_queryset().filter(author=self.author).order_by("-created_at", "-id")
+        # زباله‌ی مسیر قبلی نباید هزینه‌ی GC را به حساب این مسیر بگذارد
+        gc.collect()
+        started = time.perf_counter()
+        data = serialize(queryset)
+        serialized = time.perf_counter()
+        content = renderer().render(data)
+        rendered = time.perf_counter()
+
+        tracemalloc.start()
+        renderer().render(serialize(queryset))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return serialized - started, rendered - serialized, peak, content
+
+    def compare(self, size):
+        paths = [
+            ("drf", lambda queryset: PostSerializer(list(queryset[:size]), many=True).data, JSONRenderer),
+            ("compiled", lambda queryset: POSTS.serialize(list(POSTS.rows(queryset[:size]))), FastJSONRenderer),
+        ]
+        outputs = []
+        for name, serialize, renderer in paths:
+            serialize_seconds, render_seconds, peak, content = self.measure(serialize, renderer)
+            outputs.append(content)
+            self.stdout.write(
+                f"{size:>7}  {name:9} {size / serialize_seconds:>17,.0f} {size / render_seconds:>14,.0f} "
+                f"{size / (serialize_seconds + render_seconds):>13,.0f} {peak / 2**20:>8.1f}  {len(content):,}"
+            )
+        self.stdout.write(f"{'':>7}  identical output: {'yes' if outputs[0] == outputs[1] else 'NO'}")
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.export import EXPORT_CHUNK_SIZE, export_stream
+from users.identifiers import resolve_identifier
+
+
+class Command(BaseCommand):
+    help = "خروجی NDJSON داده‌های یک کاربر (پروفایل، پست‌ها، کامنت‌ها، تاریخچه‌ی یوزرنیم)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("identifier", help="ایمیل، یوزرنیم یا شماره تلفن کاربر")
+        parser.add_argument("--output", "-o", default="-", help="مسیر فایل خروجی؛ پیش‌فرض stdout")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        user = resolve_identifier(options["identifier"])
+        if user is None:
+            raise CommandError(f"کاربر {options['identifier']} یافت نشد.")
+
+        output = sys.stdout.buffer if options["output"] == "-" else open(options["output"], "wb")
+        written = 0
+        try:
+            for chunk in export_stream(user, compress=options["gzip"], chunk_size=options["chunk_size"]):
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        if options["output"] != "-":
+            self.stdout.write(self.style.SUCCESS(f"{written} بایت در {options['output']} نوشته شد."))
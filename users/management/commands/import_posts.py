@@ -0,0 +1,50 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+
+from users.bulk import import_posts
+from users.identifiers import resolve_identifier
+from users.parsers import iter_ndjson
+
+
+class Command(BaseCommand):
+    help = "ورود دسته‌ای پست‌ها از فایل JSON (لیست) یا NDJSON؛ همه در یک تراکنش"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="مسیر فایل؛ - برای stdin")
+        parser.add_argument("--format", choices=["json", "ndjson"], help="پیش‌فرض: از روی پسوند فایل")
+        parser.add_argument("--author", help="ایمیل/یوزرنیم/تلفن نویسنده برای ردیف‌های بدون author")
+        parser.add_argument("--chunk-size", type=int, default=None)
+
+    def handle(self, *args, **options):
+        author_id = None
+        if options["author"]:
+            author = resolve_identifier(options["author"])
+            if author is None:
+                raise CommandError(f"کاربر {options['author']} یافت نشد.")
+            author_id = author.pk
+
+        path = options["path"]
+        fmt = options["format"] or ("json" if path.endswith(".json") else "ndjson")
+        stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            # NDJSON خط به خط از دیسک خوانده می‌شود؛ فایل JSON باید کامل در حافظه بارگذاری شود
+            rows = iter_ndjson(stream) if fmt == "ndjson" else json.load(stream)
+            result = import_posts(rows, author_id=author_id, allow_author=True, chunk_size=options["chunk_size"])
+        except (ParseError, ValueError) as exc:
+            raise CommandError(str(exc))
+        except serializers.ValidationError as exc:
+            errors = exc.detail["errors"]
+            for error in errors[:20]:
+                self.stderr.write(json.dumps(error, ensure_ascii=False, default=str))
+            raise CommandError(f"{len(errors)} ردیف نامعتبر در chunk؛ هیچ پستی ذخیره نشد.")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} پست در {result['seconds']} ثانیه ساخته شد ({result['rows_per_sec']} rows/sec)."
+        ))
@@ -0,0 +1,76 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "شبیه‌سازی credential stuffing روی login با و بدون throttle؛ CPU هر تلاش را گزارش می‌کند"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10.0, help="مدت هر حالت")
+        parser.add_argument("--ips", type=int, default=4, help="تعداد IPهای مهاجم")
+        parser.add_argument("--ip-rate", default="30/min")
+        parser.add_argument("--identifier-rate", default="10/min")
+        parser.add_argument(
+            "--pbkdf2-iterations", type=int, default=None,
+            help="هزینه‌ی PBKDF2 برای این اجرا؛ پیش‌فرض مقدار تنظیمات",
+        )
+
+    def handle(self, *args, **options):
+        modes = (
+            ("no throttle", {"auth_ip": None, "auth_identifier": None}),
+            ("throttled", {"auth_ip": options["ip_rate"], "auth_identifier": options["identifier_rate"]}),
+        )
+        # پاسخ‌های 400/429 هر کدام یک warning در django.request می‌نویسند
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        cost = dict(settings.PASSWORD_HASHER_COST)
+        if options["pbkdf2_iterations"]:
+            cost["PBKDF2_ITERATIONS"] = options["pbkdf2_iterations"]
+
+        # کاربر هدف داخل تراکنش ساخته و در پایان rollback می‌شود
+        with override_settings(PASSWORD_HASHER_COST=cost), transaction.atomic():
+            User.objects.create_user(username="loadtest-victim", password="correct-password")
+            for name, rates in modes:
+                with override_settings(
+                    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": rates},
+                    THROTTLING={**settings.THROTTLING, "STORE": "users.throttling.InMemoryCounterStore"},
+                ):
+                    self.report(name, *self.attack(options["seconds"], options["ips"]))
+            transaction.set_rollback(True)
+
+    def attack(self, seconds, ips):
+        client = APIClient(SERVER_NAME="localhost")
+        url = reverse("login")
+        statuses = Counter()
+        attempts = 0
+        cpu_start = time.process_time()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            identifier = "loadtest-victim" if attempts % 2 else f"guess-{attempts}@example.com"
+            response = client.post(
+                url, {"identifier": identifier, "password": f"guess-{attempts}"},
+                REMOTE_ADDR=f"203.0.113.{attempts % ips + 1}",
+            )
+            statuses[response.status_code] += 1
+            attempts += 1
+        return attempts, statuses, time.process_time() - cpu_start, seconds
+
+    def report(self, name, attempts, statuses, cpu, seconds):
+        checks = attempts - statuses[429]
+        self.stdout.write(
+            f"{name:12} {attempts / seconds:8.1f} attempts/s  "
+            f"{checks / seconds:7.1f} password checks/s  "
+            f"{cpu / attempts * 1000:7.2f} ms CPU/attempt  "
+            f"{statuses[429] / attempts:6.1%} throttled  {dict(statuses)}"
+        )
@@ -0,0 +1,172 @@
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.models import Post
+
+
+User = get_user_model()
+
+MODES = ("runserver", "wsgi", "asgi")
+USERNAME = "loadtest-server"
+PASSWORD = "loadtest-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "request بر ثانیه‌ی لیست پست‌ها (کاربر واردشده) و login در runserver و serve --mode wsgi/asgi. "
+        "سرور در پردازه‌ی جدا اجرا می‌شود، پس دیتابیس باید فایل یا سرور باشد (نه SQLite حافظه‌ای)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+        parser.add_argument("--seconds", type=float, default=10.0, help="مدت اندازه‌گیری هر endpoint")
+        parser.add_argument("--warmup", type=float, default=2.0, help="ثانیه‌های اول که اندازه‌گیری نمی‌شوند")
+        parser.add_argument("--concurrency", type=int, default=16, help="تعداد کلاینت هم‌زمان")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--workers", type=int, default=0, help="برای serve؛ ۰ یعنی بر اساس هسته‌ها")
+        parser.add_argument("--posts", type=int, default=200, help="تعداد پست‌های کاربر آزمایشی")
+        parser.add_argument(
+            "--pbkdf2-iterations", type=int, default=None,
+            help="هزینه‌ی PBKDF2 برای این اجرا؛ پیش‌فرض مقدار تنظیمات",
+        )
+
+    def handle(self, *args, **options):
+        if settings.DATABASES["default"]["NAME"] in ("", ":memory:"):
+            raise CommandError("سرور در پردازه‌ی جدا اجرا می‌شود و به دیتابیس مشترک نیاز دارد.")
+        cost = dict(settings.PASSWORD_HASHER_COST)
+        if options["pbkdf2_iterations"]:
+            cost["PBKDF2_ITERATIONS"] = options["pbkdf2_iterations"]
+
+        # برخلاف loadtest_auth داده باید commit شود تا سرور آن را ببیند؛ در پایان حذف می‌شود
+        User.objects.filter(username=USERNAME).delete()
+        with override_settings(PASSWORD_HASHER_COST=cost):
+            user = User.objects.create_user(username=USERNAME, password=PASSWORD)
+        try:
+            Post.objects.bulk_create(
+                [Post(author=user, content=f"پست بار آزمایشی {i}") for i in range(options["posts"])],
+                batch_size=1000,
+            )
+            requests = {
+                "posts": ("GET", "/api/users/posts/", None, {
+                    "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}",
+                }),
+                "login": ("POST", "/api/users/login/", json.dumps({"identifier": USERNAME, "password": PASSWORD}), {
+                    "Content-Type": "application/json",
+                }),
+            }
+            self.stdout.write(
+                f"{'mode':10} {'endpoint':8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses"
+            )
+            for mode in options["modes"]:
+                with self.server(mode, options, cost):
+                    for name, request in requests.items():
+                        self.run_load(options["port"], request, options["concurrency"], options["warmup"])
+                        result = self.run_load(options["port"], request, options["concurrency"], options["seconds"])
+                        self.report(mode, name, options["seconds"], *result)
+        finally:
+            user.delete()
+
+    @contextmanager
+    def server(self, mode, options, cost):
+        manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+        bind = f"127.0.0.1:{options['port']}"
+        if mode == "runserver":
+            argv = manage + ["runserver", bind, "--noreload"]
+        else:
+            argv = manage + ["serve", "--mode", mode, "--bind", bind, "--workers", str(options["workers"])]
+        env = {
+            **os.environ,
+            # throttle احراز هویت اندازه‌گیری login را به شمارش 429 تبدیل می‌کند
+            "THROTTLE_AUTH_IP_RATE": "1000000/s",
+            "THROTTLE_AUTH_IDENTIFIER_RATE": "1000000/s",
+            "PBKDF2_ITERATIONS": str(cost["PBKDF2_ITERATIONS"]),
+        }
+        with tempfile.TemporaryFile() as log:
+            process = subprocess.Popen(argv, env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                self.wait_ready(process, options["port"], log)
+                yield
+            finally:
+                process.send_signal(signal.SIGTERM)
+                try:
+                    process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+
+    def wait_ready(self, process, port, log, timeout=30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                break
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+                conn.request("GET", "/api/users/posts/")
+                if conn.getresponse().status == 200:
+                    conn.close()
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        log.seek(0)
+        raise CommandError("سرور آماده نشد:\n" + log.read().decode(errors="replace")[-2000:])
+
+    def run_load(self, port, request, concurrency, seconds):
+        method, path, body, headers = request
+        deadline = time.perf_counter() + seconds
+        latencies, statuses, lock = [], Counter(), threading.Lock()
+
+        def client():
+            local_latencies, local_statuses = [], Counter()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    conn.request(method, path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                except (OSError, http.client.HTTPException):
+                    # worker بازسازی‌شده (max-requests) اتصال keep-alive را می‌بندد
+                    local_statuses["error"] += 1
+                    conn.close()
+                    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                    continue
+                local_latencies.append(time.perf_counter() - started)
+                local_statuses[response.status] += 1
+            conn.close()
+            with lock:
+                latencies.extend(local_latencies)
+                statuses.update(local_statuses)
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(latencies), statuses
+
+    def report(self, mode, name, seconds, latencies, statuses):
+        ok = sum(count for status, count in statuses.items() if status != "error" and 200 <= status < 300)
+
+        def percentile(q):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0.0
+
+        self.stdout.write(
+            f"{mode:10} {name:8} {ok / seconds:9.1f} {percentile(0.5):8.1f} {percentile(0.95):8.1f} "
+            f"{percentile(0.99):8.1f}  {dict(statuses)}"
+        )
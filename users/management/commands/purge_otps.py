@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from users.otp import get_otp_store
+
+
+class Command(BaseCommand):
+    help = "حذف دسته‌ای کدهای OTP منقضی‌شده (برای اجرای دوره‌ای با cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = get_otp_store().purge(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} کد منقضی حذف شد."))
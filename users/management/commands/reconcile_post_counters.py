@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from users.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "اصلاح دسته‌ای comment_count و mention_count پست‌ها بر اساس داده‌ی واقعی"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        actual_comments = Coalesce(Subquery(
+            Comment.objects.filter(post=OuterRef("pk")).order_by().values("post")
+            .annotate(total=Count("pk")).values("total"),
+            output_field=IntegerField(),
+        ), Value(0))
+        actual_mentions = Coalesce(Subquery(
+            Post.mentions.through.objects.filter(post=OuterRef("pk")).order_by().values("post")
+            .annotate(total=Count("pk")).values("total"),
+            output_field=IntegerField(),
+        ), Value(0))
+
+        last_id, scanned, fixed = None, 0, 0
+        while True:
+            batch = Post.objects.order_by("id")
+            if last_id is not None:
+                batch = batch.filter(id__gt=last_id)
+            ids = list(batch.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                drifted = (
+                    Post.objects.filter(pk__in=ids)
+                    .annotate(actual_comments=actual_comments, actual_mentions=actual_mentions)
+                    .exclude(comment_count=F("actual_comments"), mention_count=F("actual_mentions"))
+                )
+                fixed += Post.objects.filter(pk__in=drifted.values("pk")).update(
+                    comment_count=actual_comments, mention_count=actual_mentions,
+                )
+            scanned += len(ids)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"{scanned} پست بررسی شد، {fixed} پست اصلاح شد."))
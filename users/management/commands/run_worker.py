@@ -0,0 +1,116 @@
+import logging
+import signal
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from users.models import Task
+from users.taskqueue import DatabaseQueue, get_task_queue
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "اجرای کارهای پس‌زمینه‌ی صف دیتابیسی با چند thread؛ تأخیر صف (run_at تا شروع) گزارش می‌شود"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="تعداد threadهای اجرا")
+        parser.add_argument("--batch-size", type=int, default=10, help="تعداد کار برداشته‌شده در هر claim")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="ثانیه انتظار وقتی صف خالی است")
+        parser.add_argument("--report-every", type=float, default=60.0, help="فاصله‌ی گزارش آمار (ثانیه)")
+        parser.add_argument("--once", action="store_true", help="خالی کردن صف فعلی و خروج")
+
+    def handle(self, *args, **options):
+        queue = get_task_queue()
+        if not isinstance(queue, DatabaseQueue):
+            raise CommandError("TASKS['BACKEND'] باید users.taskqueue.DatabaseQueue باشد.")
+        self.queue = queue
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.latencies, self.succeeded, self.failed = [], 0, 0
+        if not options["once"]:
+            signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+            signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+
+        self.last_maintenance = None
+        self.maintain(options)
+        if options["concurrency"] == 1:
+            self.work(options)
+        else:
+            workers = [
+                threading.Thread(target=self.run_thread, args=(options,), name=f"worker-{i}", daemon=True)
+                for i in range(options["concurrency"])
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(0.5)
+        self.report()
+
+    def run_thread(self, options):
+        try:
+            self.work(options)
+        finally:
+            connection.close()
+
+    def maintain(self, options):
+        """
+        گزارش دوره‌ای و نگه‌داری صف؛ هر threadی که زمانش رسیده باشد انجام می‌دهد.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.last_maintenance is not None and now - self.last_maintenance < options["report_every"]:
+                return
+            first, self.last_maintenance = self.last_maintenance is None, now
+        if not first:
+            self.report()
+        self.queue.requeue_stale()
+        self.queue.purge_done()
+
+    def work(self, options):
+        while not self.stop.is_set():
+            try:
+                self.maintain(options)
+                tasks = self.queue.claim(options["batch_size"])
+            except DatabaseError:
+                # مثلاً قفل SQLite یا قطع اتصال؛ کار running مانده بعد از VISIBILITY_TIMEOUT دوباره صف می‌شود
+                logger.exception("task claim failed")
+                self.stop.wait(options["poll_interval"])
+                continue
+            if not tasks:
+                if options["once"]:
+                    return
+                self.stop.wait(options["poll_interval"])
+                continue
+            for task in tasks:
+                latency = (task.started_at - task.run_at).total_seconds()
+                ok = self.queue.execute(task)
+                with self.lock:
+                    self.latencies.append(max(latency, 0.0))
+                    self.succeeded += ok
+                    self.failed += not ok
+
+    def report(self):
+        with self.lock:
+            latencies, self.latencies = self.latencies, []
+            succeeded, failed = self.succeeded, self.failed
+            self.succeeded = self.failed = 0
+        queued = Task.objects.filter(status=Task.QUEUED, run_at__lte=timezone.now())
+        oldest = queued.order_by("run_at").values_list("run_at", flat=True).first()
+        line = f"{succeeded} موفق، {failed} ناموفق، {queued.count()} در صف"
+        if latencies:
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            line += (
+                f"؛ تأخیر صف: میانگین {statistics.fmean(latencies) * 1000:.1f}ms، "
+                f"p95 {p95 * 1000:.1f}ms، بیشینه {latencies[-1] * 1000:.1f}ms"
+            )
+        if oldest is not None:
+            line += f"؛ قدیمی‌ترین کار منتظر {(timezone.now() - oldest).total_seconds():.1f}s"
+        self.stdout.write(line)
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from users import seeding
+
+
+class Command(BaseCommand):
+    help = "ساخت داده‌ی مصنوعی (کاربر، پست، کامنت تودرتو، mention) با bulk insert برای بنچمارک"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=10, help="پست برای هر کاربر")
+        parser.add_argument("--comments", type=int, default=5, help="کامنت برای هر پست")
+        parser.add_argument("--mentions", type=int, default=2, help="mention برای هر پست")
+        parser.add_argument("--reply-share", type=float, default=0.3, help="سهم کامنت‌هایی که پاسخ‌اند")
+        parser.add_argument("--prefix", default="seed", help="یوزرنیم‌ها: <prefix>0، <prefix>1، ...")
+        parser.add_argument("--password", default="seed-password")
+        parser.add_argument("--batch-size", type=int, default=2000, help="تعداد پست هر chunk و هر INSERT")
+        parser.add_argument("--seed", type=int, default=0, help="seed تولید تصادفی؛ اجرای تکراری همان داده را می‌سازد")
+        parser.add_argument("--clear", action="store_true", help="حذف کاربران همین prefix پیش از ساخت")
+        parser.add_argument(
+            "--pbkdf2-iterations", type=int, default=None,
+            help="هزینه‌ی هش رمز کاربران؛ login در bench_api همین هزینه را دارد",
+        )
+        parser.add_argument(
+            "--side-effects", action="store_true",
+            help="صف کردن ایندکس جستجو و fan-out تایم‌لاین (اجرا با run_worker)",
+        )
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self.stdout.write(f"{seeding.clear(options['prefix'])} ردیف قبلی حذف شد.")
+        cost = dict(settings.PASSWORD_HASHER_COST)
+        if options["pbkdf2_iterations"]:
+            cost["PBKDF2_ITERATIONS"] = options["pbkdf2_iterations"]
+        started = time.perf_counter()
+        with override_settings(PASSWORD_HASHER_COST=cost):
+            report = seeding.Seeder(
+                prefix=options["prefix"], password=options["password"], batch_size=options["batch_size"],
+                seed=options["seed"], side_effects=options["side_effects"],
+            ).run(
+                users=options["users"], posts_per_user=options["posts"], comments_per_post=options["comments"],
+                mentions_per_post=options["mentions"], reply_share=options["reply_share"],
+            )
+        for name, row in report.items():
+            self.stdout.write(f"{name:12} {row['rows']:>10,} rows  {row['seconds']:>8.2f}s  {row['rows_per_sec'] or 0:>10,} rows/s")
+        self.stdout.write(self.style.SUCCESS(f"کل زمان {time.perf_counter() - started:.2f} ثانیه"))
@@ -0,0 +1,139 @@
+import importlib.util
+import os
+import shlex
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from users.throttling import CacheCounterStore
+
+
+WORKER_CLASSES = {
+    "wsgi": "sync",
+    "asgi": "uvicorn_worker.UvicornWorker",
+}
+
+
+def cpu_count():
+    # در کانتینر فقط هسته‌های در دسترس همین پردازه حساب می‌شوند
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers(mode, threads=1):
+    """
+    WSGI: 2×هسته+1 worker همگام (با thread کمتر می‌شود)؛ ASGI: یک event loop برای هر هسته.
+    """
+    cores = cpu_count()
+    if mode == "asgi":
+        return cores
+    return max(cores, (2 * cores + 1) // threads)
+
+
+def process_local_cache(alias):
+    # LocMemCache در هر worker جداست؛ نسخه‌ها و شمارنده‌های آن بین workerها دیده نمی‌شوند
+    return settings.CACHES[alias]["BACKEND"].endswith(".LocMemCache")
+
+
+class Command(BaseCommand):
+    help = (
+        "اجرای سرور production با gunicorn: WSGI (worker همگام/gthread) یا ASGI (worker uvicorn). "
+        "با preload، kill -HUP فقط workerها را عوض می‌کند؛ برای کد تازه kill -USR2 و سپس QUIT master قدیمی."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        server = settings.SERVER
+        parser.add_argument("--mode", choices=sorted(WORKER_CLASSES), default=server["MODE"])
+        parser.add_argument("--bind", default=server["BIND"])
+        parser.add_argument("--workers", type=int, default=server["WORKERS"], help="۰ یعنی بر اساس تعداد هسته‌ها")
+        parser.add_argument("--threads", type=int, default=server["THREADS"], help="بیش از ۱ یعنی worker gthread (فقط WSGI)")
+        parser.add_argument("--max-requests", type=int, default=server["MAX_REQUESTS"], help="بازسازی worker بعد از این تعداد request")
+        parser.add_argument("--max-requests-jitter", type=int, default=server["MAX_REQUESTS_JITTER"])
+        parser.add_argument("--timeout", type=int, default=server["TIMEOUT"])
+        parser.add_argument("--graceful-timeout", type=int, default=server["GRACEFUL_TIMEOUT"])
+        parser.add_argument("--keep-alive", type=int, default=server["KEEPALIVE"])
+        parser.add_argument("--no-preload", dest="preload", action="store_false", default=server["PRELOAD"])
+        parser.add_argument("--pid", default=None, help="فایل pid برای ارسال HUP/USR2")
+        parser.add_argument("--dry-run", action="store_true", help="فقط چاپ فرمان gunicorn")
+
+    def handle(self, *args, **options):
+        options["workers"] = options["workers"] or default_workers(options["mode"], options["threads"])
+        argv = self.gunicorn_argv(options)
+        overrides = self.worker_overrides(options["workers"], options["mode"])
+        env = {**os.environ, **overrides}
+        if options["mode"] == "asgi":
+            # مثل socialbackend/asgi.py: ویوهای async احراز هویت با HashingPool
+            env.setdefault("ASYNC_AUTH_VIEWS", "True")
+        if options["dry_run"]:
+            self.stdout.write(shlex.join([f"{name}={value}" for name, value in overrides.items()] + argv))
+            return
+        for module in ["gunicorn"] + (["uvicorn_worker"] if options["mode"] == "asgi" else []):
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} نصب نیست؛ pip install -r requirements.txt")
+        sys.stdout.flush()
+        # gunicorn جای همین پردازه را می‌گیرد تا سیگنال‌ها مستقیم به master برسند
+        os.execvpe(argv[0], argv, env)
+
+    def worker_overrides(self, workers, mode):
+        """
+        متغیرهای محیطی workerها برای وضعیتی که با چند پردازه یا ASGI درست کار نمی‌کند؛
+        پیکربندی‌ای که امن نیست رد می‌شود.
+        """
+        overrides, response_cache = {}, settings.RESPONSE_CACHE
+        if mode == "asgi" and settings.DB_CONN_MODE == "persistent":
+            # هر request ASGI ممکن است در thread تازه‌ای اجرا شود و اتصال پایدار خودش را باز نگه دارد
+            if os.environ.get("DB_CONN_MODE") == "persistent":
+                raise CommandError("DB_CONN_MODE=persistent با --mode asgi اتصال‌ها را جمع می‌کند؛ pool، psycopg2_pool یا none.")
+            overrides["DB_CONN_MODE"] = "none"
+
+        if workers > 1 and response_cache["ENABLED"] and process_local_cache(response_cache["CACHE_ALIAS"]):
+            # باطل‌سازی فقط به worker نویسنده می‌رسد و بقیه تا TTL بدنه‌ی قدیمی می‌دهند
+            self.stderr.write(
+                "کش پاسخ‌ها روی LocMemCache بین workerها مشترک نیست و غیرفعال شد؛ "
+                "برای فعال ماندن CACHE_URL را redis:// یا filecache:// کنید."
+            )
+            overrides["RESPONSE_CACHE_ENABLED"] = "False"
+
+        throttling = settings.THROTTLING
+        if workers > 1:
+            # هر worker شمارنده‌ی خودش را دارد و سقف‌های throttle در تعداد workerها ضرب می‌شوند
+            if not issubclass(import_string(throttling["STORE"]), CacheCounterStore):
+                raise CommandError(
+                    f"{throttling['STORE']} بین {workers} worker مشترک نیست؛ "
+                    "THROTTLE_STORE=users.throttling.CacheCounterStore یا --workers 1."
+                )
+            if process_local_cache(throttling["CACHE_ALIAS"]):
+                self.stderr.write(
+                    f"throttle روی LocMemCache است و هر سقف عملاً {workers} برابر می‌شود؛ "
+                    "THROTTLE_CACHE_ALIAS را به کش مشترک (redis://) ببرید."
+                )
+        return overrides
+
+    def gunicorn_argv(self, options):
+        mode, threads = options["mode"], options["threads"]
+        if mode == "asgi" and threads > 1:
+            raise CommandError("--threads فقط برای WSGI است؛ worker ASGI یک event loop دارد.")
+        worker_class = "gthread" if mode == "wsgi" and threads > 1 else WORKER_CLASSES[mode]
+        argv = [
+            sys.executable, "-m", "gunicorn", f"socialbackend.{mode}:application",
+            "--config", str(settings.BASE_DIR / "socialbackend" / "gunicorn_conf.py"),
+            "--bind", options["bind"],
+            "--worker-class", worker_class,
+            "--workers", str(options["workers"]),
+            "--threads", str(threads),
+            "--max-requests", str(options["max_requests"]),
+            "--max-requests-jitter", str(options["max_requests_jitter"]),
+            "--timeout", str(options["timeout"]),
+            "--graceful-timeout", str(options["graceful_timeout"]),
+            "--keep-alive", str(options["keep_alive"]),
+        ]
+        if options["preload"]:
+            argv.append("--preload")
+        if options["pid"]:
+            argv += ["--pid", options["pid"]]
+        return argv
@@ -0,0 +1,132 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Lower
+from rest_framework import serializers
+
+from .caching import MISSING, TieredCache
+
+
+User = get_user_model()
+
+HANDLE_RE = re.compile(r"(?<![\w@])@([\w.]{1,50})")
+
+# None هم کش می‌شود تا handleهای ناموجود هم هر بار به دیتابیس نروند
+handle_cache = TieredCache(
+    prefix="mention-handle",
+    ttl=settings.MENTION_CACHE["TTL"],
+    max_entries=settings.MENTION_CACHE["MAX_ENTRIES"],
+    alias=settings.MENTION_CACHE["CACHE_ALIAS"],
+)
+
+
+def parse_handles(content):
+    handles = []
+    for match in HANDLE_RE.finditer(content or ""):
+        handle = match.group(1).rstrip(".").lower()
+        if handle and handle not in handles:
+            handles.append(handle)
+    return handles
+
+
+def resolve_handles(handles):
+    """
+    نگاشت handle به id کاربر؛ handleهای داخل کش بدون کوئری و بقیه با یک کوئری
+    روی ایندکس Lower(username) پیدا می‌شوند.
+    """
+    resolved, misses = {}, []
+    for handle in handles:
+        cached = handle_cache.get(handle)
+        if cached is MISSING:
+            misses.append(handle)
+        elif cached is not None:
+            resolved[handle] = cached
+
+    if misses:
+        found = dict(
+            User.objects.annotate(username_lower=Lower("username"))
+            .filter(username_lower__in=misses)
+            .values_list("username_lower", "id")
+        )
+        for handle in misses:
+            handle_cache.set(handle, found.get(handle))
+        resolved.update(found)
+    return resolved
+
+
+def forget_handles(*usernames):
+    for username in usernames:
+        if username:
+            handle_cache.delete(username.lower())
+
+
+def mention_ids_for(content, explicit_ids=()):
+    ids = list(dict.fromkeys(explicit_ids))
+    for user_id in resolve_handles(parse_handles(content)).values():
+        if user_id not in ids:
+            ids.append(user_id)
+    return ids
+
+
+def edited_mention_ids(instance, previous_content, explicit_ids=None):
+    """
+    (mentionهای فعلی، mentionهای بعد از ویرایش). اگر explicit_ids داده نشود، mentionهای قبلی
+    حفظ می‌شوند به جز آن‌هایی که از handleهای متن قبلی آمده بودند؛ handleهای متن جدید دوباره resolve می‌شوند.
+    """
+    previous = current_mention_ids(instance)
+    if explicit_ids is None:
+        from_text = set(resolve_handles(parse_handles(previous_content)).values())
+        explicit_ids = [user_id for user_id in previous if user_id not in from_text]
+    return previous, mention_ids_for(instance.content, explicit_ids)
+
+
+def add_mentions(instance, user_ids):
+    """
+    درج همه‌ی ردیف‌های M2M با یک bulk_create.
+    """
+    if not user_ids:
+        return
+    through = instance.mentions.through
+    source = instance._meta.model_name
+    through.objects.bulk_create(
+        [through(**{f"{source}_id": instance.pk, "user_id": user_id}) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+
+
+def remove_mentions(instance, user_ids):
+    if not user_ids:
+        return
+    through = instance.mentions.through
+    source = instance._meta.model_name
+    through.objects.filter(**{f"{source}_id": instance.pk, "user_id__in": list(user_ids)}).delete()
+
+
+def current_mention_ids(instance):
+    through = instance.mentions.through
+    source = instance._meta.model_name
+    return list(through.objects.filter(**{f"{source}_id": instance.pk}).values_list("user_id", flat=True))
+
+
+class MentionsField(serializers.ListField):
+    """
+    لیست UUID کاربران mention‌شده که همه با یک کوئری اعتبارسنجی می‌شوند.
+    """
+
+    child = serializers.UUIDField()
+    default_error_messages = {
+        "does_not_exist": 'Invalid pk "{pk_value}" - object does not exist.',
+    }
+
+    def to_internal_value(self, data):
+        ids = list(dict.fromkeys(super().to_internal_value(data)))
+        existing = set(User.objects.filter(pk__in=ids).values_list("pk", flat=True))
+        for user_id in ids:
+            if user_id not in existing:
+                self.fail("does_not_exist", pk_value=user_id)
+        return ids
+
+    def to_representation(self, value):
+        # ترتیب ثابت، هم‌خوان با users/compiled.py
+        return sorted(user.pk for user in value.all())
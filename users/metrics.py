@@ -0,0 +1,183 @@
+import bisect
+import math
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+
+from . import hashing
+from .caching import TIERED_CACHES
+from .db.pool import pool_stats
+
+
+# شمارنده‌ها و histogramهای درون‌پردازه‌ای با خروجی متنی Prometheus. هر worker
+# gunicorn registry خودش را دارد و هر scrape آمار همان worker را برمی‌گرداند؛ برچسب
+# worker (pid) سری‌های workerها را جدا نگه می‌دارد تا rate() با جابه‌جا شدن scrape
+# بین workerها به هم نریزد. برای آمار کامل در هر scrape از serve --workers 1 استفاده کنید.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    # pid هنگام خروجی خوانده می‌شود؛ با preload ماژول در master import شده است
+    pairs = [*zip(names, values), *extra, ("worker", os.getpid())]
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [شمار هر bucket و آخری +Inf، مجموع]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total) for labels, (counts, total) in self._series.items()}
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, [('le', _number(bound))])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kwargs):
+        return self._add(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self._add(Histogram(*args, **kwargs))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def exposition(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        lines.extend(runtime_samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+VIEW_LABELS = ("view", "method")
+REQUESTS = REGISTRY.counter("http_requests_total", "Requests by route, method and status.", ("view", "method", "status"))
+REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "Request latency.", VIEW_LABELS)
+DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL queries per request.", VIEW_LABELS, buckets=QUERY_BUCKETS
+)
+DB_SECONDS = REGISTRY.histogram("http_request_db_seconds", "Time spent in SQL per request.", VIEW_LABELS)
+SERIALIZE_SECONDS = REGISTRY.histogram(
+    "http_request_serialize_seconds", "Time spent building serializer data per request.", VIEW_LABELS
+)
+RENDER_SECONDS = REGISTRY.histogram("http_request_render_seconds", "Time spent rendering the response.", VIEW_LABELS)
+SLOW_QUERIES = REGISTRY.counter("db_slow_queries_total", "Queries slower than METRICS['SLOW_QUERY_MS'].", ("view",))
+N_PLUS_ONE = REGISTRY.counter(
+    "db_n_plus_one_total", "Requests that ran one query shape more than the N+1 threshold.", ("view",)
+)
+
+
+def _gauges(name, documentation, rows):
+    """
+    rows: [(برچسب‌ها، مقدار)]؛ gaugeهایی که هنگام scrape از آمار زنده خوانده می‌شوند.
+    """
+    if not rows:
+        return []
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} gauge"]
+    for labels, value in rows:
+        lines.append(f"{name}{_labels([key for key, _ in labels], [val for _, val in labels])} {_number(value)}")
+    return lines
+
+
+def runtime_samples():
+    lines = []
+    db_pools = pool_stats()
+    for key in ("size", "in_use", "waiting", "requests", "waits", "timeouts", "wait_ms_total"):
+        lines += _gauges(
+            f"db_pool_{key}", f"Database connection pool {key}.",
+            [([("alias", alias)], stats[key]) for alias, stats in sorted(db_pools.items())],
+        )
+    pool = hashing.current_pool()
+    if pool is not None:
+        for key, value in pool.stats().items():
+            lines += _gauges(f"hashing_pool_{key}", f"Password hashing pool {key}.", [([], value)])
+    for key in ("local_hits", "shared_hits", "misses", "local_entries"):
+        lines += _gauges(
+            f"tiered_cache_{key}", f"Two-level cache {key}.",
+            [([("cache", cache.prefix)], cache.stats()[key]) for cache in TIERED_CACHES],
+        )
+    return lines
+
+
+def metrics_view(request):
+    # نقشه‌ی routeها و وضعیت poolها و کش‌ها روی همان پورت API است؛ پیش‌فرض بسته
+    token = settings.METRICS["TOKEN"]
+    if token:
+        if not constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+            return HttpResponse(status=401)
+    elif not settings.METRICS["PUBLIC"]:
+        return HttpResponse(status=403)
+    return HttpResponse(REGISTRY.exposition(), content_type=CONTENT_TYPE)
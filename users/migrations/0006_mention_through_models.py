@@ -0,0 +1,91 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_mention_times(apps, schema_editor):
+    # زمان mentionهای قدیمی همان زمان ساخت پست/کامنت در نظر گرفته می‌شود
+    PostMention = apps.get_model('users', 'PostMention')
+    CommentMention = apps.get_model('users', 'CommentMention')
+    Post = apps.get_model('users', 'Post')
+    Comment = apps.get_model('users', 'Comment')
+    PostMention.objects.update(
+        created_at=Subquery(Post.objects.filter(pk=OuterRef('post_id')).values('created_at')[:1])
+    )
+    CommentMention.objects.update(
+        created_at=Subquery(Comment.objects.filter(pk=OuterRef('comment_id')).values('created_at')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    جدول‌های M2M خودکار mentions همان‌جا می‌مانند و فقط به مدل through صریح
+    تبدیل می‌شوند تا ستون created_at و ایندکس صندوق mentionها اضافه شود.
+    """
+
+    dependencies = [
+        ('users', '0005_user_lower_identifier_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PostMention',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.post')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'users_post_mentions',
+                        'unique_together': {('post', 'user')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='CommentMention',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.comment')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'users_comment_mentions',
+                        'unique_together': {('comment', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='mentions',
+                    field=models.ManyToManyField(blank=True, related_name='mentioned_in_posts', through='users.PostMention', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='comment',
+                    name='mentions',
+                    field=models.ManyToManyField(blank=True, related_name='mentioned_in_comments', through='users.CommentMention', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='postmention',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='commentmention',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(backfill_mention_times, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='postmention',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='postmention_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentmention',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='cmention_user_created_idx'),
+        ),
+    ]
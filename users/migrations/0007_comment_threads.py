@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:43
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_root_paths(apps, schema_editor):
+    # کامنت‌های موجود همه ریشه‌اند؛ مسیرشان همان بخش اول (زمان ساخت + id) است
+    Comment = apps.get_model('users', 'Comment')
+    epoch = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    batch = []
+    for comment in Comment.objects.only('id', 'created_at').iterator(chunk_size=2000):
+        micros = (comment.created_at - epoch) // datetime.timedelta(microseconds=1)
+        comment.path = f"{micros:016d}{comment.id.int % 10000:04d}"
+        batch.append(comment)
+        if len(batch) == 2000:
+            Comment.objects.bulk_update(batch, ['path'])
+            batch = []
+    if batch:
+        Comment.objects.bulk_update(batch, ['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_mention_through_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='users.comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_root_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(condition=models.Q(('parent__isnull', True)), fields=['post', '-created_at', '-id'], name='comment_root_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path', 'id'], name='comment_post_path_idx'),
+        ),
+    ]
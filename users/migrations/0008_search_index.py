@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:46
+
+import re
+import unicodedata
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# نسخه‌ی منجمد users.search در زمان این مایگریشن؛ کد برنامه بعداً می‌تواند عوض شود
+_CHARACTERS = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "أ": "ا", "إ": "ا", "ٱ": "ا",
+    "\u200c": " ", "\u200d": "", "\u0640": "",
+    **{persian: str(digit) for digit, persian in enumerate("۰۱۲۳۴۵۶۷۸۹")},
+    **{arabic: str(digit) for digit, arabic in enumerate("٠١٢٣٤٥٦٧٨٩")},
+})
+_DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670\u06d6-\u06ed]")
+BATCH_SIZE = 2000
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKC", text or "").translate(_CHARACTERS)
+    return _DIACRITICS_RE.sub("", text).casefold()
+
+
+def _index_postgresql(cursor, table, rows):
+    cursor.executemany(
+        f"UPDATE {table} SET search_vector = to_tsvector('simple', %s) WHERE id = %s",
+        [(_normalize(content), pk) for pk, content in rows],
+    )
+
+
+def _index_sqlite(cursor, table, rows):
+    cursor.executemany(
+        f"INSERT INTO {table}_fts (rowid, body, object_id) VALUES (%s, %s, %s)",
+        [(int.from_bytes(pk.bytes[:8], "big") >> 1, _normalize(content), pk.hex) for pk, content in rows],
+    )
+
+
+def create_search_index(apps, schema_editor):
+    # ایندکس GIN فقط در PostgreSQL و جدول FTS5 فقط در SQLite ساخته می‌شود
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        index = _index_postgresql
+    elif vendor == 'sqlite':
+        index = _index_sqlite
+    else:
+        return
+    models = [apps.get_model('users', 'Post'), apps.get_model('users', 'Comment')]
+    for model in models:
+        table = model._meta.db_table
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_gin ON {table} USING gin (search_vector)"
+            )
+        else:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts "
+                "USING fts5(body, object_id UNINDEXED, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    with schema_editor.connection.cursor() as cursor:
+        for model in models:
+            rows = []
+            for row in model.objects.values_list('pk', 'content').iterator(chunk_size=BATCH_SIZE):
+                rows.append(row)
+                if len(rows) == BATCH_SIZE:
+                    index(cursor, model._meta.db_table, rows)
+                    rows = []
+            if rows:
+                index(cursor, model._meta.db_table, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for name in ('users_post', 'users_comment'):
+        if vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}_search_gin")
+        elif vendor == 'sqlite':
+            schema_editor.execute(f"DROP TABLE IF EXISTS {name}_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_comment_threads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+FIELDS = ('username', 'first_name', 'last_name')
+
+
+def create_prefix_indexes(apps, schema_editor):
+    # PostgreSQL: ایندکس با collation "C" هم LIKE/بازه‌ی پیشوندی و هم ORDER BY را پوشش می‌دهد
+    # SQLite: lower(username) از قبل ایندکس دارد (user_username_lower_idx)
+    table = apps.get_model('users', 'User')._meta.db_table
+    vendor = schema_editor.connection.vendor
+    for field in FIELDS:
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS user_{field}_prefix_idx ON {table} ((lower({field}) COLLATE "C"))'
+            )
+        elif vendor == 'sqlite' and field != 'username':
+            schema_editor.execute(f'CREATE INDEX IF NOT EXISTS user_{field}_prefix_idx ON {table} (lower({field}))')
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    for field in FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{field}_prefix_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -1,14 +1,19 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser ,PermissionsMixin
 import uuid
 from django.contrib.auth.models import BaseUserManager
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.contrib.postgres.search import SearchVectorField
 
 User = settings.AUTH_USER_MODEL
 
 
 class UserManager(BaseUserManager):
-    def create_user(self, email=None, username=None, phone=None, password=None, **extra_fields):
+    def create_user(self, email=None, username=None, phone=None, password=None, encoded_password=None, **extra_fields):
         if not (email or username or phone):
             raise ValueError("حداقل یکی از فیلدهای email، username یا phone باید پر باشد.")
 
@@ -16,7 +21,11 @@ class UserManager(BaseUserManager):
             email = self.normalize_email(email)
 
         user = self.model(email=email, username=username, phone=phone, **extra_fields)
-        user.set_password(password)
+        # encoded_password برای مسیرهایی است که هش را بیرون از request thread ساخته‌اند
+        if encoded_password is not None:
+            user.password = encoded_password
+        else:
+            user.set_password(password)
         user.save(using=self._db)
         return user
 
@@ -49,17 +58,57 @@ class User(AbstractBaseUser, PermissionsMixin):
     REQUIRED_FIELDS = []      
 
     objects = UserManager()   
+
+    class Meta:
+        indexes = [
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+        ]
+
     def __str__(self):
         return self.username or self.email or str(self.id)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # مقادیر خوانده‌شده تا signals تغییر واقعی فیلدها را بدون کوئری اضافه تشخیص دهد
+        user._loaded_values = dict(zip(field_names, values))
+        return user
+
+    def changed_fields(self, fields):
+        """
+        فیلدهایی از fields که از زمان خواندن از دیتابیس عوض شده‌اند؛ فیلد deferred عوض نشده و
+        فیلدی که مقدار خوانده‌شده‌اش معلوم نیست عوض‌شده حساب می‌شود.
+        """
+        loaded = getattr(self, "_loaded_values", {})
+        return {
+            field for field in fields
+            if field in self.__dict__ and (field not in loaded or loaded[field] != self.__dict__[field])
+        }
+
+    def mark_loaded(self, fields):
+        loaded = self.__dict__.setdefault("_loaded_values", {})
+        loaded.update((field, self.__dict__[field]) for field in fields if field in self.__dict__)
     
 class Post(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     author = models.ForeignKey(User, related_name='posts', on_delete=models.CASCADE)
     content = models.TextField()
-    mentions = models.ManyToManyField('users.User', related_name='mentioned_in_posts', blank=True)
+    mentions = models.ManyToManyField('users.User', related_name='mentioned_in_posts', blank=True, through='PostMention')
+    # پست‌هایی با تعداد mention زیاد در تایم‌لاین‌ها پخش نمی‌شوند و هنگام خواندن اضافه می‌شوند
+    fanout_on_read = models.BooleanField(default=False)
+    comment_count = models.PositiveIntegerField(default=0)
+    mention_count = models.PositiveIntegerField(default=0)
+    # فقط در PostgreSQL استفاده می‌شود (users/search.py)؛ ایندکس GIN در مایگریشن 0008 ساخته می‌شود
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+        ]
+
     def __str__(self):
         return f"Post {self.id} by {self.author}"
 
@@ -68,12 +117,66 @@ class Comment(models.Model):
     post = models.ForeignKey(Post, related_name='comments', on_delete=models.CASCADE)
     author = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
     content = models.TextField()
-    mentions = models.ManyToManyField('users.User', related_name='mentioned_in_comments', blank=True)
+    mentions = models.ManyToManyField('users.User', related_name='mentioned_in_comments', blank=True, through='CommentMention')
+    parent = models.ForeignKey('self', related_name='children', null=True, blank=True, on_delete=models.CASCADE)
+    # مسیر materialized: به ازای هر سطح یک بخش عددی هم‌عرض (users/threads.py)؛ زیردرخت یک بازه‌ی ایندکس‌شده است
+    path = models.CharField(max_length=255, default='')
+    depth = models.PositiveSmallIntegerField(default=0)
+    # تعداد کل پاسخ‌های زیردرخت، نه فقط فرزندان مستقیم
+    reply_count = models.PositiveIntegerField(default=0)
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["post", "-created_at", "-id"], name="comment_post_created_id_idx"),
+            models.Index(fields=["post", "-created_at", "-id"], condition=models.Q(parent__isnull=True), name="comment_root_created_idx"),
+            models.Index(fields=["post", "path", "id"], name="comment_post_path_idx"),
+            models.Index(fields=["post", "-updated_at"], name="comment_post_updated_idx"),
+        ]
+
     def __str__(self):
-        return f"Comment {self.id} on {self.post.id}"
+        return f"Comment {self.id} on {self.post_id}"
+
+    def save(self, *args, **kwargs):
+        # کامنتی که بیرون از CommentSerializer.create ساخته شود (ORM، ادمین) مسیر ندارد؛
+        # بدون مسیر، بازه‌ی زیردرخت در users/threads.py ساخته نمی‌شود. شمارنده‌ها هم مثل
+        # همان مسیر به‌روز می‌شوند تا حذف زیردرخت comment_count را منفی نکند.
+        if self.path:
+            return super().save(*args, **kwargs)
+        from . import threads
+
+        now = timezone.now()
+        threads.place(self, self.parent, self.created_at or now)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            threads.count_replies(self.path, self.post_id, 1)
+            Post.objects.filter(pk=self.post_id).update(comment_count=F('comment_count') + 1, updated_at=now)
+
+class PostMention(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "users_post_mentions"
+        unique_together = [("post", "user")]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="postmention_user_created_idx"),
+        ]
+
+class CommentMention(models.Model):
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
+    user = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "users_comment_mentions"
+        unique_together = [("comment", "user")]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="cmention_user_created_idx"),
+        ]
 
 class UsernameChangeHistory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -81,3 +184,69 @@ class UsernameChangeHistory(models.Model):
     old_username = models.CharField(max_length=150, null=True, blank=True)
     new_username = models.CharField(max_length=150, null=True, blank=True)
     changed_at = models.DateTimeField(auto_now_add=True)
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey('users.User', related_name='timeline_entries', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="timeline_user_post_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-post"], name="timeline_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Timeline {self.user_id} <- {self.post_id}"
+
+class OneTimeCode(models.Model):
+    user = models.ForeignKey('users.User', related_name='one_time_codes', on_delete=models.CASCADE)
+    purpose = models.CharField(max_length=32)
+    # فقط HMAC کد ذخیره می‌شود (users/otp.py)، نه خود کد
+    code_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "purpose"], name="otp_user_purpose_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="otp_expires_idx"),
+        ]
+
+    def __str__(self):
+        return f"OTP {self.purpose} for {self.user_id}"
+
+class Task(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "queued"), (RUNNING, "running"), (DONE, "done"), (FAILED, "failed")]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # کار تکراری با همان کلید تا زمان پاک شدن ردیف (TASKS['RETENTION']) دوباره صف نمی‌شود
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["run_at", "id"], condition=models.Q(status="queued"), name="task_ready_idx"),
+            models.Index(fields=["started_at"], condition=models.Q(status="running"), name="task_running_idx"),
+            models.Index(fields=["finished_at"], condition=models.Q(status="done"), name="task_done_idx"),
+        ]
+
+    def __str__(self):
+        return f"Task {self.name} ({self.status})"
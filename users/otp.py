@@ -0,0 +1,248 @@
+import hashlib
+import hmac
+import logging
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import taskqueue
+from .models import OneTimeCode
+
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_RESET = "password_reset"
+
+
+def generate_code(length=None):
+    length = length or settings.OTP["LENGTH"]
+    return str(secrets.randbelow(10 ** length)).zfill(length)
+
+
+def code_digest(user_id, purpose, code):
+    """
+    HMAC-SHA256 با SECRET_KEY؛ کد کوتاه است ولی TTL و سقف تلاش‌ها جلوی brute force
+    را می‌گیرند، پس هش کند رمز عبور لازم نیست. user و purpose در پیام هستند تا
+    digest یک کاربر برای دیگری معتبر نباشد.
+    """
+    message = f"{purpose}:{user_id}:{code}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _delivery_pad(nonce, length):
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"otp-delivery:{nonce}".encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest, "big") % 10 ** length
+
+
+def seal_message(message):
+    """
+    پیامی که در صف کار (جدول Task) ذخیره می‌شود کد خام ندارد: کد با pad مشتق از
+    HMAC(SECRET_KEY, nonce) جمع پیمانه‌ای می‌شود و فقط open_message در worker آن
+    را برمی‌گرداند. ردیف صف، چه موفق چه ناموفق، بدون SECRET_KEY کد را لو نمی‌دهد.
+    """
+    code, nonce = message["code"], secrets.token_hex(16)
+    sealed = (int(code) + _delivery_pad(nonce, len(code))) % 10 ** len(code)
+    return {
+        **{key: value for key, value in message.items() if key != "code"},
+        "nonce": nonce,
+        "sealed_code": str(sealed).zfill(len(code)),
+    }
+
+
+def open_message(message):
+    sealed, nonce = message["sealed_code"], message["nonce"]
+    code = (int(sealed) - _delivery_pad(nonce, len(sealed))) % 10 ** len(sealed)
+    return {
+        **{key: value for key, value in message.items() if key not in ("nonce", "sealed_code")},
+        "code": str(code).zfill(len(sealed)),
+    }
+
+
+class DatabaseOTPStore:
+    """
+    یک ردیف OneTimeCode برای هر (user, purpose)؛ صدور دوباره کد قبلی را جایگزین
+    می‌کند. بررسی داخل select_for_update است تا تلاش‌های هم‌زمان شمارش شوند.
+    """
+
+    def save(self, user_id, purpose, digest, ttl):
+        OneTimeCode.objects.update_or_create(
+            user_id=user_id,
+            purpose=purpose,
+            defaults={"code_hash": digest, "attempts": 0, "expires_at": timezone.now() + timedelta(seconds=ttl)},
+        )
+
+    def verify(self, user_id, purpose, digest, max_attempts):
+        with transaction.atomic():
+            entry = (
+                OneTimeCode.objects.select_for_update()
+                .filter(user_id=user_id, purpose=purpose, expires_at__gt=timezone.now())
+                .first()
+            )
+            if entry is None or entry.attempts >= max_attempts:
+                return False
+            if hmac.compare_digest(entry.code_hash, digest):
+                entry.delete()
+                return True
+            OneTimeCode.objects.filter(pk=entry.pk).update(attempts=F("attempts") + 1)
+            return False
+
+    def purge(self, batch_size=1000):
+        """
+        حذف کدهای منقضی در دسته‌های batch_size با ایندکس expires_at.
+        """
+        now, deleted = timezone.now(), 0
+        while True:
+            ids = list(OneTimeCode.objects.filter(expires_at__lte=now).values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += OneTimeCode.objects.filter(pk__in=ids).delete()[0]
+
+
+class CacheOTPStore:
+    """
+    کدها در کش جنگو با timeout برابر TTL؛ انقضا با خود کش است. خواندن و نوشتن
+    شمارنده‌ی تلاش‌ها اتمیک نیست و زیر هم‌زمانی ممکن است یکی دو تلاش بیشتر مجاز شود.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def _key(self, user_id, purpose):
+        return f"otp:{purpose}:{user_id}"
+
+    def save(self, user_id, purpose, digest, ttl):
+        caches[self.alias].set(self._key(user_id, purpose), (digest, 0, time.time() + ttl), ttl)
+
+    def verify(self, user_id, purpose, digest, max_attempts):
+        cache, key = caches[self.alias], self._key(user_id, purpose)
+        entry = cache.get(key)
+        if entry is None:
+            return False
+        stored, attempts, expires = entry
+        remaining = expires - time.time()
+        if remaining <= 0 or attempts >= max_attempts:
+            return False
+        if hmac.compare_digest(stored, digest):
+            cache.delete(key)
+            return True
+        cache.set(key, (stored, attempts + 1, expires), max(int(remaining), 1))
+        return False
+
+    def purge(self, batch_size=1000):
+        return 0
+
+
+class LocalDeliveryQueue:
+    """
+    جایگزین محلی صف ارسال SMS/ایمیل: پیام‌ها در صف داخل پروسس قرار می‌گیرند و
+    یک thread پس‌زمینه آن‌ها را لاگ می‌کند. request منتظر ارسال نمی‌ماند. کد خام
+    هرگز لاگ نمی‌شود و فقط با OTP['KEEP_OUTBOX'] (توسعه و تست) در outbox می‌ماند.
+    """
+
+    def __init__(self, outbox_size=100):
+        self.outbox = deque(maxlen=outbox_size)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, message):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="otp-delivery", daemon=True)
+                self._thread.start()
+        self._queue.put(message)
+
+    def _run(self):
+        while True:
+            message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                self.deliver(message)
+            except Exception:
+                logger.exception("OTP delivery failed")
+            finally:
+                self._queue.task_done()
+
+    def deliver(self, message):
+        logger.info("OTP %s for %s via %s", message["purpose"], message["to"], message["channel"])
+        if settings.OTP["KEEP_OUTBOX"]:
+            self.outbox.append(message)
+
+    def join(self):
+        self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+
+
+class TaskDeliveryQueue(LocalDeliveryQueue):
+    """
+    ارسال از طریق صف کارها (users/taskqueue.py): enqueue یک کار otp.deliver با
+    پیام مهروموم‌شده (seal_message) ثبت می‌کند و worker همان deliver را اجرا می‌کند.
+    برای SMS/ایمیل واقعی deliver را override کنید.
+    """
+
+    def enqueue(self, message):
+        taskqueue.enqueue("otp.deliver", message=seal_message(message))
+
+
+_store = None
+_delivery = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        backend = import_string(settings.OTP["STORE"])
+        _store = backend(alias=settings.OTP["CACHE_ALIAS"]) if issubclass(backend, CacheOTPStore) else backend()
+    return _store
+
+
+def get_delivery_queue():
+    global _delivery
+    if _delivery is None:
+        _delivery = import_string(settings.OTP["DELIVERY"])()
+    return _delivery
+
+
+@receiver(setting_changed)
+def _reset_otp(setting, **kwargs):
+    global _store, _delivery
+    if setting == "OTP":
+        if _delivery is not None:
+            _delivery.close()
+        _store, _delivery = None, None
+
+
+def issue(user, channel, to, purpose=PASSWORD_RESET):
+    """
+    ساخت کد جدید، ذخیره‌ی digest آن و سپردن ارسال به صف. کد برگردانده می‌شود
+    ولی نباید در پاسخ API قرار بگیرد.
+    """
+    code = generate_code()
+    get_otp_store().save(user.pk, purpose, code_digest(user.pk, purpose, code), settings.OTP["TTL"])
+    get_delivery_queue().enqueue({"channel": channel, "to": to, "purpose": purpose, "code": code})
+    return code
+
+
+def verify(user, code, purpose=PASSWORD_RESET):
+    """
+    بررسی یک‌بارمصرف: کد درست حذف می‌شود و کد غلط یک تلاش مصرف می‌کند.
+    """
+    return get_otp_store().verify(
+        user.pk, purpose, code_digest(user.pk, purpose, code), settings.OTP["MAX_ATTEMPTS"],
+    )
@@ -0,0 +1,229 @@
+import datetime
+import heapq
+import itertools
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+Cursor = namedtuple("Cursor", ["position", "reverse"])
+
+
+def keyset_filter(ordering, position):
+    """
+    شرط «بعد از position» برای ترتیب چندستونی؛ به‌جای OFFSET از ایندکس
+    ترکیبی استفاده می‌کند و هزینه‌ی صفحه‌های عمیق با صفحه‌ی اول برابر است.
+    """
+    fields = [(key.lstrip("-"), key.startswith("-")) for key in ordering]
+    after = Q()
+    for index, (name, descending) in enumerate(fields):
+        clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": position[index]})
+        for (prev_name, _), prev_value in zip(fields[:index], position[:index]):
+            clause &= Q(**{prev_name: prev_value})
+        after |= clause
+    first_name, first_descending = fields[0]
+    bound = Q(**{f"{first_name}__{'lte' if first_descending else 'gte'}": position[0]})
+    return bound & after
+
+
+def merged_stream_filter(field, kind, position):
+    """
+    شرط «بعد از cursor» برای یک جریان در ادغام چند جریان با ترتیب نزولی
+    (field, kind, id). چون kind در هر جریان ثابت است، مقایسه‌ی سه‌تایی به یک
+    شرط ساده روی (field, id) تبدیل می‌شود.
+    """
+    value, cursor_kind, object_id = position
+    if kind < cursor_kind:
+        return Q(**{f"{field}__lte": value})
+    if kind > cursor_kind:
+        return Q(**{f"{field}__lt": value})
+    return Q(**{f"{field}__lte": value}) & (Q(**{f"{field}__lt": value}) | Q(id__lt=object_id))
+
+
+def merge_streams(streams, limit):
+    """
+    ادغام k-راهه‌ی جریان‌هایی از (key, item) که هر کدام نزولی مرتب‌اند.
+    """
+    merged = heapq.merge(*streams, key=lambda entry: entry[0], reverse=True)
+    return [item for _, item in itertools.islice(merged, limit)]
+
+
+def invert_ordering(ordering):
+    return tuple(key[1:] if key.startswith("-") else f"-{key}" for key in ordering)
+
+
+def _dump_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    صفحه‌بندی cursor روی (created_at, id) با cursorهای امضاشده.
+    ویوها می‌توانند ترتیب را با keyset_ordering عوض کنند.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = "مقدار cursor صفحه‌بندی"
+    page_size_query_param = "page_size"
+    page_size_query_description = "تعداد آیتم در هر صفحه"
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = getattr(settings, "API_MAX_PAGE_SIZE", 100)
+    ordering = ("-created_at", "-id")
+    signing_salt = "users.pagination"
+    invalid_cursor_message = "cursor نامعتبر است."
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        ordering = self.ordering
+        if self.cursor is not None and self.cursor.reverse:
+            ordering = invert_ordering(ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(keyset_filter(ordering, self.cursor.position))
+
+        results = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.cursor is not None and self.cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def paginate_stream(self, fetch, request, model, view=None):
+        """
+        صفحه‌بندی منبعی که QuerySet نیست (مثلاً ادغام چند جریان).
+        fetch(position, limit) باید آیتم‌های بعد از position را به ترتیب
+        ordering برگرداند؛ فقط cursor رو به جلو پشتیبانی می‌شود.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        self.model = model
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is not None and self.cursor.reverse:
+            raise NotFound(self.invalid_cursor_message)
+
+        position = self.cursor.position if self.cursor is not None else None
+        results = list(fetch(position, self.page_size + 1))
+        self.page = results[: self.page_size]
+        self.has_next, self.has_previous = len(results) > self.page_size, False
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(self.get_position(self.page[-1]), reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(self.get_position(self.page[0]), reverse=True))
+
+    def get_position(self, item):
+        names = [key.lstrip("-") for key in self.ordering]
+        if isinstance(item, dict):
+            return tuple(item[name] for name in names)
+        return tuple(getattr(item, name) for name in names)
+
+    def encode_cursor(self, cursor):
+        token = signing.dumps(
+            {"p": [_dump_value(value) for value in cursor.position], "r": int(cursor.reverse)},
+            salt=self.signing_salt,
+            compress=True,
+        )
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = signing.loads(token, salt=self.signing_salt)
+            position = self.load_position(payload["p"])
+            return Cursor(position, reverse=bool(payload["r"]))
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def load_position(self, values):
+        if len(values) != len(self.ordering):
+            raise ValueError("cursor length mismatch")
+        position = []
+        for key, value in zip(self.ordering, values):
+            try:
+                field = self.model._meta.get_field(key.lstrip("-"))
+            except FieldDoesNotExist:
+                position.append(value)
+            else:
+                position.append(field.to_python(value))
+        return tuple(position)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.cursor_query_description,
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": self.page_size_query_description,
+                "schema": {"type": "integer"},
+            },
+        ]
@@ -0,0 +1,46 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson اختیاری است
+    orjson = None
+
+
+# عدد با نما در خروجی orjson (1e16)؛ json پایتون 1e+16 می‌نویسد. ممکن است داخل
+# رشته‌ها هم match شود که فقط به مسیر کندتر می‌رود. سه الگو با پیشوند ثابت از
+# یک الگو با character class چند برابر سریع‌ترند.
+_EXPONENT_PATTERNS = [
+    re.compile(re.escape(prefix) + rb"-?[0-9]+(?:\.[0-9]+)?e") for prefix in (b":", b",", b"[")
+]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer با orjson در صورت نصب بودن. خروجی برای هر داده‌ای که
+    JSONRenderer رندر می‌کند بایت‌به‌بایت یکسان است: datetime و انواع غیر
+    بومی از همان JSONEncoder خود DRF عبور می‌کنند، U+2028/U+2029 escape
+    می‌شوند و هر حالت متفاوت (indent، ensure_ascii، عدد بزرگ‌تر از ۶۴ بیت،
+    کلید غیر رشته‌ای، float با نما) به JSONRenderer اصلی برمی‌گردد.
+    تنها تفاوت: NaN/Infinity که JSONRenderer با STRICT_JSON رد می‌کند، null می‌شود.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if any(pattern.search(ret) for pattern in _EXPONENT_PATTERNS):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
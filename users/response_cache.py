@@ -0,0 +1,128 @@
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+
+VERSION_KEY = "response-cache:posts:version"
+
+# قفل‌های محلی به صورت striped؛ threadهای یک پروسس برای یک کلید پشت هم می‌ایستند
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE["CACHE_ALIAS"]]
+
+
+def current_version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def _bump_version():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 2, None)
+
+
+def invalidate_post_responses():
+    """
+    همه‌ی پاسخ‌های کش‌شده‌ی پست‌ها را با بالا بردن نسخه‌ی کلیدها باطل می‌کند؛
+    ورودی‌های قدیمی با TTL از بین می‌روند. یک بار دیگر بعد از commit هم نسخه
+    بالا می‌رود تا readerی که وسط تراکنش داده‌ی قدیمی را کش کرده اثری نگذارد.
+    """
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+def cache_key(request, version, etag=None):
+    # etag همان validator تازه از دیتابیس است (conditional_get)؛ با آن در کلید، workerی که
+    # bump نسخه را ندیده (کش محلی) هم بدنه‌ی قدیمی را زیر ETag جدید برنمی‌گرداند
+    media_type = getattr(request, "accepted_media_type", "")
+    digest = hashlib.sha256(f"{media_type}|{request.get_full_path()}|{etag or ''}".encode()).hexdigest()
+    return f"response-cache:posts:v{version}:{digest}"
+
+
+def get_or_render(key, render):
+    """
+    مقدار کلید را برمی‌گرداند و در صورت نبودن فقط یک بار render می‌کند (single-flight).
+    بین پروسس‌ها از cache.add به‌عنوان قفل استفاده می‌شود؛ بقیه تا LOCK_TIMEOUT
+    منتظر نتیجه می‌مانند و بعد از آن خودشان (بدون ذخیره) render می‌کنند.
+    خروجی (value, hit) است؛ render با برگرداندن None از ذخیره شدن جلوگیری می‌کند.
+    """
+    cache = _cache()
+    value = cache.get(key)
+    if value is not None:
+        return value, True
+
+    with _locks[hash(key) % len(_locks)]:
+        value = cache.get(key)
+        if value is not None:
+            return value, True
+
+        lock_key = f"{key}:lock"
+        lock_timeout = settings.RESPONSE_CACHE["LOCK_TIMEOUT"]
+        if cache.add(lock_key, 1, lock_timeout):
+            try:
+                value = render()
+                if value is not None:
+                    cache.set(key, value, settings.RESPONSE_CACHE["TTL"])
+            finally:
+                cache.delete(lock_key)
+            return value, False
+
+        deadline = time.monotonic() + lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = cache.get(key)
+            if value is not None:
+                return value, True
+        return render(), False
+
+
+def cache_anonymous_get(method):
+    """
+    بایت‌های render‌شده‌ی پاسخ‌های 200 برای کاربران ناشناس را بر اساس URL کامل
+    (شامل cursor)، نوع رسانه و ETag جاری (زیر conditional_get) کش می‌کند. کاربران
+    واردشده همیشه پاسخ تازه می‌گیرند.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE["ENABLED"] or request.user.is_authenticated:
+            return method(self, request, *args, **kwargs)
+
+        rendered = []
+
+        def render():
+            response = method(self, request, *args, **kwargs)
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            rendered.append(response)
+            if response.status_code != 200:
+                return None
+            return {"content": response.content, "content_type": response["Content-Type"]}
+
+        key = cache_key(request, current_version(), getattr(request, "conditional_etag", None))
+        entry, hit = get_or_render(key, render)
+        if not hit:
+            response = rendered[0]
+            if response.status_code == 200:
+                response["X-Cache"] = "MISS"
+            return response
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        response["X-Cache"] = "HIT"
+        return response
+
+    return wrapper
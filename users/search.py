@@ -0,0 +1,160 @@
+import re
+import unicodedata
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+
+from .models import Comment, Post
+from .pagination import merge_streams, merged_stream_filter
+
+
+# ترتیب سراسری نتایج: (rank, kind, id) نزولی؛ id فقط در هر نوع یکتاست
+SEARCH_ORDERING = ("-rank", "-kind", "-id")
+SEARCH_MODELS = {"post": Post, "comment": Comment}
+
+_CHARACTERS = str.maketrans({
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه", "أ": "ا", "إ": "ا", "ٱ": "ا",
+    "\u200c": " ",  # نیم‌فاصله: «می‌خواهم» مثل «می خواهم» توکن می‌شود
+    "\u200d": "", "\u0640": "",  # ZWJ و کشیده
+    **{persian: str(digit) for digit, persian in enumerate("۰۱۲۳۴۵۶۷۸۹")},
+    **{arabic: str(digit) for digit, arabic in enumerate("٠١٢٣٤٥٦٧٨٩")},
+})
+_DIACRITICS_RE = re.compile("[\u064b-\u065f\u0670\u06d6-\u06ed]")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    """
+    یکسان‌سازی متن فارسی برای ایندکس و جستجو: ی/ک عربی، اعراب، نیم‌فاصله،
+    ارقام فارسی/عربی و حروف بزرگ لاتین.
+    """
+    text = unicodedata.normalize("NFKC", text or "").translate(_CHARACTERS)
+    return _DIACRITICS_RE.sub("", text).casefold()
+
+
+def search_terms(text):
+    return _TOKEN_RE.findall(normalize_text(text))
+
+
+class PostgresSearchBackend:
+    """
+    ستون tsvector ذخیره‌شده با ایندکس GIN. متن قبل از to_tsvector در پایتون
+    نرمال می‌شود و پیکربندی simple (بدون stemming انگلیسی) استفاده می‌شود.
+    """
+
+    config = "simple"
+
+    def index(self, model, rows):
+        objects = [
+            model(pk=pk, search_vector=SearchVector(Value(normalize_text(content)), config=self.config))
+            for pk, content in rows
+        ]
+        model.objects.bulk_update(objects, ["search_vector"], batch_size=500)
+
+    def remove(self, model, pks):
+        # ستون همراه ردیف حذف می‌شود
+        pass
+
+    def ranked(self, model, kind, terms, position, limit):
+        query = SearchQuery(" ".join(terms), config=self.config, search_type="plain")
+        # ts_rank مقدار real (float4) برمی‌گرداند و rank در cursor به float8 تبدیل می‌شود؛ بدون cast
+        # برابری و مقایسه‌ی مرز صفحه‌ها دقیق نیست و ردیف تکرار یا جا می‌افتد
+        rank = Cast(SearchRank(F("search_vector"), query), FloatField())
+        queryset = model.objects.filter(search_vector=query).annotate(rank=rank)
+        if position is not None:
+            queryset = queryset.filter(merged_stream_filter("rank", kind, position))
+        return list(queryset.order_by("-rank", "-id").values_list("rank", "id")[:limit])
+
+
+class SQLiteSearchBackend:
+    """
+    جایگزین FTS5 برای SQLite (تست‌ها). برای هر مدل یک جدول <db_table>_fts با
+    rowid مشتق از uuid دارد تا حذف و به‌روزرسانی بدون اسکن جدول انجام شود.
+    """
+
+    def _table(self, model):
+        return f"{model._meta.db_table}_fts"
+
+    def _rowid(self, pk):
+        return int.from_bytes(pk.bytes[:8], "big") >> 1
+
+    def index(self, model, rows):
+        rows = [(self._rowid(pk), normalize_text(content), pk.hex) for pk, content in rows]
+        table = self._table(model)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(f"INSERT INTO {table} (rowid, body, object_id) VALUES (%s, %s, %s)", rows)
+
+    def remove(self, model, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self._table(model)} WHERE rowid = %s", [(self._rowid(pk),) for pk in pks])
+
+    def ranked(self, model, kind, terms, position, limit):
+        table = self._table(model)
+        match = " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        condition, params = "1", []
+        if position is not None:
+            rank, cursor_kind, object_id = position
+            if kind < cursor_kind:
+                condition, params = "score <= %s", [rank]
+            elif kind > cursor_kind:
+                condition, params = "score < %s", [rank]
+            else:
+                condition, params = "(score < %s OR (score = %s AND object_id < %s))", [rank, rank, object_id.hex]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT score, object_id FROM (SELECT -bm25({table}) AS score, object_id FROM {table} "
+                f"WHERE {table} MATCH %s) WHERE {condition} ORDER BY score DESC, object_id DESC LIMIT %s",
+                [match, *params, limit],
+            )
+            return [(score, model._meta.pk.to_python(object_id)) for score, object_id in cursor.fetchall()]
+
+
+BACKENDS = {"postgresql": PostgresSearchBackend, "sqlite": SQLiteSearchBackend}
+
+
+def get_search_backend():
+    return BACKENDS[connection.vendor]()
+
+
+def index_pks(model, pks):
+    """
+    متن فعلی ردیف‌ها از دیتابیس خوانده می‌شود تا اجرای دیرهنگام یا تکراری کار ایندکس درست بماند.
+    """
+    get_search_backend().index(model, list(model.objects.filter(pk__in=pks).values_list("pk", "content")))
+
+
+def remove_pks(model, pks):
+    get_search_backend().remove(model, pks)
+
+
+def search(text, querysets, position=None, limit=20):
+    """
+    جستجوی رتبه‌بندی‌شده روی پست‌ها و کامنت‌ها؛ هر نوع حداکثر limit کلید
+    می‌خواند و نتایج با ادغام k-راهه روی (rank, kind, id) کنار هم قرار می‌گیرند.
+    querysets برای هر kind کوئری بارگذاری اشیا (با select_related و ...) است.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    backend = get_search_backend()
+    streams = []
+    for kind, model in SEARCH_MODELS.items():
+        keys = backend.ranked(model, kind, terms, position, limit)
+        streams.append([((rank, kind, pk), (kind, pk)) for rank, pk in keys])
+    keys = merge_streams(streams, limit)
+
+    loaded = {
+        kind: querysets[kind].in_bulk([pk for key_kind, pk in keys if key_kind == kind])
+        for kind in SEARCH_MODELS
+    }
+    ranks = {(kind, pk): rank for stream in streams for (rank, kind, pk), _ in stream}
+    results = []
+    for kind, pk in keys:
+        item = loaded[kind].get(pk)
+        if item is not None:
+            item.kind, item.rank = kind, ranks[(kind, pk)]
+            results.append(item)
+    return results
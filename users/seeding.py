@@ -0,0 +1,135 @@
+import datetime
+import random
+import re
+import time
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import feed, taskqueue, threads
+from .models import Comment, Post, PostMention
+
+
+User = get_user_model()
+
+VOCABULARY = (
+    "سلام", "امروز", "کتاب", "قهوه", "سفر", "کد", "فیلم", "موسیقی", "تهران", "باران",
+    "django", "api", "python", "postgres", "عکس", "دوست", "کار", "شب", "خبر", "ورزش",
+)
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+class Seeder:
+    """
+    داده‌ی مصنوعی با bulk_create در chunkهای batch_size پستی، هر chunk در یک
+    تراکنش. شمارنده‌ها (comment_count، mention_count، reply_count) و مسیر
+    کامنت‌ها همان‌جا در پایتون ساخته می‌شوند تا نیازی به UPDATE بعدی نباشد.
+    همه‌ی کاربران رمز password دارند و یک بار هش می‌شود. با side_effects
+    ایندکس جستجو و fan-out تایم‌لاین مثل درج bulk پست‌ها در صف کار قرار می‌گیرند.
+    """
+
+    def __init__(self, prefix="seed", password="seed-password", batch_size=2000, seed=0, side_effects=False):
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+        self.side_effects = side_effects
+        self.rows = defaultdict(int)
+        self.seconds = defaultdict(float)
+        # مسیر کامنت‌ها بر اساس زمان است؛ هر کامنت یک میکروثانیه جلوتر
+        self.clock = timezone.now()
+
+    def insert(self, model, objs):
+        started = time.perf_counter()
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.seconds[model._meta.model_name] += time.perf_counter() - started
+        self.rows[model._meta.model_name] += len(objs)
+
+    def run(self, users, posts_per_user, comments_per_post, mentions_per_post, reply_share=0.3):
+        encoded = make_password(self.password)
+        with transaction.atomic():
+            people = [
+                User(username=f"{self.prefix}{i}", email=f"{self.prefix}{i}@example.com", password=encoded)
+                for i in range(users)
+            ]
+            self.insert(User, people)
+
+        chunk = []
+        for author in people:
+            for _ in range(posts_per_user):
+                chunk.append(author)
+                if len(chunk) >= self.batch_size:
+                    self.seed_posts(chunk, people, comments_per_post, mentions_per_post, reply_share)
+                    chunk = []
+        if chunk:
+            self.seed_posts(chunk, people, comments_per_post, mentions_per_post, reply_share)
+        return self.report()
+
+    def seed_posts(self, authors, people, comments_per_post, mentions_per_post, reply_share):
+        rng = self.rng
+        posts, mentions, comments = [], [], []
+        for author in authors:
+            candidates = rng.sample(people, min(mentions_per_post + 1, len(people)))
+            mentioned = [user for user in candidates if user is not author][:mentions_per_post]
+            post = Post(
+                author=author,
+                content=f"{_text(rng, 12)} " + " ".join(f"@{user.username}" for user in mentioned),
+                mention_count=len(mentioned),
+                fanout_on_read=feed.fanout_on_read_for(author.pk, [user.pk for user in mentioned]),
+            )
+            posts.append(post)
+            mentions.extend(PostMention(post=post, user=user) for user in mentioned)
+            thread = self.build_thread(post, people, comments_per_post, reply_share)
+            post.comment_count = len(thread)
+            comments.extend(thread)
+
+        with transaction.atomic():
+            self.insert(Post, posts)
+            self.insert(PostMention, mentions)
+            # والدها قبل از فرزندان ساخته شده‌اند و bulk_create همان ترتیب را درج می‌کند
+            self.insert(Comment, comments)
+            if self.side_effects:
+                post_ids = [post.pk for post in posts]
+                taskqueue.enqueue("feed.fanout_new_posts", post_ids=post_ids)
+                taskqueue.enqueue("search.index", model=Post._meta.label_lower, pks=post_ids)
+                taskqueue.enqueue("search.index", model=Comment._meta.label_lower, pks=[c.pk for c in comments])
+
+    def build_thread(self, post, people, count, reply_share):
+        rng = self.rng
+        thread = []
+        for _ in range(count):
+            parent = rng.choice(thread) if thread and rng.random() < reply_share else None
+            if parent is not None and parent.depth >= threads.MAX_DEPTH:
+                parent = None
+            comment = Comment(post=post, author=rng.choice(people), content=_text(rng, 8))
+            self.clock += datetime.timedelta(microseconds=1)
+            threads.place(comment, parent, self.clock)
+            ancestor = parent
+            while ancestor is not None:
+                ancestor.reply_count += 1
+                ancestor = ancestor.parent
+            thread.append(comment)
+        return thread
+
+    def report(self):
+        return {
+            name: {
+                "rows": self.rows[name],
+                "seconds": round(self.seconds[name], 3),
+                "rows_per_sec": round(self.rows[name] / self.seconds[name]) if self.seconds[name] else None,
+            }
+            for name in self.rows
+        }
+
+
+def clear(prefix):
+    """
+    حذف کاربران یک اجرای قبلی و (با cascade) پست‌ها و کامنت‌هایشان.
+    """
+    return User.objects.filter(username__regex=rf"^{re.escape(prefix)}[0-9]+$").delete()[0]
@@ -1,7 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework.validators import UniqueValidator
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from .models import Post, Comment, UsernameChangeHistory
+from . import otp, taskqueue, threads
+from .mentions import (MentionsField, add_mentions, edited_mention_ids, forget_handles,
+                       mention_ids_for, remove_mentions)
+from .identifiers import get_user_by
+from .response_cache import invalidate_post_responses
 
 
 User = get_user_model()
@@ -56,7 +65,8 @@ class ResetPasswordSerializer(serializers.Serializer):
         raise serializers.ValidationError("لطفاً ایمیل یا شماره تلفن وارد کنید (username قابل قبول نیست).")
 
     def validate_otp(self, value):
-        if value != "123456":
+        value = value.strip()
+        if not value.isdigit() or len(value) != settings.OTP["LENGTH"]:
             raise serializers.ValidationError("OTP نامعتبر است.")
         return value
 
@@ -65,20 +75,20 @@ class ResetPasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError("رمز عبور باید حداقل ۶ کاراکتر باشد.")
         return value
 
-    def save(self):
-        ident = self.validated_data["identifier"]
-        if isinstance(ident, dict):
-            ident_type = ident["type"]
-            ident_value = ident["value"]
-        else:
-            ident_type = "email" if ("@" in ident and "." in ident.split("@")[-1]) else "phone"
-            ident_value = ident
-
-        if ident_type == "email":
-            user = User.objects.filter(email__iexact=ident_value).first()
-        else:
-            user = User.objects.filter(phone__iexact=ident_value).first()
+    def validate(self, attrs):
+        ident = attrs["identifier"]
+        user = get_user_by(ident["type"], ident["value"])
+        # کد فقط برای کاربر موجود بررسی و مصرف می‌شود؛ هر تلاش غلط از سقف MAX_ATTEMPTS کم می‌کند
+        if user and not otp.verify(user, attrs["otp"]):
+            raise serializers.ValidationError({"otp": ["OTP نامعتبر است."]})
+        attrs["user"] = user
+        return attrs
+
+    def get_user(self):
+        return self.validated_data["user"]
 
+    def save(self):
+        user = self.validated_data["user"]
         if not user:
             raise serializers.ValidationError("کاربری با مشخصات وارد شده یافت نشد.")
 
@@ -129,6 +139,13 @@ class UserSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("یوزرنیم قبلاً استفاده شده")
         return value
 
+    def update(self, instance, validated_data):
+        old_username = instance.username
+        user = super().update(instance, validated_data)
+        if old_username != user.username:
+            forget_handles(old_username)
+        return user
+
     def validate_email(self, value):
         user = self.context['request'].user
         if value and User.objects.exclude(id=user.id).filter(email=value).exists():
@@ -148,47 +165,111 @@ class UserMinSerializer(serializers.ModelSerializer):
 
 class PostSerializer(serializers.ModelSerializer):
     author = UserMinSerializer(read_only=True)
-    mentions = serializers.PrimaryKeyRelatedField(many=True, queryset=User.objects.all(), required=False)
+    mentions = MentionsField(required=False)
 
     class Meta:
         model = Post
-        fields = ["id", "author", "content", "mentions", "created_at", "updated_at"]
-        read_only_fields = ["id", "author", "created_at", "updated_at"]
+        fields = ["id", "author", "content", "mentions", "comment_count", "mention_count", "created_at", "updated_at"]
+        read_only_fields = ["id", "author", "comment_count", "mention_count", "created_at", "updated_at"]
 
     def create(self, validated_data):
-        mentions = validated_data.pop('mentions', [])
+        explicit = validated_data.pop('mentions', [])
         request = self.context.get('request')
         user = request.user
-        post = Post.objects.create(author=user, **validated_data)
-        if mentions:
-            post.mentions.set(mentions)
+        mention_ids = mention_ids_for(validated_data.get('content'), explicit)
+        with transaction.atomic():
+            post = Post.objects.create(author=user, mention_count=len(mention_ids), **validated_data)
+            add_mentions(post, mention_ids)
+        taskqueue.enqueue("feed.sync_post_fanout", post_id=post.pk, mention_ids=mention_ids, created=True)
         return post
 
     def update(self, instance, validated_data):
-        mentions = validated_data.pop('mentions', None)
+        explicit = validated_data.pop('mentions', None)
+        previous_content = instance.content
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
-        if mentions is not None:
-            instance.mentions.set(mentions)
+        if explicit is None and 'content' not in validated_data:
+            return instance
+
+        previous, mention_ids = edited_mention_ids(instance, previous_content, explicit)
+        removed = set(previous) - set(mention_ids)
+        added = [user_id for user_id in mention_ids if user_id not in set(previous)]
+        delta = len(added) - len(removed)
+        with transaction.atomic():
+            remove_mentions(instance, removed)
+            add_mentions(instance, added)
+            if delta:
+                Post.objects.filter(pk=instance.pk).update(mention_count=F('mention_count') + delta)
+                # update() سیگنال ندارد؛ نسخه‌ی کش‌شده‌ی بعد از save دیگر معتبر نیست
+                invalidate_post_responses()
+        instance.mention_count = len(mention_ids)
+        taskqueue.enqueue(
+            "feed.sync_post_fanout", post_id=instance.pk, mention_ids=mention_ids, previous_mention_ids=previous,
+        )
         return instance
 
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
     post = serializers.PrimaryKeyRelatedField(read_only=True)
-    mentions = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), many=True, required=False)
+    mentions = MentionsField(required=False)
+    parent = serializers.PrimaryKeyRelatedField(queryset=Comment.objects.all(), required=False, allow_null=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'author', 'content', 'mentions', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'author', 'post', 'created_at', 'updated_at']
+        fields = ['id', 'post', 'author', 'content', 'mentions', 'parent', 'depth', 'reply_count', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'author', 'post', 'depth', 'reply_count', 'created_at', 'updated_at']
 
     def create(self, validated_data):
-        mentions_data = validated_data.pop('mentions', [])
-        comment = Comment.objects.create(**validated_data)
-        comment.mentions.set(mentions_data)
+        explicit = validated_data.pop('mentions', [])
+        parent = validated_data.pop('parent', None)
+        if parent is not None and str(parent.post_id) != str(validated_data.get('post_id')):
+            raise serializers.ValidationError({"parent": ["کامنت والد متعلق به این پست نیست."]})
+        if parent is not None and parent.depth >= threads.MAX_DEPTH:
+            raise serializers.ValidationError({"parent": ["حداکثر عمق پاسخ‌ها رعایت نشده است."]})
+
+        mention_ids = mention_ids_for(validated_data.get('content'), explicit)
+        now = timezone.now()
+        with transaction.atomic():
+            comment = Comment(**validated_data)
+            threads.place(comment, parent, now)
+            comment.save()
+            add_mentions(comment, mention_ids)
+            threads.count_replies(comment.path, comment.post_id, 1)
+            Post.objects.filter(pk=comment.post_id).update(comment_count=F('comment_count') + 1, updated_at=now)
         return comment
 
+    def update(self, instance, validated_data):
+        # جابه‌جایی کامنت در درخت پشتیبانی نمی‌شود
+        validated_data.pop('parent', None)
+        explicit = validated_data.pop('mentions', None)
+        previous_content = instance.content
+        instance = super().update(instance, validated_data)
+        if explicit is None and 'content' not in validated_data:
+            return instance
+
+        previous, mention_ids = edited_mention_ids(instance, previous_content, explicit)
+        with transaction.atomic():
+            remove_mentions(instance, set(previous) - set(mention_ids))
+            add_mentions(instance, [user_id for user_id in mention_ids if user_id not in set(previous)])
+        return instance
+
+class MentionSerializer(serializers.Serializer):
+    type = serializers.CharField(source='kind', read_only=True)
+    mentioned_at = serializers.DateTimeField(source='created_at', read_only=True)
+    post = PostSerializer(read_only=True)
+    comment = CommentSerializer(read_only=True)
+
+class SearchResultSerializer(serializers.Serializer):
+    type = serializers.CharField(source='kind', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        serializer = PostSerializer if instance.kind == 'post' else CommentSerializer
+        data[instance.kind] = serializer(instance, context=self.context).data
+        return data
+
 class ChangeUsernameSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=50)
 
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import taskqueue
+from .authentication import invalidate_user
+from .mentions import forget_handles
+from .models import Comment, Post
+from .response_cache import invalidate_post_responses
+
+
+User = get_user_model()
+
+# فیلدهایی از کاربر که در خروجی پست‌ها (UserMinSerializer) دیده می‌شوند
+POST_AUTHOR_FIELDS = {"username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+    forget_handles(instance.username)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_responses(sender, instance, created, update_fields=None, **kwargs):
+    # کاربر تازه هنوز پستی ندارد؛ ذخیره‌ی رمز یا last_login هم در خروجی پست‌ها دیده نمی‌شود
+    fields = POST_AUTHOR_FIELDS if update_fields is None else POST_AUTHOR_FIELDS & set(update_fields)
+    changed = not created and instance.changed_fields(fields)
+    instance.mark_loaded(POST_AUTHOR_FIELDS)
+    if changed:
+        invalidate_post_responses()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_cached_post_responses(sender, **kwargs):
+    invalidate_post_responses()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def index_for_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or "content" in update_fields:
+        taskqueue.enqueue("search.index", model=sender._meta.label_lower, pks=[instance.pk])
+
+
+@receiver(pre_delete, sender=Post)
+@receiver(pre_delete, sender=Comment)
+def remove_from_search(sender, instance, **kwargs):
+    taskqueue.enqueue("search.remove", model=sender._meta.label_lower, pks=[instance.pk])
@@ -0,0 +1,162 @@
+import json
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+
+# نام -> (تابع، max_attempts)؛ کارها در users/tasks.py ثبت می‌شوند (import در apps.ready)
+REGISTRY = {}
+
+
+def task(name, max_attempts=None):
+    def decorator(fn):
+        REGISTRY[name] = (fn, max_attempts)
+        return fn
+    return decorator
+
+
+def _lookup(name):
+    try:
+        return REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"کار ثبت‌نشده: {name}") from None
+
+
+def backoff_delay(attempts):
+    """
+    تأخیر نمایی با jitter کامل برای تلاش بعدی: تصادفی در [0.5, 1] برابر
+    BACKOFF_BASE * 2^(attempts-1)، با سقف BACKOFF_MAX.
+    """
+    config = settings.TASKS
+    delay = min(config["BACKOFF_MAX"], config["BACKOFF_BASE"] * 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1)
+
+
+class EagerQueue:
+    """
+    اجرای فوری در همان پروسس و همان تراکنش (تست‌ها و توسعه‌ی محلی). آرگومان‌ها
+    مثل صف واقعی از JSON عبور می‌کنند و خطاها بالا می‌روند.
+    """
+
+    def __init__(self):
+        self._seen = set()
+
+    def enqueue(self, name, kwargs, key=None, delay=None, max_attempts=None):
+        fn, _ = _lookup(name)
+        if key is not None:
+            if key in self._seen:
+                return
+            self._seen.add(key)
+        fn(**json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder)))
+
+
+class DatabaseQueue:
+    """
+    صف روی جدول Task. ردیف در همان تراکنش نوشتن ثبت می‌شود، پس worker فقط کارهای
+    commit‌شده را می‌بیند. برداشتن کار با SELECT ... FOR UPDATE SKIP LOCKED است تا
+    workerهای هم‌زمان روی ردیف‌های قفل‌شده‌ی هم منتظر نمانند (در SQLite نادیده گرفته می‌شود).
+    """
+
+    def enqueue(self, name, kwargs, key=None, delay=None, max_attempts=None):
+        _, default_attempts = _lookup(name)
+        now = timezone.now()
+        Task.objects.bulk_create(
+            [Task(
+                name=name,
+                kwargs=kwargs,
+                idempotency_key=key,
+                max_attempts=max_attempts or default_attempts or settings.TASKS["MAX_ATTEMPTS"],
+                run_at=now + timedelta(seconds=delay) if delay else now,
+            )],
+            ignore_conflicts=key is not None,
+        )
+
+    def claim(self, batch_size=10):
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(status=Task.QUEUED, run_at__lte=now)
+                .order_by("run_at", "id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return []
+            Task.objects.filter(pk__in=ids).update(status=Task.RUNNING, started_at=now, attempts=F("attempts") + 1)
+        return list(Task.objects.filter(pk__in=ids).order_by("run_at", "id"))
+
+    def execute(self, task_row):
+        """
+        اجرای یک کار برداشته‌شده؛ خروجی True در صورت موفقیت. خطا تا max_attempts
+        با backoff دوباره صف می‌شود و بعد از آن failed می‌ماند.
+        """
+        try:
+            fn, _ = _lookup(task_row.name)
+            fn(**task_row.kwargs)
+        except Exception:
+            now = timezone.now()
+            error = traceback.format_exc()
+            if task_row.attempts >= task_row.max_attempts:
+                Task.objects.filter(pk=task_row.pk).update(
+                    status=Task.FAILED, finished_at=now, last_error=error, kwargs={},
+                )
+            else:
+                Task.objects.filter(pk=task_row.pk).update(
+                    status=Task.QUEUED,
+                    run_at=now + timedelta(seconds=backoff_delay(task_row.attempts)),
+                    last_error=error,
+                )
+            return False
+        # آرگومان‌ها در هیچ وضعیت پایانی (done یا failed) نگه داشته نمی‌شوند
+        Task.objects.filter(pk=task_row.pk).update(status=Task.DONE, finished_at=timezone.now(), kwargs={})
+        return True
+
+    def requeue_stale(self):
+        """
+        کارهایی که worker آن‌ها از VISIBILITY_TIMEOUT بیشتر در حالت running مانده (مثلاً
+        پروسس کشته شده) دوباره صف می‌شوند؛ تلاش مصرف‌شده شمرده می‌شود.
+        """
+        cutoff = timezone.now() - timedelta(seconds=settings.TASKS["VISIBILITY_TIMEOUT"])
+        return Task.objects.filter(status=Task.RUNNING, started_at__lt=cutoff).update(
+            status=Task.QUEUED, run_at=timezone.now(),
+        )
+
+    def purge_done(self):
+        cutoff = timezone.now() - timedelta(seconds=settings.TASKS["RETENTION"])
+        return Task.objects.filter(status=Task.DONE, finished_at__lt=cutoff).delete()[0]
+
+
+_queue = None
+
+
+def get_task_queue():
+    global _queue
+    if _queue is None:
+        _queue = import_string(settings.TASKS["BACKEND"])()
+    return _queue
+
+
+@receiver(setting_changed)
+def _reset_task_queue(setting, **kwargs):
+    global _queue
+    if setting == "TASKS":
+        _queue = None
+
+
+def enqueue(name, key=None, delay=None, max_attempts=None, **kwargs):
+    """
+    صف کردن کار ثبت‌شده‌ی name با آرگومان‌های kwargs (باید JSON‌پذیر باشند؛
+    UUID و datetime به رشته تبدیل می‌شوند). key کلید idempotency است.
+    """
+    get_task_queue().enqueue(name, kwargs, key=key, delay=delay, max_attempts=max_attempts)
@@ -0,0 +1,47 @@
+import uuid
+from collections import defaultdict
+
+from django.apps import apps
+
+from . import feed, otp, search
+from .models import Post, PostMention
+from .taskqueue import task
+
+
+# کارهای جانبی بعد از نوشتن که از مسیر request بیرون آمده‌اند. آرگومان‌ها از JSON
+# برمی‌گردند، پس شناسه‌ها رشته‌اند؛ هر کار باید با اجرای دوباره یا حذف شیء کنار بیاید.
+
+
+def _uuids(values):
+    return [uuid.UUID(str(value)) for value in values]
+
+
+@task("feed.sync_post_fanout")
+def sync_post_fanout(post_id, mention_ids, previous_mention_ids=(), created=False):
+    post = Post.objects.filter(pk=post_id).only("id", "author_id", "created_at", "fanout_on_read").first()
+    if post is not None:
+        feed.sync_post_fanout(post, _uuids(mention_ids), _uuids(previous_mention_ids), created=created)
+
+
+@task("feed.fanout_new_posts")
+def fanout_new_posts(post_ids):
+    mentions = defaultdict(list)
+    for post_id, user_id in PostMention.objects.filter(post_id__in=post_ids).values_list("post_id", "user_id"):
+        mentions[post_id].append(user_id)
+    posts = Post.objects.filter(pk__in=post_ids).only("id", "author_id", "created_at", "fanout_on_read")
+    feed.fanout_new_posts([(post, mentions[post.pk]) for post in posts])
+
+
+@task("search.index")
+def index_for_search(model, pks):
+    search.index_pks(apps.get_model(model), pks)
+
+
+@task("search.remove")
+def remove_from_search(model, pks):
+    search.remove_pks(apps.get_model(model), _uuids(pks))
+
+
+@task("otp.deliver", max_attempts=3)
+def deliver_otp(message):
+    otp.get_delivery_queue().deliver(otp.open_message(message))
@@ -1,14 +1,64 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase,APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from .models import Post, Comment
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .compiled import COMMENTS, POSTS
+from .db.pool import ConnectionPool, PoolTimeout
+from .models import Post, Comment, OneTimeCode, PostMention, Task, TimelineEntry, UsernameChangeHistory
+from . import metrics
+from .identifiers import resolve_identifier
+from .authentication import user_cache
+from .caching import MISSING
+from .async_views import AsyncChangePasswordView, AsyncLoginView, AsyncRegisterView
+from .hashing import get_hashing_pool
+from .instrumentation import InstrumentationMiddleware
+from .mentions import handle_cache, resolve_handles
+from .otp import code_digest, get_delivery_queue, issue, verify
+from .response_cache import get_or_render, invalidate_post_responses
+from .renderers import FastJSONRenderer
+from .search import normalize_text
+from .seeding import Seeder, clear as clear_seed
+from .serializers import CommentSerializer, PostSerializer
+from .taskqueue import REGISTRY, enqueue, get_task_queue, task
+from .threads import SEGMENT_WIDTH, subtree_filter
+from .throttling import CacheCounterStore, InMemoryCounterStore
+from .views import comment_queryset, post_queryset
 
 
 User = get_user_model()
 
+
+def delivered_code(to):
+    delivery = get_delivery_queue()
+    delivery.join()
+    return [message["code"] for message in delivery.outbox if message["to"] == to][-1]
+
+
 class AuthTests(APITestCase):
     def test_register_user(self):
         url = reverse('register')
@@ -43,8 +93,9 @@ class AuthTests(APITestCase):
 
     def test_reset_password_success_with_correct_otp(self):
         user = User.objects.create_user(email="reset@example.com", password="oldpass123")
+        self.client.post(reverse('forgot-password'), {"identifier": "reset@example.com"})
         url = reverse('reset-password')
-        data = {"identifier": "reset@example.com", "otp": "123456", "new_password": "newpass456"}
+        data = {"identifier": "reset@example.com", "otp": delivered_code("reset@example.com"), "new_password": "newpass456"}
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         login_url = reverse('login')
@@ -154,4 +205,1274 @@ class PostCommentTestCase(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Comment.objects.count(), 1)
-        self.assertEqual(Comment.objects.first().author, self.user)
\ No newline at end of file
+        self.assertEqual(Comment.objects.first().author, self.user)
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pager', password='123456')
+        posts = [Post(author=self.user, content=f"پست {i}") for i in range(7)]
+        Post.objects.bulk_create(posts)
+        # همه‌ی پست‌ها یک created_at دارند تا ترتیب پایدار با id سنجیده شود
+        Post.objects.update(created_at=posts[0].created_at)
+        # bulk_create و update سیگنال ندارند؛ مثل users.bulk کش پاسخ‌ها دستی باطل می‌شود
+        invalidate_post_responses()
+
+    def test_pages_cover_all_posts_once_with_tied_timestamps(self):
+        url = reverse('post-list-create') + '?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 3)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get(reverse('post-list-create') + '?page_size=3').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([p['id'] for p in back['results']], [p['id'] for p in first['results']])
+
+    def test_tampered_cursor_is_rejected(self):
+        url = reverse('post-list-create') + '?cursor=not-a-cursor'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counter', password='123456')
+        self.others = [User.objects.create_user(username=f'friend{i}', password='123456') for i in range(3)]
+
+    def _create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=self.user, content=f"پست {i}")
+            post.mentions.set(self.others)
+            comment = Comment.objects.create(post=post, author=self.others[0], content="کامنت")
+            comment.mentions.set(self.others[1:])
+        return post
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_post_list_query_count_is_constant(self):
+        self._create_posts(2)
+        small = self._count_queries(reverse('post-list-create'))
+        self._create_posts(8)
+        large = self._count_queries(reverse('post-list-create'))
+        self.assertEqual(small, large)
+
+    def test_comment_list_query_count_is_constant(self):
+        post = self._create_posts(1)
+        url = reverse('comment-list-create', kwargs={'post_id': post.id})
+        small = self._count_queries(url)
+        for i in range(8):
+            comment = Comment.objects.create(post=post, author=self.others[i % 3], content=f"کامنت {i}")
+            comment.mentions.set(self.others)
+        large = self._count_queries(url)
+        self.assertEqual(small, large)
+
+
+class HomeTimelineTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer', password='123456')
+        self.reader = User.objects.create_user(username='reader', password='123456')
+        self.stranger = User.objects.create_user(username='stranger', password='123456')
+
+    def _post(self, content, mentions=()):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.post(reverse('post-list-create'), {"content": content, "mentions": [str(u.id) for u in mentions]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def _feed_ids(self, user, url=None):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(url or reverse('home-timeline'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def _assert_fanout(self):
+        own = self._post("پست عادی")
+        mentioned = self._post("سلام @reader", mentions=[self.reader])
+        self.assertEqual(self._feed_ids(self.author), [mentioned, own])
+        self.assertEqual(self._feed_ids(self.reader), [mentioned])
+        self.assertEqual(self._feed_ids(self.stranger), [])
+
+    def test_database_store_fanout(self):
+        self._assert_fanout()
+
+    @override_settings(FEED={'BACKEND': 'users.feed.InMemoryTimelineStore', 'MAX_LENGTH': 50, 'FANOUT_LIMIT': 1000})
+    def test_in_memory_store_fanout(self):
+        self._assert_fanout()
+
+    @override_settings(FEED={'BACKEND': 'users.feed.InMemoryTimelineStore', 'MAX_LENGTH': 50, 'FANOUT_LIMIT': 1})
+    def test_high_mention_posts_are_merged_on_read(self):
+        first = self._post("یک mention", mentions=[self.reader])
+        crowded = self._post("دو mention", mentions=[self.reader, self.stranger])
+        self.assertTrue(Post.objects.get(pk=crowded).fanout_on_read)
+        self.assertEqual(self._feed_ids(self.reader), [crowded, first])
+
+    @override_settings(FEED={'BACKEND': 'users.feed.DatabaseTimelineStore', 'MAX_LENGTH': 3, 'FANOUT_LIMIT': 1000})
+    def test_timeline_is_bounded_and_paginated(self):
+        ids = [self._post(f"پست {i}") for i in range(5)]
+        self.assertEqual(TimelineEntry.objects.filter(user=self.author).count(), 3)
+        first_page = self._feed_ids(self.author, reverse('home-timeline') + '?page_size=2')
+        self.assertEqual(first_page, ids[::-1][:2])
+
+
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='counted', password='123456')
+        self.friend = User.objects.create_user(username='friend', password='123456')
+        self.client.force_authenticate(user=self.user)
+
+    def test_counts_follow_comment_and_mention_writes(self):
+        response = self.client.post(reverse('post-list-create'), {"content": "پست", "mentions": [str(self.friend.id)]}, format='json')
+        self.assertEqual(response.data['mention_count'], 1)
+        post_id = response.data['id']
+
+        comments_url = reverse('comment-list-create', kwargs={'post_id': post_id})
+        first = self.client.post(comments_url, {"content": "یک"}, format='json').data['id']
+        self.client.post(comments_url, {"content": "دو"}, format='json')
+        self.client.delete(reverse('comment-detail', kwargs={'pk': first}))
+
+        detail = self.client.get(reverse('post-detail', kwargs={'pk': post_id})).data
+        self.assertEqual(detail['comment_count'], 1)
+
+        patched = self.client.patch(reverse('post-detail', kwargs={'pk': post_id}), {"mentions": []}, format='json')
+        self.assertEqual(patched.data['mention_count'], 0)
+        self.assertEqual(Post.objects.get(pk=post_id).mention_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        post = Post.objects.create(author=self.user, content="پست")
+        Comment.objects.create(post=post, author=self.user, content="کامنت")
+        post.mentions.set([self.friend])
+        Post.objects.filter(pk=post.pk).update(comment_count=7, mention_count=0)
+
+        call_command('reconcile_post_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.comment_count, post.mention_count), (1, 1))
+
+
+class IdentifierResolutionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="Mixed@Example.com", username="MixedCase", phone="09120000000", password="123456")
+
+    def test_each_identifier_kind_resolves_case_insensitively(self):
+        for identifier in ["mixed@example.com", "MIXEDCASE", "09120000000"]:
+            self.assertEqual(resolve_identifier(identifier), self.user)
+
+    def test_lookup_uses_a_single_query(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(resolve_identifier("nobody@example.com"))
+        with self.assertNumQueries(1):
+            self.assertEqual(resolve_identifier("09120000000"), self.user)
+
+    def test_email_wins_over_matching_username(self):
+        other = User.objects.create_user(username="mixed@example.com", password="123456")
+        self.assertEqual(resolve_identifier("MIXED@example.com"), self.user)
+        self.assertNotEqual(resolve_identifier("MIXED@example.com"), other)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="cached@example.com", username="cached", password="pass12345")
+        self.auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    def test_repeated_reads_hit_the_cache(self):
+        url = reverse('home-timeline')
+        self.client.get(url, **self.auth)
+        before = user_cache.stats()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('"users_user"."is_staff"' in q['sql'] for q in ctx.captured_queries))
+        self.assertEqual(user_cache.stats()["local_hits"], before["local_hits"] + 1)
+
+    def test_profile_update_invalidates_snapshot(self):
+        self.client.get(reverse('user-me'), **self.auth)
+        self.client.patch(reverse('user-me'), {"username": "renamed"}, format='json', **self.auth)
+        self.assertIs(user_cache.get(str(self.user.id)), MISSING)
+        response = self.client.get(reverse('user-me'), **self.auth)
+        self.assertEqual(response.data["username"], "renamed")
+        self.assertEqual(response.data["email"], "cached@example.com")
+
+    def test_schema_keeps_jwt_security_scheme(self):
+        response = self.client.get(reverse('schema'), {"format": "json"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        schema = json.loads(response.content)
+        self.assertIn("jwtAuth", schema["components"]["securitySchemes"])
+        self.assertIn({"jwtAuth": []}, schema["paths"]["/api/users/me/"]["get"]["security"])
+
+
+class PasswordHasherPolicyTests(APITestCase):
+    def _login(self, identifier, password):
+        return self.client.post(reverse('login'), {"identifier": identifier, "password": password})
+
+    def test_login_upgrades_hash_to_preferred_policy(self):
+        user = User.objects.create_user(email="legacy@example.com", password="oldpass123")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+        with self.settings(PASSWORD_HASHERS=['users.hashers.ScryptPasswordHasher', 'users.hashers.PBKDF2PasswordHasher']):
+            self.assertEqual(self._login("legacy@example.com", "oldpass123").status_code, status.HTTP_200_OK)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith("scrypt$"))
+            self.assertEqual(self._login("legacy@example.com", "oldpass123").status_code, status.HTTP_200_OK)
+
+    def test_login_rehashes_when_cost_changes(self):
+        user = User.objects.create_user(email="cost@example.com", password="oldpass123")
+        cost = dict(settings.PASSWORD_HASHER_COST, PBKDF2_ITERATIONS=1500)
+        with self.settings(PASSWORD_HASHER_COST=cost):
+            self._login("cost@example.com", "oldpass123")
+        user.refresh_from_db()
+        self.assertEqual(user.password.split("$")[1], "1500")
+
+
+class AsyncAuthViewTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = User.objects.create_user(email="async@example.com", password="oldpass123")
+
+    def _call(self, view_class, data, **extra):
+        request = self.factory.post("/", data=json.dumps(data), content_type="application/json", **extra)
+        response = async_to_sync(view_class.as_view())(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_async_register_and_login(self):
+        code, body = self._call(AsyncRegisterView, {"email": "new@example.com", "password": "secret123"})
+        self.assertEqual(code, 201)
+        code, body = self._call(AsyncLoginView, {"identifier": "new@example.com", "password": "secret123"})
+        self.assertEqual(code, 200)
+        self.assertIn("access_token", body)
+        self.assertEqual(body["user"]["email"], "new@example.com")
+        code, body = self._call(AsyncLoginView, {"identifier": "new@example.com", "password": "wrong"})
+        self.assertEqual(code, 400)
+
+    def test_async_change_password(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        code, _ = self._call(
+            AsyncChangePasswordView, {"old_password": "oldpass123", "new_password": "newpass456"},
+            HTTP_AUTHORIZATION=f"Bearer {access}",
+        )
+        self.assertEqual(code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpass456"))
+
+    @override_settings(HASHING_POOL={'WORKERS': 1, 'MAX_QUEUE': 0})
+    def test_saturated_pool_returns_503(self):
+        pool = get_hashing_pool()
+        release = threading.Event()
+        blocker = pool.submit(release.wait)
+        try:
+            code, _ = self._call(AsyncLoginView, {"identifier": "async@example.com", "password": "oldpass123"})
+        finally:
+            release.set()
+            blocker.result()
+        self.assertEqual(code, 503)
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+
+class MentionResolutionTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='poster', password='123456')
+        self.friends = [User.objects.create_user(username=f'Pal{i}', password='123456') for i in range(3)]
+        self.client.force_authenticate(user=self.author)
+
+    def test_handles_in_content_become_mentions(self):
+        content = "سلام @pal0 و @PAL1، ایمیل a@pal2 حساب نیست. @nobody"
+        response = self.client.post(reverse('post-list-create'), {"content": content}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data['mentions']), {self.friends[0].id, self.friends[1].id})
+        self.assertEqual(response.data['mention_count'], 2)
+
+    def test_handles_resolve_in_one_query_then_from_cache(self):
+        handles = ["pal0", "pal1", "pal2", "ghost"]
+        for handle in handles:
+            handle_cache.delete(handle)
+        with self.assertNumQueries(1):
+            resolved = resolve_handles(handles)
+        self.assertEqual(set(resolved), {"pal0", "pal1", "pal2"})
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_handles(handles), resolved)
+
+    def test_username_change_forgets_old_handle(self):
+        resolve_handles(["pal0"])
+        self.client.force_authenticate(user=self.friends[0])
+        self.client.post(reverse('change-username'), {"username": "renamed"}, format='json')
+        self.assertEqual(resolve_handles(["pal0", "renamed"]), {"renamed": self.friends[0].id})
+
+    def test_comment_edit_re_resolves_handles(self):
+        post = Post.objects.create(author=self.author, content="پست")
+        created = self.client.post(
+            reverse('comment-list-create', kwargs={'post_id': post.id}),
+            {"content": "سلام @pal0", "mentions": [str(self.friends[2].id)]}, format='json',
+        )
+        url = reverse('comment-detail', kwargs={'pk': created.data['id']})
+        response = self.client.patch(url, {"content": "سلام @pal1"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['mentions']), {self.friends[1].id, self.friends[2].id})
+
+        response = self.client.patch(url, {"content": "@pal0", "mentions": [str(self.friends[1].id)]}, format='json')
+        self.assertEqual(set(response.data['mentions']), {self.friends[0].id, self.friends[1].id})
+        self.assertEqual(
+            set(Comment.mentions.through.objects.filter(comment_id=created.data['id']).values_list('user_id', flat=True)),
+            {self.friends[0].id, self.friends[1].id},
+        )
+
+    def test_invalid_explicit_mention_is_rejected(self):
+        response = self.client.post(reverse('post-list-create'), {"content": "x", "mentions": [str(uuid.uuid4())]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MentionInboxTests(APITestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username='target', password='123456')
+        self.author = User.objects.create_user(username='talker', password='123456')
+
+    def _mention_me(self, count):
+        created = []
+        for i in range(count):
+            post = Post.objects.create(author=self.author, content=f"پست {i}")
+            post.mentions.add(self.me)
+            comment = Comment.objects.create(post=post, author=self.author, content=f"کامنت {i}")
+            comment.mentions.add(self.me)
+            created += [("post", str(post.id)), ("comment", str(comment.id))]
+        return created
+
+    def _page(self, url):
+        self.client.force_authenticate(user=self.me)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_inbox_merges_streams_newest_first_across_pages(self):
+        created = self._mention_me(3)
+        url, seen = reverse('user-mentions') + '?page_size=4', []
+        while url:
+            data = self._page(url)
+            seen += [(item['type'], item[item['type']]['id']) for item in data['results']]
+            url = data['next']
+        self.assertEqual(seen, created[::-1])
+
+    def test_inbox_query_count_is_constant(self):
+        self._mention_me(1)
+        self.client.force_authenticate(user=self.me)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(reverse('user-mentions'))
+        self._mention_me(6)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('user-mentions'))
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='cond', password='123456')
+        self.post = Post.objects.create(author=self.user, content="سلام")
+        self.client.force_authenticate(user=self.user)
+
+    def test_post_detail_matching_etag_returns_304(self):
+        url = reverse('post-detail', kwargs={'pk': self.post.id})
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', first)
+
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b'')
+        self.assertEqual(cached['ETag'], first['ETag'])
+
+        since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_comment_changes_comment_list_etag(self):
+        url = reverse('comment-list-create', kwargs={'post_id': self.post.id})
+        etag = self.client.get(url)['ETag']
+        self.client.post(url, {"content": "کامنت"}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_comment_list_etag_follows_only_its_authors_without_counting_comments(self):
+        url = reverse('comment-list-create', kwargs={'post_id': self.post.id})
+        self.client.post(url, {"content": "کامنت"}, format='json')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(any("COUNT(" in query['sql'] for query in queries.captured_queries))
+
+        bystander = User.objects.create_user(username='bystander', password='pass1234')
+        bystander.first_name = "دیگری"
+        bystander.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(reverse('change-username'), {"username": "renamed"}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['author'], "renamed")
+
+    def test_me_returns_304_until_profile_changes(self):
+        url = reverse('user-me')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.patch(url, {"first_name": "علی"}, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+
+class AnonymousResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='cached', password='123456')
+        self.post = Post.objects.create(author=self.author, content="پست")
+
+    def test_anonymous_list_is_served_from_cache_until_a_post_changes(self):
+        url = reverse('post-list-create')
+        first = self.client.get(url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+        Post.objects.create(author=self.author, content="پست دوم")
+        third = self.client.get(url)
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(len(third.json()['results']), 2)
+
+    def test_only_visible_author_changes_invalidate_cached_posts(self):
+        url = reverse('post-list-create')
+        self.client.get(url)
+        User.objects.create_user(username='newcomer', password='123456')
+        author = User.objects.get(pk=self.author.pk)
+        author.set_password('654321')
+        author.save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        author.username = 'renamed'
+        author.save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        author.username = 'cached'
+        author.save()
+        self.assertEqual(self.client.get(url).json()['results'][0]['author']['username'], 'cached')
+
+    def test_comment_invalidates_cached_post_detail(self):
+        url = reverse('post-detail', kwargs={'pk': self.post.id})
+        self.client.get(url)
+        self.client.force_authenticate(user=self.author)
+        self.client.post(reverse('comment-list-create', kwargs={'post_id': self.post.id}), {"content": "سلام"}, format='json')
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['comment_count'], 1)
+
+    def test_stale_entry_is_not_served_under_a_fresh_etag(self):
+        # worker دیگری که bump نسخه را ندیده (LocMemCache) با همان نسخه‌ی قدیمی می‌خواند
+        url = reverse('post-detail', kwargs={'pk': self.post.id})
+        stale = self.client.get(url)
+        with mock.patch('users.response_cache._bump_version'):
+            self.post.content = "ویرایش‌شده"
+            self.post.save()
+        fresh = self.client.get(url)
+        self.assertEqual(fresh['X-Cache'], 'MISS')
+        self.assertNotEqual(fresh['ETag'], stale['ETag'])
+        self.assertEqual(fresh.json()['content'], "ویرایش‌شده")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_authenticated_reads_bypass_cache(self):
+        self.client.force_authenticate(user=self.author)
+        response = self.client.get(reverse('post-list-create'))
+        self.assertNotIn('X-Cache', response)
+
+    def test_file_based_backend(self):
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location,
+            }}):
+                url = reverse('post-list-create')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+                self.post.delete()
+                self.assertEqual(self.client.get(url).json()['results'], [])
+
+    def test_concurrent_misses_render_once(self):
+        calls = []
+
+        def render():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"content": b"x"}
+
+        key = f"single-flight-{uuid.uuid4()}"
+        threads = [threading.Thread(target=get_or_render, args=(key, render)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+
+
+class CommentThreadTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='threader', password='123456')
+        self.post = Post.objects.create(author=self.user, content="پست")
+        self.client.force_authenticate(user=self.user)
+
+    def _comment(self, content, parent=None):
+        data = {"content": content}
+        if parent:
+            data["parent"] = parent
+        response = self.client.post(reverse('comment-list-create', kwargs={'post_id': self.post.id}), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        return response.data['id']
+
+    def _tree(self):
+        root = self._comment("ریشه")
+        a = self._comment("الف", root)
+        a1 = self._comment("الف۱", a)
+        b = self._comment("ب", root)
+        return root, a, a1, b
+
+    def test_replies_are_returned_in_tree_order_and_counted(self):
+        root, a, a1, b = self._tree()
+        data = self.client.get(reverse('comment-replies', kwargs={'pk': root})).data
+        self.assertEqual([item['id'] for item in data['results']], [a, a1, b])
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 3)
+        self.assertEqual(Comment.objects.get(pk=a).reply_count, 1)
+
+        direct = self.client.get(reverse('comment-replies', kwargs={'pk': root}) + '?depth=1').data
+        self.assertEqual([item['id'] for item in direct['results']], [a, b])
+
+        roots = self.client.get(reverse('comment-list-create', kwargs={'post_id': self.post.id})).data
+        self.assertEqual([item['id'] for item in roots['results']], [root])
+
+    def test_replies_paginate_by_path(self):
+        root = self._comment("ریشه")
+        replies = [self._comment(f"پاسخ {i}", root) for i in range(5)]
+        url, seen = reverse('comment-replies', kwargs={'pk': root}) + '?page_size=2', []
+        while url:
+            data = self.client.get(url).data
+            seen += [item['id'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(seen, replies)
+
+    def test_deleting_a_reply_removes_subtree_and_adjusts_counters(self):
+        root, a, a1, b = self._tree()
+        self.client.delete(reverse('comment-detail', kwargs={'pk': a}))
+        self.assertFalse(Comment.objects.filter(pk__in=[a, a1]).exists())
+        self.assertEqual(Comment.objects.get(pk=root).reply_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+    def test_parent_must_belong_to_same_post(self):
+        other = Post.objects.create(author=self.user, content="دیگر")
+        foreign = Comment.objects.create(post=other, author=self.user, content="x", path="0" * 20)
+        response = self.client.post(
+            reverse('comment-list-create', kwargs={'post_id': self.post.id}),
+            {"content": "y", "parent": str(foreign.id)}, format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orm_created_comments_get_a_path(self):
+        root = Comment.objects.create(post=self.post, author=self.user, content="ریشه")
+        reply = Comment.objects.create(post=self.post, author=self.user, content="پاسخ", parent=root)
+        self.assertEqual((len(root.path), reply.depth), (SEGMENT_WIDTH, 1))
+        self.assertTrue(reply.path.startswith(root.path))
+
+        response = self.client.get(reverse('comment-replies', kwargs={'pk': root.id}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']], [str(reply.id)])
+        response = self.client.delete(reverse('comment-detail', kwargs={'pk': root.id}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Comment.objects.filter(pk__in=[root.id, reply.id]).exists())
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='searcher', password='123456')
+
+    def _search(self, q, **params):
+        return self.client.get(reverse('search'), {"q": q, **params})
+
+    def test_persian_normalization(self):
+        self.assertEqual(normalize_text("كتاب‌هاي عَلي"), normalize_text("کتاب های علی"))
+        self.assertEqual(normalize_text("۱۲۳ABC"), "123abc")
+
+    def test_arabic_letters_and_zwnj_match_persian_text(self):
+        post = Post.objects.create(author=self.user, content="می‌خواهم کتاب بخوانم")
+        Post.objects.create(author=self.user, content="چیز دیگری")
+        response = self._search("كتاب")
+        self.assertEqual([item['post']['id'] for item in response.data['results']], [str(post.id)])
+        self.assertEqual(len(self._search("می خواهم").data['results']), 1)
+
+    def test_results_merge_posts_and_comments_across_pages(self):
+        post = Post.objects.create(author=self.user, content="جستجو در پست")
+        expected = {("post", str(post.id))}
+        for i in range(4):
+            comment = Comment.objects.create(post=post, author=self.user, content=f"جستجو {i}", path=f"{i:020d}")
+            expected.add(("comment", str(comment.id)))
+        Post.objects.create(author=self.user, content="بی‌ربط")
+
+        url, seen = reverse('search') + '?' + urlencode({"q": "جستجو", "page_size": 2}), []
+        while url:
+            data = self.client.get(url).data
+            seen += [(item['type'], item[item['type']]['id']) for item in data['results']]
+            url = data['next']
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), expected)
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(author=self.user, content="قدیمی")
+        post.content = "جدید"
+        post.save()
+        self.assertEqual(self._search("قدیمی").data['results'], [])
+        self.assertEqual(len(self._search("جدید").data['results']), 1)
+        post.delete()
+        self.assertEqual(self._search("جدید").data['results'], [])
+
+    def test_empty_query_is_rejected(self):
+        self.assertEqual(self._search(" ").status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserAutocompleteTests(APITestCase):
+    def setUp(self):
+        self.me = User.objects.create_user(username='writer', password='123456')
+        self.alice = User.objects.create_user(username='alice', first_name='Zed', password='123456')
+        self.alina = User.objects.create_user(username='ALINA', password='123456')
+        self.named = User.objects.create_user(username='zzz', first_name='Alborz', password='123456')
+        User.objects.create_user(username='alinactive', password='123456', is_active=False)
+        self.client.force_authenticate(user=self.me)
+
+    def _complete(self, q, **params):
+        response = self.client.get(reverse('user-autocomplete'), {"q": q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data]
+
+    def test_prefix_matches_usernames_first_then_names(self):
+        with self.assertNumQueries(3):
+            ids = self._complete("@Al")
+        self.assertEqual(ids, [str(self.alice.id), str(self.alina.id), str(self.named.id)])
+        self.assertEqual(self._complete("ali", limit=1), [str(self.alice.id)])
+        self.assertEqual(self._complete("  "), [])
+
+    def test_username_change_is_visible_immediately(self):
+        self.client.force_authenticate(user=self.alice)
+        self.client.post(reverse('change-username'), {"username": "beta"}, format='json')
+        self.assertEqual(self._complete("bet"), [str(self.alice.id)])
+        self.assertNotIn(str(self.alice.id), self._complete("alic"))
+
+
+class BulkPostImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='123456')
+        self.friend = User.objects.create_user(username='friend', password='123456')
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_endpoint_inserts_posts_and_mentions_in_constant_queries(self):
+        rows = [{"content": f"پست {i} @friend"} for i in range(30)]
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(reverse('post-bulk-create'), rows[:3], format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(reverse('post-bulk-create'), {"posts": rows}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 30)
+        # درخواست اول یک کوئری اضافه برای resolve کردن @friend دارد (بعد از آن در کش است)
+        self.assertLessEqual(len(large.captured_queries), len(small.captured_queries))
+
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 33)
+        self.assertEqual(PostMention.objects.filter(user=self.friend).count(), 33)
+        self.assertEqual(TimelineEntry.objects.filter(user=self.friend).count(), 33)
+        self.assertEqual(set(Post.objects.values_list('mention_count', flat=True)), {1})
+
+    def test_invalid_row_rejects_whole_batch(self):
+        rows = [{"content": "درست"}, {"content": ""}, {"content": "x", "mentions": [str(uuid.uuid4())]}]
+        response = self.client.post(reverse('post-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in response.data['errors']], ['1', '2'])
+        self.assertFalse(Post.objects.exists())
+
+    def test_ndjson_body(self):
+        body = "\n".join(json.dumps({"content": f"خط {i}"}, ensure_ascii=False) for i in range(3)) + "\n"
+        response = self.client.post(reverse('post-bulk-create'), body.encode(), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+
+    def test_import_command_streams_ndjson_with_per_row_authors(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', encoding='utf-8', delete=False) as handle:
+            handle.write(json.dumps({"content": "از فایل", "author": "friend"}) + "\n")
+            handle.write(json.dumps({"content": "بدون نویسنده"}) + "\n")
+        out = StringIO()
+        call_command('import_posts', handle.name, '--author', 'importer', '--chunk-size', '1', stdout=out)
+        self.assertIn('rows/sec', out.getvalue())
+        self.assertEqual(Post.objects.get(content="از فایل").author, self.friend)
+        self.assertEqual(Post.objects.get(content="بدون نویسنده").author, self.user)
+
+
+class UserExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', email='exp@example.com', password='123456')
+        self.friend = User.objects.create_user(username='buddy', password='123456')
+        self.posts = [Post.objects.create(author=self.user, content=f"پست {i}") for i in range(3)]
+        self.posts[0].mentions.add(self.friend)
+        Comment.objects.create(post=self.posts[0], author=self.user, content="کامنت", path="0" * 20)
+        UsernameChangeHistory.objects.create(user=self.user, old_username='old', new_username='exporter')
+        self.client.force_authenticate(user=self.user)
+
+    def _records(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export_streams_all_record_types(self):
+        response = self.client.get(reverse('user-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        records = self._records(b"".join(response.streaming_content))
+        self.assertEqual([record['type'] for record in records],
+                         ['profile', 'post', 'post', 'post', 'comment', 'username_history'])
+        self.assertEqual(records[0]['data']['email'], 'exp@example.com')
+        self.assertEqual(records[1]['data']['mentions'], [str(self.friend.id)])
+
+    def test_gzip_stream_matches_plain_export(self):
+        plain = b"".join(self.client.get(reverse('user-export')).streaming_content)
+        response = self.client.get(reverse('user-export'), {"compress": "gzip"})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), plain)
+
+    def test_command_writes_file_in_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/export.ndjson"
+            call_command('export_user_data', 'exporter', '--output', path, '--chunk-size', '1', stdout=StringIO())
+            with open(path, 'rb') as handle:
+                self.assertEqual(len(self._records(handle.read())), 6)
+
+
+def throttle_settings(ip_rate=None, identifier_rate=None, store='users.throttling.InMemoryCounterStore'):
+    return override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {
+            'auth_ip': ip_rate, 'auth_identifier': identifier_rate,
+        }},
+        THROTTLING={**settings.THROTTLING, 'STORE': store},
+    )
+
+
+class CounterStoreTests(TestCase):
+    def _check_token_bucket(self, store):
+        results = [store.take_token("k", 3, 60, now=1000.0) for _ in range(4)]
+        self.assertEqual([allowed for allowed, _ in results], [True, True, True, False])
+        self.assertAlmostEqual(results[-1][1], 20.0)
+        self.assertTrue(store.take_token("k", 3, 60, now=1020.0)[0])
+
+    def _check_sliding_window(self, store):
+        self.assertTrue(store.hit_window("w", 2, 60, now=600.0)[0])
+        self.assertTrue(store.hit_window("w", 2, 60, now=601.0)[0])
+        self.assertFalse(store.hit_window("w", 2, 60, now=602.0)[0])
+        # نیمه‌ی پنجره‌ی بعد: وزن پنجره‌ی قبلی ۲ * ۰.۵ = ۱ است، پس یک درخواست دیگر جا دارد
+        self.assertTrue(store.hit_window("w", 2, 60, now=690.0)[0])
+        self.assertFalse(store.hit_window("w", 2, 60, now=690.0)[0])
+
+    def test_in_memory_store(self):
+        self._check_token_bucket(InMemoryCounterStore(stripes=4))
+        self._check_sliding_window(InMemoryCounterStore(stripes=4))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "throttle-tests"}})
+    def test_cache_store(self):
+        self._check_token_bucket(CacheCounterStore())
+        self._check_sliding_window(CacheCounterStore())
+
+    def test_expired_keys_are_swept(self):
+        store = InMemoryCounterStore(stripes=1, sweep_every=10)
+        for i in range(9):
+            store.take_token(f"ip-{i}", 5, 10, now=0.0)
+        self.assertEqual(len(store), 9)
+        store.take_token("late", 5, 10, now=100.0)
+        self.assertEqual(len(store), 1)
+
+
+class AuthThrottleTests(APITestCase):
+    def setUp(self):
+        User.objects.create_user(username='victim', password='123456')
+
+    def _login(self, ip, identifier='victim'):
+        return self.client.post(reverse('login'), {"identifier": identifier, "password": "wrong"}, REMOTE_ADDR=ip)
+
+    def test_ip_bucket_blocks_credential_stuffing(self):
+        with throttle_settings(ip_rate='3/min'):
+            codes = [self._login('10.0.0.1', f'user{i}').status_code for i in range(4)]
+            self.assertEqual(codes, [400, 400, 400, 429])
+            self.assertIn('Retry-After', self._login('10.0.0.1'))
+            self.assertEqual(self._login('10.0.0.2').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_identifier_window_spans_ips(self):
+        with throttle_settings(identifier_rate='2/min'):
+            codes = [self._login(f'10.0.1.{i}', 'Victim ').status_code for i in range(3)]
+            self.assertEqual(codes, [400, 400, 429])
+
+    def test_forwarded_for_header_does_not_reset_ip_bucket(self):
+        with throttle_settings(ip_rate='2/min'):
+            codes = [
+                self.client.post(reverse('login'), {"identifier": f"user{i}", "password": "wrong"},
+                                 REMOTE_ADDR='10.0.3.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+                for i in range(3)
+            ]
+            self.assertEqual(codes, [400, 400, 429])
+
+    def test_identifier_window_is_per_account(self):
+        User.objects.create_user(username='many', email='many@example.com', phone='09120000000', password='123456')
+        with throttle_settings(identifier_rate='2/min'):
+            codes = [self._login(f'10.0.4.{i}', identifier).status_code
+                     for i, identifier in enumerate(['many', 'MANY@example.com', '09120000000'])]
+            self.assertEqual(codes, [400, 400, 429])
+
+    def test_async_login_is_throttled(self):
+        with throttle_settings(ip_rate='1/min'):
+            request = lambda: async_to_sync(AsyncLoginView.as_view())(RequestFactory().post(
+                '/', data=json.dumps({"identifier": "victim", "password": "wrong"}),
+                content_type='application/json', REMOTE_ADDR='10.0.2.1',
+            ))
+            self.assertEqual(request().status_code, 400)
+            self.assertEqual(request().status_code, 429)
+
+
+class OTPTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="otp@example.com", phone="09121234567", password="oldpass123")
+
+    def _reset(self, code, identifier="otp@example.com"):
+        return self.client.post(reverse('reset-password'), {"identifier": identifier, "otp": code, "new_password": "newpass456"})
+
+    def test_only_digest_is_stored(self):
+        code = issue(self.user, "email", "otp@example.com")
+        entry = OneTimeCode.objects.get(user=self.user)
+        self.assertNotIn(code, entry.code_hash)
+        self.assertEqual(entry.code_hash, code_digest(self.user.pk, "password_reset", code))
+
+    def test_code_is_single_use_and_reissue_replaces(self):
+        first = issue(self.user, "email", "otp@example.com")
+        second = issue(self.user, "email", "otp@example.com")
+        self.assertEqual(OneTimeCode.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(verify(self.user, first))
+        self.assertEqual(self._reset(second).status_code, status.HTTP_200_OK)
+        self.assertEqual(self._reset(second).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_phone_delivery_goes_through_queue(self):
+        response = self.client.post(reverse('forgot-password'), {"identifier": "09121234567"})
+        self.assertNotIn("code", str(response.data))
+        code = delivered_code("09121234567")
+        self.assertEqual(self._reset(code, "09121234567").status_code, status.HTTP_200_OK)
+
+    @override_settings(OTP={**settings.OTP, "KEEP_OUTBOX": False})
+    def test_delivery_never_logs_or_keeps_the_code(self):
+        with self.assertLogs("users.otp", level="INFO") as logs:
+            code = issue(self.user, "email", "otp@example.com")
+            get_delivery_queue().join()
+        self.assertNotIn(code, "\n".join(logs.output))
+        self.assertIn("otp@example.com", "\n".join(logs.output))
+        self.assertEqual(list(get_delivery_queue().outbox), [])
+
+    @override_settings(OTP={**settings.OTP, "MAX_ATTEMPTS": 2})
+    def test_attempts_are_capped(self):
+        code = issue(self.user, "email", "otp@example.com")
+        wrong = str((int(code) + 1) % 10 ** 6).zfill(6)
+        self.assertFalse(verify(self.user, wrong))
+        self.assertFalse(verify(self.user, wrong))
+        self.assertFalse(verify(self.user, code))
+
+    def test_expired_codes_fail_and_are_purged(self):
+        code = issue(self.user, "email", "otp@example.com")
+        other = User.objects.create_user(email="fresh@example.com", password="x")
+        issue(other, "email", "fresh@example.com")
+        OneTimeCode.objects.filter(user=self.user).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(verify(self.user, code))
+
+        out = StringIO()
+        call_command("purge_otps", "--batch-size", "1", stdout=out)
+        self.assertIn("1 کد منقضی حذف شد", out.getvalue())
+        self.assertEqual(list(OneTimeCode.objects.values_list("user", flat=True)), [other.pk])
+
+    @override_settings(
+        OTP={**settings.OTP, "STORE": "users.otp.CacheOTPStore", "MAX_ATTEMPTS": 1},
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "otp-tests"}},
+    )
+    def test_cache_store(self):
+        code = issue(self.user, "email", "otp@example.com")
+        self.assertFalse(OneTimeCode.objects.exists())
+        self.assertTrue(verify(self.user, code))
+        code = issue(self.user, "email", "otp@example.com")
+        self.assertFalse(verify(self.user, "x"))
+        self.assertFalse(verify(self.user, code))
+
+
+calls = []
+
+
+@task("tests.record")
+def record_call(value, fail_times=0):
+    calls.append(value)
+    if calls.count(value) <= fail_times:
+        raise RuntimeError("boom")
+
+
+@override_settings(TASKS={**settings.TASKS, 'BACKEND': 'users.taskqueue.DatabaseQueue', 'MAX_ATTEMPTS': 3})
+class TaskQueueTests(APITestCase):
+    def setUp(self):
+        calls.clear()
+        self.user = User.objects.create_user(username='queued', password='123456')
+        self.client.force_authenticate(self.user)
+
+    def _work(self):
+        out = StringIO()
+        call_command("run_worker", "--once", "--concurrency", "1", stdout=out)
+        return out.getvalue()
+
+    def test_post_side_effects_wait_for_worker(self):
+        response = self.client.post(reverse('post-list-create'), {"content": "صف کارها"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(Task.objects.values_list("name", flat=True)), {"feed.sync_post_fanout", "search.index"})
+        self.assertEqual(self.client.get(reverse('home-timeline')).data["results"], [])
+
+        self.assertIn("2 موفق", self._work())
+        self.assertEqual([post["id"] for post in self.client.get(reverse('home-timeline')).data["results"]], [response.data["id"]])
+        self.assertEqual(len(self.client.get(reverse('search'), {"q": "صف"}).data["results"]), 1)
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+        self.assertEqual(list(Task.objects.values_list("kwargs", flat=True)), [{}, {}])
+
+    def test_retries_with_backoff_then_fails(self):
+        enqueue("tests.record", value="a", fail_times=1)
+        self.assertIn("1 ناموفق", self._work())
+        retry = Task.objects.get()
+        self.assertEqual((retry.status, retry.attempts), (Task.QUEUED, 1))
+        self.assertGreater(retry.run_at, retry.started_at)
+        self.assertIn("RuntimeError", retry.last_error)
+
+        Task.objects.update(run_at=timezone.now())
+        self._work()
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+        enqueue("tests.record", value="b", fail_times=10, max_attempts=2)
+        for _ in range(3):
+            Task.objects.filter(status=Task.QUEUED).update(run_at=timezone.now())
+            self._work()
+        failed = Task.objects.get(name="tests.record", status=Task.FAILED)
+        self.assertEqual((failed.attempts, failed.kwargs), (2, {}))
+        self.assertEqual(calls.count("b"), 2)
+
+    def test_queued_otp_is_not_stored_in_plaintext(self):
+        code = issue(self.user, "email", "queued@example.com")
+        stored = Task.objects.get(name="otp.deliver").kwargs["message"]
+        self.assertNotIn("code", stored)
+        self.assertNotIn(code, json.dumps(stored))
+        self._work()
+        self.assertEqual(delivered_code("queued@example.com"), code)
+
+    def test_idempotency_key(self):
+        enqueue("tests.record", key="welcome:1", value="x")
+        enqueue("tests.record", key="welcome:1", value="x")
+        self._work()
+        enqueue("tests.record", key="welcome:1", value="x")
+        self._work()
+        self.assertEqual(calls, ["x"])
+
+    def test_stale_running_tasks_are_requeued(self):
+        enqueue("tests.record", value="stale")
+        Task.objects.update(status=Task.RUNNING, started_at=timezone.now() - timedelta(hours=1), attempts=1)
+        self._work()
+        self.assertEqual(calls, ["stale"])
+        self.assertEqual(Task.objects.get().attempts, 2)
+
+    def test_unknown_task_is_rejected(self):
+        self.assertNotIn("tests.missing", REGISTRY)
+        with self.assertRaises(ValueError):
+            enqueue("tests.missing")
+
+    def test_eager_queue_dedupes_and_round_trips_json(self):
+        with override_settings(TASKS={**settings.TASKS, 'BACKEND': 'users.taskqueue.EagerQueue'}):
+            value = uuid.uuid4()
+            get_task_queue().enqueue("tests.record", {"value": value}, key="k")
+            get_task_queue().enqueue("tests.record", {"value": value}, key="k")
+            self.assertEqual(calls, [str(value)])
+
+
+class CompiledSerializerTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='fast', first_name='علی', password='123456')
+        self.mailer = User.objects.create_user(email='nameless@example.com', password='123456')
+        self.friends = [User.objects.create_user(username=f'speedy{i}', password='123456') for i in range(3)]
+        self.client.force_authenticate(self.author)
+        for i in range(3):
+            self.client.post(reverse('post-list-create'), {
+                "content": f"پست {i}\u2028 «نقل‌قول» \"x\" @speedy{i} @speedy{(i + 1) % 3}",
+                "mentions": [str(self.friends[2].id)],
+            })
+        self.post = Post.objects.order_by('created_at').first()
+        root = Comment.objects.create(post=self.post, author=self.mailer, content='ریشه')
+        self.client.post(reverse('comment-list-create', args=[self.post.id]), {"content": "پاسخ @speedy0", "parent": str(root.id)})
+
+    def _render(self, renderer, data):
+        return renderer().render(data)
+
+    def test_compiled_output_matches_serializers(self):
+        cases = [
+            (POSTS, PostSerializer, post_queryset().order_by('-created_at', '-id')),
+            (COMMENTS, CommentSerializer, comment_queryset().order_by('path', 'id')),
+        ]
+        for compiled, serializer_class, queryset in cases:
+            expected = serializer_class(list(queryset), many=True).data
+            actual = compiled.serialize(list(compiled.rows(queryset)))
+            self.assertEqual(actual, expected)
+            self.assertEqual(self._render(JSONRenderer, actual), self._render(JSONRenderer, expected))
+            self.assertEqual(self._render(FastJSONRenderer, actual), self._render(JSONRenderer, expected))
+
+    def test_list_endpoints_use_constant_queries(self):
+        for i in range(10):
+            Comment.objects.create(post=self.post, author=self.author, content=f'c{i}')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('comment-list-create', args=[self.post.id]), {"page_size": 50})
+        self.assertEqual(len(response.data["results"]), 11)
+        # احراز هویت، validatorهای conditional GET، ردیف‌ها، mentionها
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+        self.assertTrue(response.content.startswith(b'{"next":null,"previous":null,"results":[{"id":"'))
+
+    def test_fast_renderer_matches_json_renderer(self):
+        payloads = [
+            {"a": 1, "b": [1.5, 0.1, -0.0, True, None], "c": "\u2028\u2029\x1f\n/\\"},
+            {"when": datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc), "id": uuid.uuid4()},
+            {"big": 10 ** 20, "exp": 1e16, "small": 1e-7, "dec": Decimal("1.10")},
+            {1: "int key"}, {"lazy": gettext_lazy("text"), "set": {1}}, [], "", 0,
+        ]
+        for data in payloads:
+            self.assertEqual(self._render(FastJSONRenderer, data), self._render(JSONRenderer, data))
+        self.assertEqual(
+            FastJSONRenderer().render({"a": [1]}, 'application/json; indent=2'),
+            JSONRenderer().render({"a": [1]}, 'application/json; indent=2'),
+        )
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(TestCase):
+    def make_pool(self, **kwargs):
+        pool = ConnectionPool(f"test-{uuid.uuid4()}", **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_reuses_idle_connections(self):
+        pool = self.make_pool(max_size=2)
+        conn = pool.getconn(FakeConnection)
+        pool.putconn(conn)
+        self.assertIs(pool.getconn(FakeConnection), conn)
+        stats = pool.stats()
+        self.assertEqual((stats["requests"], stats["connections_created"], stats["in_use"]), (2, 1, 1))
+
+    def test_waits_for_returned_connection_and_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0.05)
+        conn = pool.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+
+        threading.Timer(0.02, pool.putconn, args=[conn]).start()
+        pool.timeout = 5.0
+        self.assertIs(pool.getconn(FakeConnection), conn)
+        stats = pool.stats()
+        self.assertEqual((stats["timeouts"], stats["waits"]), (1, 2))
+        self.assertGreaterEqual(stats["wait_ms_max"], 15)
+
+    def test_discards_unhealthy_and_expired_connections(self):
+        pool = self.make_pool(max_size=2, check=lambda conn, idle: not conn.closed, reset=lambda conn: not conn.closed)
+        first = pool.getconn(FakeConnection)
+        first.closed = True
+        pool.putconn(first)
+        second = pool.getconn(FakeConnection)
+        self.assertIsNot(second, first)
+        pool.putconn(second)
+        second.closed = True
+        self.assertIsNot(pool.getconn(FakeConnection), second)
+        self.assertEqual(pool.stats()["connections_discarded"], 2)
+
+        pool.max_idle = 0
+        third = pool.getconn(FakeConnection)
+        pool.putconn(third)
+        time.sleep(0.001)
+        self.assertIsNot(pool.getconn(FakeConnection), third)
+        self.assertTrue(third.closed)
+
+    def test_stats_endpoint_is_admin_only(self):
+        pool = self.make_pool()
+        admin = User.objects.create_superuser(username="ops", email="ops@example.com", password="pass1234")
+        client = APIClient()
+        self.assertEqual(client.get(reverse('db-pool-stats')).status_code, status.HTTP_401_UNAUTHORIZED)
+        client.force_authenticate(admin)
+        response = client.get(reverse('db-pool-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(pool.name, response.data["pools"])
+
+
+class ServeCommandTests(TestCase):
+    def serve(self, *args):
+        out = StringIO()
+        call_command('serve', '--dry-run', *args, stdout=out, stderr=StringIO())
+        return out.getvalue().split()
+
+    def test_wsgi_defaults_preload_and_recycle_workers(self):
+        argv = self.serve('--mode', 'wsgi', '--threads', '4')
+        self.assertIn('socialbackend.wsgi:application', argv)
+        self.assertEqual(argv[argv.index('--worker-class') + 1], 'gthread')
+        self.assertGreaterEqual(int(argv[argv.index('--workers') + 1]), 1)
+        self.assertEqual(argv[argv.index('--max-requests') + 1], str(settings.SERVER['MAX_REQUESTS']))
+        self.assertIn('--preload', argv)
+
+    def test_asgi_uses_uvicorn_workers(self):
+        argv = self.serve('--mode', 'asgi', '--workers', '3', '--no-preload')
+        self.assertIn('socialbackend.asgi:application', argv)
+        self.assertEqual(argv[argv.index('--worker-class') + 1], 'uvicorn_worker.UvicornWorker')
+        self.assertEqual(argv[argv.index('--workers') + 1], '3')
+        self.assertNotIn('--preload', argv)
+
+    @override_settings(DB_CONN_MODE='persistent')
+    def test_asgi_workers_do_not_keep_persistent_connections(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop('DB_CONN_MODE', None)
+            self.assertEqual(self.serve('--mode', 'asgi', '--workers', '1')[0], 'DB_CONN_MODE=none')
+            self.assertEqual(self.serve('--mode', 'wsgi', '--workers', '1')[0], sys.executable)
+            os.environ['DB_CONN_MODE'] = 'persistent'
+            with self.assertRaises(CommandError):
+                self.serve('--mode', 'asgi', '--workers', '1')
+
+    def test_per_process_throttle_store_needs_a_single_worker(self):
+        with override_settings(THROTTLING={**settings.THROTTLING, 'STORE': 'users.throttling.InMemoryCounterStore'}):
+            self.serve('--workers', '1')
+            with self.assertRaises(CommandError):
+                self.serve('--workers', '2')
+
+    def test_local_memory_response_cache_is_disabled_for_several_workers(self):
+        self.assertEqual(self.serve('--workers', '1')[0], sys.executable)
+        self.assertEqual(self.serve('--workers', '2')[0], 'RESPONSE_CACHE_ENABLED=False')
+        with override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tempfile.gettempdir(),
+        }}):
+            self.assertEqual(self.serve('--workers', '2')[0], sys.executable)
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='metered', password='pass1234')
+        for i in range(3):
+            Post.objects.create(author=self.author, content=f'post {i}')
+
+    def test_metrics_endpoint_exports_per_view_histograms(self):
+        self.client.force_authenticate(self.author)
+        self.client.get(reverse('post-list-create'))
+        body = self.client.get('/metrics').content.decode()
+        labels = f'{{view="api/users/posts/",method="GET",worker="{os.getpid()}"}}'
+        for name in ('http_request_duration_seconds', 'http_request_db_queries', 'http_request_db_seconds',
+                     'http_request_serialize_seconds', 'http_request_render_seconds'):
+            self.assertIn(f'{name}_count{labels} ', body)
+        self.assertIn(
+            f'http_requests_total{{view="api/users/posts/",method="GET",status="200",worker="{os.getpid()}"}}', body,
+        )
+        self.assertIn('# TYPE http_request_db_queries histogram', body)
+        self.assertIn('tiered_cache_misses{cache="auth-user",worker=', body)
+
+    @override_settings(METRICS={**settings.METRICS, 'PUBLIC': False})
+    def test_metrics_are_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS={**settings.METRICS, 'TOKEN': 'scrape-secret'})
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    def run_view(self, view):
+        def get_response(request):
+            view()
+            return HttpResponse('ok')
+        return InstrumentationMiddleware(get_response)(RequestFactory().get('/x'))
+
+    @override_settings(METRICS={**settings.METRICS, 'N_PLUS_ONE_THRESHOLD': 2, 'SLOW_QUERY_MS': 10_000})
+    def test_repeated_query_shapes_are_reported(self):
+        before = metrics.N_PLUS_ONE.value('<unmatched>')
+        ids = list(Post.objects.values_list('id', flat=True))
+
+        def view():
+            for pk in ids:
+                Post.objects.filter(pk=pk).first()
+                Post.objects.filter(pk__in=ids[:ids.index(pk) + 1]).count()
+
+        with self.assertLogs('users.instrumentation', 'WARNING') as logs:
+            self.run_view(view)
+        self.assertEqual(metrics.N_PLUS_ONE.value('<unmatched>'), before + 1)
+        self.assertEqual(len(logs.output), 2)  # IN با طول‌های مختلف هم یک شکل است
+        self.assertIn('possible N+1: 3 similar queries', logs.output[0])
+        self.assertIn('users/tests.py', logs.output[0])
+
+    @override_settings(METRICS={**settings.METRICS, 'SLOW_QUERY_MS': 0, 'SAMPLE_RATE': 0})
+    def test_slow_queries_are_counted_and_only_sampled_requests_log(self):
+        before = metrics.SLOW_QUERIES.value('<unmatched>')
+        with self.assertNoLogs('users.instrumentation', 'WARNING'):
+            self.run_view(lambda: Post.objects.count())
+        self.assertEqual(metrics.SLOW_QUERIES.value('<unmatched>'), before + 1)
+        with override_settings(METRICS={**settings.METRICS, 'SAMPLE_RATE': 1}):
+            with self.assertLogs('users.instrumentation', 'WARNING') as logs:
+                self.run_view(lambda: Post.objects.count())
+        self.assertIn('slow query', logs.output[0])
+
+
+class BenchmarkSuiteTests(APITestCase):
+    def seed(self):
+        return Seeder(prefix='bench_seed', password='seed-pass', batch_size=4).run(
+            users=4, posts_per_user=3, comments_per_post=6, mentions_per_post=2, reply_share=0.6,
+        )
+
+    def test_seeder_builds_consistent_counters_and_threads(self):
+        report = self.seed()
+        self.assertEqual({name: row['rows'] for name, row in report.items()},
+                         {'user': 4, 'post': 12, 'postmention': 24, 'comment': 72})
+        for post in Post.objects.filter(author__username__startswith='bench_seed'):
+            self.assertEqual(post.comment_count, post.comments.count())
+            self.assertEqual(post.mention_count, post.mentions.count())
+        for comment in Comment.objects.filter(post__author__username__startswith='bench_seed'):
+            self.assertEqual(comment.reply_count, Comment.objects.filter(subtree_filter(comment)).count())
+            self.assertEqual(comment.depth, len(comment.path) // SEGMENT_WIDTH - 1)
+        self.assertTrue(self.client.login(username='bench_seed0', password='seed-pass'))
+        self.assertGreater(clear_seed('bench_seed'), 0)
+        self.assertFalse(Post.objects.exists())
+
+    def test_bench_api_reports_and_detects_regressions(self):
+        self.seed()
+        options = ['--prefix', 'bench_seed', '--password', 'seed-pass', '--requests', '5', '--warmup', '1']
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = f'{tmp}/base.json'
+            call_command('bench_api', *options, '--output', baseline, stdout=StringIO())
+            with open(baseline) as fp:
+                report = json.load(fp)
+            self.assertEqual(set(report['scenarios']), {'register', 'login', 'post_list', 'comment_list', 'me'})
+            for row in report['scenarios'].values():
+                self.assertEqual((row['requests'], row['errors']), (5, 0))
+                self.assertGreater(row['queries_mean'], 0)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+            self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+
+            report['scenarios']['me']['queries_mean'] -= 1
+            with open(baseline, 'w') as fp:
+                json.dump(report, fp)
+            with self.assertRaisesMessage(CommandError, 'me: queries'):
+                call_command('bench_api', *options, '--scenarios', 'me', '--compare', baseline,
+                             '--threshold', '1000000', stdout=StringIO(), stderr=StringIO())
+
+            # اجرای پایه‌ای که 429 گرفته با مسیر throttle مقایسه نمی‌شود
+            report['scenarios']['me']['throttled'] = 3
+            with open(baseline, 'w') as fp:
+                json.dump(report, fp)
+            out = StringIO()
+            call_command('bench_api', *options, '--scenarios', 'me', '--compare', baseline,
+                         '--threshold', '1000000', stdout=out, stderr=StringIO())
+            self.assertIn('429', out.getvalue())
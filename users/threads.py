@@ -0,0 +1,63 @@
+import datetime
+
+from django.db.models import F, Q
+
+from .models import Comment
+
+
+# هر سطح: ۱۶ رقم میکروثانیه از epoch + ۴ رقم از id برای جدا کردن هم‌زمان‌ها.
+# فقط رقم و بدون جداکننده تا مقایسه‌ی رشته‌ای در هر collation ترتیب زمانی بدهد.
+SEGMENT_WIDTH = 20
+MAX_DEPTH = 10
+THREAD_ORDERING = ("path", "id")
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def path_segment(created_at, comment_id):
+    micros = (created_at - _EPOCH) // datetime.timedelta(microseconds=1)
+    return f"{micros:016d}{comment_id.int % 10000:04d}"
+
+
+def ancestor_paths(path):
+    return [path[:end] for end in range(SEGMENT_WIDTH, len(path), SEGMENT_WIDTH)]
+
+
+def path_successor(path):
+    # کوچک‌ترین مسیر هم‌طول بعد از path؛ همه‌ی نوادگان بین path و آن قرار می‌گیرند
+    return str(int(path) + 1).zfill(len(path))
+
+
+def subtree_filter(comment, max_depth=None, include_self=False):
+    """
+    زیردرخت comment به صورت یک بازه روی ایندکس (post, path)؛
+    max_depth تعداد سطح‌های زیر comment را محدود می‌کند.
+    """
+    lower = {"path__gte" if include_self else "path__gt": comment.path}
+    condition = Q(post_id=comment.post_id, path__lt=path_successor(comment.path), **lower)
+    if max_depth is not None:
+        condition &= Q(depth__lte=comment.depth + max_depth)
+    return condition
+
+
+def place(comment, parent, now):
+    comment.parent = parent
+    comment.depth = parent.depth + 1 if parent else 0
+    comment.path = (parent.path if parent else "") + path_segment(now, comment.id)
+
+
+def count_replies(path, post_id, delta):
+    ancestors = ancestor_paths(path)
+    if ancestors and delta:
+        Comment.objects.filter(post_id=post_id, path__in=ancestors).update(reply_count=F("reply_count") + delta)
+
+
+def delete_subtree(comment):
+    """
+    کامنت و همه‌ی پاسخ‌هایش را حذف و شمارنده‌ی اجداد را کم می‌کند؛
+    تعداد کامنت‌های حذف‌شده را برمی‌گرداند.
+    """
+    _, deleted = Comment.objects.filter(subtree_filter(comment, include_self=True)).delete()
+    removed = deleted.get(Comment._meta.label, 0)
+    count_replies(comment.path, comment.post_id, -removed)
+    return removed
@@ -0,0 +1,252 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .identifiers import resolve_identifier
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    "10/min" -> (10, 60)؛ None یعنی بدون محدودیت.
+    """
+    if rate is None:
+        return None
+    num, period = rate.split("/")
+    return int(num), PERIODS[period[0]]
+
+
+def bucket_state(state, capacity, period, now):
+    """
+    یک گام token bucket روی state=(tokens, updated)؛ خروجی (allowed, wait, state, ttl).
+    ttl زمانی است که bucket دوباره پر می‌شود و می‌توان state را دور انداخت.
+    """
+    rate = capacity / period
+    tokens, updated = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        tokens -= 1
+        allowed, wait = True, 0.0
+    else:
+        allowed, wait = False, (1 - tokens) / rate
+    return allowed, wait, (tokens, now), (capacity - tokens) / rate
+
+
+def window_estimate(previous, current, limit, window, now):
+    """
+    تخمین sliding window از شمارنده‌ی پنجره‌ی فعلی و قبلی (O(1) حافظه برای هر کلید).
+    خروجی (allowed, wait).
+    """
+    elapsed = (now % window) / window
+    if previous * (1 - elapsed) + current < limit:
+        return True, 0.0
+    if current >= limit or not previous:
+        return False, window - now % window
+    # وزن پنجره‌ی قبلی باید آن‌قدر کم شود که یک درخواست دیگر جا شود
+    needed = 1 - (limit - current) / previous
+    return False, max((needed - elapsed) * window, 0.0)
+
+
+class InMemoryCounterStore:
+    """
+    شمارنده‌های داخل پروسس با lock striping؛ هر کلید یک state ثابت‌اندازه با
+    زمان انقضا دارد و ورودی‌های منقضی هنگام دسترسی و در sweepهای دوره‌ای حذف می‌شوند.
+    """
+
+    def __init__(self, stripes=64, sweep_every=1024):
+        self._stripes = [(threading.Lock(), {}) for _ in range(stripes)]
+        self._operations = [0] * stripes
+        self.sweep_every = sweep_every
+
+    def _stripe(self, key):
+        index = hash(key) % len(self._stripes)
+        return index, *self._stripes[index]
+
+    def _sweep(self, index, entries, now):
+        self._operations[index] += 1
+        if self._operations[index] % self.sweep_every == 0:
+            for key in [key for key, (_, expires) in entries.items() if expires <= now]:
+                del entries[key]
+
+    def _get(self, entries, key, now):
+        entry = entries.get(key)
+        if entry is None or entry[1] <= now:
+            return None
+        return entry[0]
+
+    def take_token(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        index, lock, entries = self._stripe(key)
+        with lock:
+            allowed, wait, state, ttl = bucket_state(self._get(entries, key, now), capacity, period, now)
+            entries[key] = (state, now + ttl)
+            self._sweep(index, entries, now)
+        return allowed, wait
+
+    def hit_window(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        current_index = int(now // window)
+        index, lock, entries = self._stripe(key)
+        with lock:
+            state = self._get(entries, key, now)
+            window_index, current, previous = state if state is not None else (current_index, 0, 0)
+            if window_index != current_index:
+                previous = current if window_index == current_index - 1 else 0
+                current = 0
+            allowed, wait = window_estimate(previous, current, limit, window, now)
+            if allowed:
+                current += 1
+            entries[key] = ((current_index, current, previous), (current_index + 2) * window)
+            self._sweep(index, entries, now)
+        return allowed, wait
+
+    def __len__(self):
+        return sum(len(entries) for _, entries in self._stripes)
+
+
+class CacheCounterStore:
+    """
+    شمارنده‌ها در کش جنگو تا بین پروسس‌ها مشترک باشند. sliding window با
+    cache.incr (اتمیک در redis/memcached) کار می‌کند؛ token bucket خواندن-نوشتن
+    بدون CAS است و زیر هم‌زمانی زیاد ممکن است چند درخواست بیشتر عبور کنند.
+    """
+
+    def __init__(self, alias="default"):
+        self.alias = alias
+
+    def take_token(self, key, capacity, period, now=None):
+        now = time.time() if now is None else now
+        cache = caches[self.alias]
+        allowed, wait, state, ttl = bucket_state(cache.get(key), capacity, period, now)
+        cache.set(key, state, math.ceil(ttl) + 1)
+        return allowed, wait
+
+    def hit_window(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        cache = caches[self.alias]
+        current_index = int(now // window)
+        current_key, previous_key = f"{key}:{current_index}", f"{key}:{current_index - 1}"
+        counts = cache.get_many([current_key, previous_key])
+        allowed, wait = window_estimate(
+            counts.get(previous_key, 0), counts.get(current_key, 0), limit, window, now,
+        )
+        if allowed:
+            cache.add(current_key, 0, 2 * window + 1)
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, 2 * window + 1)
+        return allowed, wait
+
+
+_store = None
+
+
+def get_counter_store():
+    global _store
+    if _store is None:
+        config = settings.THROTTLING
+        backend = import_string(config["STORE"])
+        if issubclass(backend, CacheCounterStore):
+            _store = backend(alias=config["CACHE_ALIAS"])
+        else:
+            _store = backend(stripes=config["STRIPES"])
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_counter_store(setting, **kwargs):
+    global _store
+    if setting == "THROTTLING":
+        _store = None
+
+
+class StoreThrottle(BaseThrottle):
+    """
+    throttle پایه روی counter store؛ نرخ از DEFAULT_THROTTLE_RATES[scope] خوانده می‌شود.
+    check بدون وابستگی به request.data هم قابل استفاده است (ویوهای async).
+    """
+
+    scope = None
+
+    def get_key(self, request, data):
+        raise NotImplementedError
+
+    def consume(self, store, key, num, period):
+        raise NotImplementedError
+
+    def check(self, request, data):
+        rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+        key = self.get_key(request, data)
+        if rate is None or key is None:
+            return True
+        allowed, self._wait = self.consume(get_counter_store(), f"throttle:{self.scope}:{key}", *rate)
+        return allowed
+
+    def allow_request(self, request, view):
+        return self.check(request, request.data)
+
+    def wait(self):
+        return self._wait
+
+
+class AuthIPThrottle(StoreThrottle):
+    """
+    token bucket برای هر IP: تا num درخواست پشت سر هم، سپس num در هر period.
+    """
+
+    scope = "auth_ip"
+
+    def get_key(self, request, data):
+        return self.get_ident(request)
+
+    def consume(self, store, key, num, period):
+        return store.take_token(key, num, period)
+
+
+class AuthIdentifierThrottle(StoreThrottle):
+    """
+    sliding window برای هر حساب، مستقل از IP؛ جلوی حمله‌ی توزیع‌شده روی یک
+    حساب را می‌گیرد. شناسه (ایمیل/یوزرنیم/تلفن) به کاربر resolve می‌شود تا
+    عوض کردن نوع شناسه‌ی همان حساب سقف را چند برابر نکند. با کوئری دیتابیس،
+    ویوهای async باید throttle_wait را با sync_to_async صدا بزنند.
+    """
+
+    scope = "auth_identifier"
+    fields = ("identifier", "email", "username", "phone")
+
+    def get_key(self, request, data):
+        for field in self.fields:
+            value = data.get(field) if hasattr(data, "get") else None
+            if isinstance(value, str) and value.strip():
+                user = resolve_identifier(value)
+                return f"user:{user.pk}" if user is not None else f"identifier:{value.strip().lower()}"
+        return None
+
+    def consume(self, store, key, num, period):
+        return store.hit_window(key, num, period)
+
+
+AUTH_THROTTLES = [AuthIPThrottle, AuthIdentifierThrottle]
+
+
+def throttle_wait(request, data, throttles=AUTH_THROTTLES):
+    """
+    برای ویوهای غیر DRF: بیشترین زمان انتظار throttleهای ردشده، یا None.
+    """
+    waits = []
+    for throttle_class in throttles:
+        throttle = throttle_class()
+        if not throttle.check(request, data):
+            waits.append(throttle.wait())
+    return max(waits) if waits else None
@@ -1,9 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from .views import (RegisterView, LoginView,ForgotPasswordView,
                     ResetPasswordView,ChangePasswordView,UserMeView,
                     PostListCreateView, PostRetrieveUpdateDestroyView,
-                    CommentListCreateView, CommentRetrieveUpdateDestroyView,
-                    ChangeUsernameView)
+                    CommentListCreateView, CommentRetrieveUpdateDestroyView, CommentRepliesView,
+                    ChangeUsernameView, HomeTimelineView, MentionInboxView, SearchView,
+                    UserAutocompleteView, BulkPostCreateView, UserExportView,
+                    DatabasePoolStatsView)
+
+if settings.ASYNC_AUTH_VIEWS:
+    from .async_views import (AsyncRegisterView as RegisterView, AsyncLoginView as LoginView,
+                              AsyncResetPasswordView as ResetPasswordView,
+                              AsyncChangePasswordView as ChangePasswordView)
 
 urlpatterns = [
     path("register/", RegisterView.as_view(), name="register"),
@@ -12,11 +20,19 @@ urlpatterns = [
     path("reset-password/", ResetPasswordView.as_view(), name="reset-password"),
     path("change-password/", ChangePasswordView.as_view(), name="change-password"),
     path("me/", UserMeView.as_view(), name="user-me"),
+    path("autocomplete/", UserAutocompleteView.as_view(), name="user-autocomplete"),
+    path("me/export/", UserExportView.as_view(), name="user-export"),
+    path("me/mentions/", MentionInboxView.as_view(), name="user-mentions"),
+    path("feed/", HomeTimelineView.as_view(), name="home-timeline"),
+    path("search/", SearchView.as_view(), name="search"),
     path("posts/", PostListCreateView.as_view(), name="post-list-create"),
+    path("posts/bulk/", BulkPostCreateView.as_view(), name="post-bulk-create"),
     path("posts/<uuid:pk>/", PostRetrieveUpdateDestroyView.as_view(), name="post-detail"),
     path("posts/<uuid:post_id>/comments/", CommentListCreateView.as_view(), name="comment-list-create"),
     path("comments/<uuid:pk>/", CommentRetrieveUpdateDestroyView.as_view(), name="comment-detail"),
+    path("comments/<uuid:pk>/replies/", CommentRepliesView.as_view(), name="comment-replies"),
     path("change-username/", ChangeUsernameView.as_view(), name="change-username"),
+    path("ops/db-pool/", DatabasePoolStatsView.as_view(), name="db-pool-stats"),
 
 
 ]
@@ -1,20 +1,50 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
+from django.conf import settings
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser
 from rest_framework import status
 from rest_framework.permissions import AllowAny,IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
-from .serializers import RegisterSerializer, LoginSerializer, ForgotPasswordSerializer, ResetPasswordSerializer,ChangePasswordSerializer,UserSerializer,PostSerializer, CommentSerializer, ChangeUsernameSerializer
+from .serializers import RegisterSerializer, LoginSerializer, ForgotPasswordSerializer, ResetPasswordSerializer,ChangePasswordSerializer,UserSerializer,PostSerializer, CommentSerializer, ChangeUsernameSerializer, MentionSerializer, SearchResultSerializer, UserMinSerializer
 from django.contrib.auth import get_user_model
-from .models import Post, Comment, UsernameChangeHistory
-from drf_spectacular.utils import extend_schema
+from .models import Post, Comment, UsernameChangeHistory, PostMention
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Prefetch, Subquery
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from . import autocomplete, bulk, export, feed, inbox, otp, search, threads
+from .parsers import NDJSONParser
+from .mentions import forget_handles
+from .identifiers import get_user_by
+from .authentication import load_deferred_fields
+from .compiled import COMMENTS, POSTS, CompiledListMixin
+from .conditional import conditional_get, make_etag
+from .response_cache import cache_anonymous_get
+from .throttling import AUTH_THROTTLES
+from .db.pool import pool_stats
 
 
 
 
 User = get_user_model()
 
+
+def post_queryset():
+    return Post.objects.select_related('author').prefetch_related(
+        Prefetch('mentions', queryset=User.objects.only('id'))
+    )
+
+
+def comment_queryset():
+    return Comment.objects.select_related('author').prefetch_related(
+        Prefetch('mentions', queryset=User.objects.only('id'))
+    )
+
 @extend_schema(
     operation_id="register_user",
     description="ثبت‌نام کاربر جدید با استفاده از ایمیل، شماره‌تلفن یا یوزرنیم",
@@ -23,6 +53,7 @@ User = get_user_model()
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = AUTH_THROTTLES
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -43,6 +74,7 @@ class RegisterView(APIView):
 
 class LoginView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = AUTH_THROTTLES
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -69,13 +101,14 @@ class LoginView(APIView):
 
 @extend_schema(
     operation_id="forgot_password",
-    description="درخواست بازیابی رمز عبور با ارسال ایمیل یا شماره تلفن (OTP فعلاً 123456)",
+    description="درخواست بازیابی رمز عبور با ارسال ایمیل یا شماره تلفن؛ کد یک‌بارمصرف از صف ارسال فرستاده می‌شود",
     request=ForgotPasswordSerializer,
     responses={200: "کد OTP ارسال شد"})
 
 
 class ForgotPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = AUTH_THROTTLES
 
     def post(self, request):
         serializer = ForgotPasswordSerializer(data=request.data)
@@ -84,13 +117,11 @@ class ForgotPasswordView(APIView):
             ident_type = ident["type"]
             ident_value = ident["value"]
 
-            if ident_type == "email":
-                user = User.objects.filter(email__iexact=ident_value).first()
-            else:
-                user = User.objects.filter(phone__iexact=ident_value).first()
+            user = get_user_by(ident_type, ident_value)
 
             if user:
-                return Response({"message": "کد OTP ارسال شد (فعلاً هاردکد: 123456)"},
+                otp.issue(user, channel=ident_type, to=ident_value)
+                return Response({"message": "کد OTP ارسال شد."},
                                 status=status.HTTP_200_OK)
             return Response({"detail": "کاربری با این ایمیل/شماره یافت نشد."},
                             status=status.HTTP_404_NOT_FOUND)
@@ -104,12 +135,13 @@ class ForgotPasswordView(APIView):
 
 @extend_schema(
     operation_id="reset_password",
-    description="تغییر رمز عبور با وارد کردن OTP (فعلاً هاردکد 123456)",
+    description="تغییر رمز عبور با وارد کردن OTP ارسال‌شده در forgot-password",
     request=ResetPasswordSerializer,
     responses={200: "رمز عبور با موفقیت تغییر یافت"})
 
 class ResetPasswordView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = AUTH_THROTTLES
 
     def post(self, request):
         serializer = ResetPasswordSerializer(data=request.data)
@@ -157,8 +189,15 @@ class ChangePasswordView(APIView):
 class UserMeView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get_conditional_validators(self, request):
+        row = User.objects.filter(pk=request.user.pk).values_list('id', 'updated_at').first()
+        if row is None:
+            return None
+        return make_etag('me', *row), row[1]
+
+    @conditional_get
     def get(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(load_deferred_fields(request.user))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def patch(self, request):
@@ -171,22 +210,165 @@ class UserMeView(APIView):
 
 
 
+@extend_schema(
+    operation_id="export_my_data",
+    description="خروجی NDJSON پروفایل، پست‌ها، کامنت‌ها و تاریخچه‌ی یوزرنیم کاربر؛ با compress=gzip فشرده می‌شود",
+    parameters=[OpenApiParameter("compress", str, enum=["gzip"], description="فشرده‌سازی gzip داخل stream")],
+    responses={(200, "application/x-ndjson"): str})
+
+class UserExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        compress = request.query_params.get('compress') == 'gzip'
+        user = load_deferred_fields(request.user)
+        response = StreamingHttpResponse(
+            export.export_stream(user, compress=compress),
+            content_type='application/gzip' if compress else 'application/x-ndjson; charset=utf-8',
+        )
+        filename = f"export-{user.pk}.ndjson" + (".gz" if compress else "")
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+
+
+@extend_schema(
+    operation_id="user_autocomplete",
+    description="پیشنهاد کاربر برای mention بر اساس پیشوند یوزرنیم، نام یا نام خانوادگی",
+    parameters=[
+        OpenApiParameter("q", str, required=True, description="پیشوند (با یا بدون @)"),
+        OpenApiParameter("limit", int, description="حداکثر تعداد نتایج"),
+    ],
+    responses={200: UserMinSerializer(many=True)})
+
+class UserAutocompleteView(generics.GenericAPIView):
+    serializer_class = UserMinSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = None
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        limit = min(max(limit, 1), autocomplete.AUTOCOMPLETE_MAX_LIMIT)
+        users = autocomplete.complete(request.query_params.get('q', ''), limit)
+        return Response(self.get_serializer(users, many=True).data)
+
+
+
+
+@extend_schema(
+    operation_id="my_mentions",
+    description="پست‌ها و کامنت‌هایی که کاربر واردشده در آن‌ها mention شده، به ترتیب زمان",
+    responses={200: MentionSerializer(many=True)})
+
+class MentionInboxView(generics.GenericAPIView):
+    serializer_class = MentionSerializer
+    permission_classes = [IsAuthenticated]
+    keyset_ordering = inbox.INBOX_ORDERING
+
+    def get(self, request):
+        page = self.paginator.paginate_stream(
+            lambda position, limit: inbox.read_mentions(request.user, position, limit),
+            request, PostMention, view=self,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+
+
+@extend_schema(
+    operation_id="search",
+    description="جستجوی متنی رتبه‌بندی‌شده در متن پست‌ها و کامنت‌ها",
+    parameters=[OpenApiParameter("q", str, required=True, description="عبارت جستجو")],
+    responses={200: SearchResultSerializer(many=True)})
+
+class SearchView(generics.GenericAPIView):
+    serializer_class = SearchResultSerializer
+    permission_classes = [AllowAny]
+    keyset_ordering = search.SEARCH_ORDERING
+
+    def get(self, request):
+        text = request.query_params.get('q', '')
+        if not search.search_terms(text):
+            raise ValidationError({"q": ["عبارت جستجو خالی است."]})
+        querysets = {"post": post_queryset(), "comment": comment_queryset()}
+        page = self.paginator.paginate_stream(
+            lambda position, limit: search.search(text, querysets, position, limit),
+            request, Post, view=self,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+
+
 @extend_schema(
     operation_id="create_post",
     description="ایجاد یک پست جدید (می‌تواند شامل mentions باشد)",
     request=PostSerializer,
     responses={201: PostSerializer})
 
-class PostListCreateView(generics.ListCreateAPIView):
-    queryset = Post.objects.all().order_by('-created_at')
+class PostListCreateView(CompiledListMixin, generics.ListCreateAPIView):
+    queryset = post_queryset().order_by('-created_at', '-id')
     serializer_class = PostSerializer
+    compiled_serializer = POSTS
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    @cache_anonymous_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save()
 
 
 
+@extend_schema(
+    operation_id="bulk_create_posts",
+    description="ایجاد دسته‌ای پست‌ها (لیست JSON، {\"posts\": [...]} یا NDJSON با application/x-ndjson)؛ همه یا هیچ",
+    request=PostSerializer(many=True),
+    responses={201: "تعداد پست‌های ساخته‌شده، شناسه‌ها و سرعت درج (rows_per_sec)"})
+
+class BulkPostCreateView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [JSONParser, NDJSONParser]
+
+    def post(self, request):
+        rows = request.data.get('posts') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError({"posts": ["لیستی از پست‌ها لازم است."]})
+        if len(rows) > settings.BULK_POSTS['MAX_ROWS']:
+            raise ValidationError({"posts": [f"حداکثر {settings.BULK_POSTS['MAX_ROWS']} پست در هر درخواست مجاز است."]})
+        result = bulk.import_posts(rows, author_id=request.user.pk)
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+
+@extend_schema(
+    operation_id="home_timeline",
+    description="تایم‌لاین کاربر واردشده: پست‌های خودش و پست‌هایی که در آن mention شده",
+    responses={200: PostSerializer(many=True)})
+
+class HomeTimelineView(generics.GenericAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    keyset_ordering = feed.TIMELINE_ORDERING
+
+    def get(self, request):
+        queryset = post_queryset()
+        page = self.paginator.paginate_stream(
+            lambda position, limit: feed.read_timeline(request.user, queryset, position, limit),
+            request, Post, view=self,
+        )
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+
 @extend_schema(
     operation_id="retrieve_update_delete_post",
     description="دریافت، بروزرسانی یا حذف یک پست خاص بر اساس post_id",
@@ -194,10 +376,23 @@ class PostListCreateView(generics.ListCreateAPIView):
     responses={200: PostSerializer})
 
 class PostRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+    queryset = post_queryset()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_conditional_validators(self, request, pk):
+        row = Post.objects.filter(pk=pk).values_list(
+            'id', 'updated_at', 'comment_count', 'mention_count', 'author__updated_at',
+        ).first()
+        if row is None:
+            return None
+        return make_etag('post', *row), max(row[1], row[4])
+
+    @conditional_get
+    @cache_anonymous_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
 
 
 
@@ -207,13 +402,38 @@ class PostRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
     request=CommentSerializer,
     responses={201: CommentSerializer})
 
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(CompiledListMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
+    compiled_serializer = COMMENTS
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
         post_id = self.kwargs.get('post_id')
-        return Comment.objects.filter(post_id=post_id).order_by('-created_at')
+        return comment_queryset().filter(post_id=post_id, parent__isnull=True).order_by('-created_at', '-id')
+
+    def get_conditional_validators(self, request, post_id):
+        # ساخت/حذف کامنت updated_at پست را هم جلو می‌برد، پس حذف هم Last-Modified را تغییر می‌دهد.
+        # شمار از comment_count (denormalized) و بیشینه‌ها از کامنت‌های همین پست با ایندکس
+        # comment_post_updated_idx خوانده می‌شوند. فقط تغییر نویسنده‌های همین کامنت‌ها (نامی که در
+        # لیست نمایش داده می‌شود) ETag را عوض می‌کند، نه ثبت‌نام یا ویرایش کاربران دیگر.
+        post_comments = Comment.objects.filter(post_id=OuterRef('pk')).values('post_id')
+        row = Post.objects.filter(pk=post_id).annotate(
+            latest=Subquery(post_comments.annotate(latest=Max('updated_at')).values('latest')),
+            authors_version=Subquery(post_comments.annotate(version=Max('author__updated_at')).values('version')),
+        ).values_list('updated_at', 'latest', 'comment_count', 'authors_version').first()
+        if row is None:
+            return None
+        updated_at, latest, total, authors_version = row
+        last_modified = max(value for value in (updated_at, latest, authors_version) if value is not None)
+        etag = make_etag(
+            'comments', post_id, updated_at.isoformat(), latest and latest.isoformat(), total,
+            authors_version and authors_version.isoformat(), request.get_full_path(),
+        )
+        return etag, last_modified
+
+    @conditional_get
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         post_id = self.kwargs.get('post_id')
@@ -229,10 +449,42 @@ class CommentListCreateView(generics.ListCreateAPIView):
     responses={200: CommentSerializer})
 
 class CommentRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
+    queryset = comment_queryset()
     serializer_class = CommentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            removed = threads.delete_subtree(instance)
+            Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') - removed, updated_at=timezone.now())
+
+
+
+
+@extend_schema(
+    operation_id="comment_replies",
+    description="پاسخ‌های یک کامنت به ترتیب درخت (هر پاسخ بعد از والدش)؛ depth تعداد سطح‌ها را محدود می‌کند",
+    parameters=[OpenApiParameter("depth", int, description="تعداد سطح‌های پاسخ زیر کامنت")],
+    responses={200: CommentSerializer(many=True)})
+
+class CommentRepliesView(CompiledListMixin, generics.ListAPIView):
+    serializer_class = CommentSerializer
+    compiled_serializer = COMMENTS
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    keyset_ordering = threads.THREAD_ORDERING
+
+    def get_queryset(self):
+        comment = get_object_or_404(Comment.objects.only('id', 'post_id', 'path', 'depth'), pk=self.kwargs['pk'])
+        depth = self.request.query_params.get('depth')
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                depth = 0
+            if depth < 1:
+                raise ValidationError({"depth": ["depth باید عدد مثبت باشد."]})
+        return comment_queryset().filter(threads.subtree_filter(comment, depth))
+
 
 
 
@@ -251,8 +503,20 @@ class ChangeUsernameView(APIView):
             old = user.username
             user.username = serializer.validated_data['username']
             user.save()
+            forget_handles(old)
             UsernameChangeHistory.objects.create(
                 user=user, old_username=old, new_username=user.username
             )
             return Response({"message": "یوزرنیم با موفقیت تغییر یافت", "username": user.username})
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@extend_schema(
+    operation_id="db_pool_stats",
+    description="آمار pool اتصال دیتابیس همین پردازه (اندازه، زمان انتظار، timeout)؛ فقط ادمین",
+    responses={200: dict})
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"mode": settings.DB_CONN_MODE, "pools": pool_stats()})